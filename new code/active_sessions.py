@@ -1,115 +1,181 @@
 import json
 import os
-import msvcrt
-from typing import Optional, Dict
+import time
+from typing import Dict
 from datetime import datetime, timezone
-from config import ACTIVE_SESSIONS_PATH
+from config import ACTIVE_SESSIONS_PATH, SESSION_LOCK_TIMEOUT, SESSION_STALE_SECONDS, SESSION_PRUNE_INTERVAL, SESSION_BACKEND
+from file_lock import locked, lock_stats, LockTimeout
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 def _cleanup_stale_sessions(sessions: Dict) -> Dict:
-    """Remove sessions older than 5 minutes (suggesting crashed instances)"""
+    """Remove sessions not seen for SESSION_STALE_SECONDS (suggesting crashed instances)"""
     now = datetime.now(timezone.utc)
-    cutoff = 300  # 5 minutes in seconds
+    cutoff = SESSION_STALE_SECONDS
     return {
         username: data for username, data in sessions.items()
         if data and datetime.fromisoformat(data["last_active"]).timestamp() + cutoff > now.timestamp()
     }
 
-def _acquire_lock(file_handle) -> None:
-    """Lock the file for exclusive access"""
-    while True:
+
+class JsonSessionRegistry:
+    """
+    Logged-in users shared between instances through one JSON file, guarded by
+    a cross-platform file lock (fcntl on POSIX, msvcrt on Windows).
+    """
+
+    def __init__(self, path: str = ACTIVE_SESSIONS_PATH, lock_timeout: float = SESSION_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._last_prune = 0.0
+
+    def _ensure_file(self) -> None:
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            try:
+                with open(self.path, "xb") as f:
+                    f.write(b"{}")
+            except FileExistsError:
+                pass
+
+    @staticmethod
+    def _read(f) -> Dict:
+        f.seek(0)
+        return json.loads(f.read().decode("utf-8") or "{}")
+
+    @staticmethod
+    def _write(f, sessions: Dict) -> None:
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(sessions).encode("utf-8"))
+        f.flush()
+
+    def get_active_sessions(self) -> Dict:
+        """
+        Read-only view of active sessions: shared lock, stale entries filtered
+        in memory. The file itself is only pruned by prune_stale(), at most
+        once per SESSION_PRUNE_INTERVAL and only if something is stale.
+        Raises LockTimeout if the registry stays locked: an empty answer
+        would read as "nobody is logged in".
+        """
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f, locked(f, exclusive=False, timeout=self.lock_timeout):
+                raw = self._read(f)
+        except LockTimeout:
+            raise
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return {}
+        sessions = _cleanup_stale_sessions(raw)
+        if len(sessions) != len(raw) and time.monotonic() - self._last_prune >= SESSION_PRUNE_INTERVAL:
+            self.prune_stale()
+        return sessions
+
+    def prune_stale(self) -> None:
+        """Drop stale sessions from the file (rewrites only if something changed)."""
+        self._last_prune = time.monotonic()
+        if not os.path.exists(self.path):
+            return
         try:
-            # Try to lock the entire file
-            msvcrt.locking(file_handle.fileno(), msvcrt.LK_NBLCK, 1)
-            break
-        except IOError:
-            # Another process has the lock, wait a bit and retry
-            import time
-            time.sleep(0.1)
-
-def _release_lock(file_handle) -> None:
-    """Release the lock on the file"""
-    try:
-        # Unlock the file
-        msvcrt.locking(file_handle.fileno(), msvcrt.LK_UNLCK, 1)
-    except IOError:
-        pass  # Ignore errors during unlock
+            with open(self.path, "r+b") as f, locked(f, timeout=self.lock_timeout):
+                raw = self._read(f)
+                sessions = _cleanup_stale_sessions(raw)
+                if len(sessions) != len(raw):
+                    self._write(f, sessions)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            pass
+
+    def is_user_active(self, username: str) -> bool:
+        return bool(self.get_active_sessions().get(username))
+
+    def add(self, username: str) -> None:
+        self._ensure_file()
+        with open(self.path, "r+b") as f, locked(f, timeout=self.lock_timeout):
+            sessions = _cleanup_stale_sessions(self._read(f))
+            sessions[username] = {
+                "pid": os.getpid(),
+                "last_active": _now_iso()
+            }
+            self._write(f, sessions)
+        self._last_prune = time.monotonic()
+
+    def remove(self, username: str) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f, locked(f, timeout=self.lock_timeout):
+            sessions = self._read(f)
+            if username in sessions:
+                del sessions[username]
+                self._write(f, sessions)
+
+    def try_add(self, username: str) -> bool:
+        """Add the session unless the user already has a live one (check and add under one lock)."""
+        self._ensure_file()
+        with open(self.path, "r+b") as f, locked(f, timeout=self.lock_timeout):
+            sessions = _cleanup_stale_sessions(self._read(f))
+            if sessions.get(username):
+                return False
+            sessions[username] = {
+                "pid": os.getpid(),
+                "last_active": _now_iso()
+            }
+            self._write(f, sessions)
+        self._last_prune = time.monotonic()
+        return True
+
+    def touch(self, username: str) -> None:
+        """Refresh last_active for an existing session in a single locked pass."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f, locked(f, timeout=self.lock_timeout):
+            sessions = _cleanup_stale_sessions(self._read(f))
+            if username not in sessions:
+                return
+            sessions[username]["last_active"] = _now_iso()
+            self._write(f, sessions)
+
+    def lock_metrics(self) -> Dict[str, float]:
+        return lock_stats.snapshot()
+
+
+def _make_registry():
+    if SESSION_BACKEND == "sqlite":
+        from sqlite_sessions import SqliteSessionRegistry
+        return SqliteSessionRegistry()
+    if SESSION_BACKEND == "json":
+        return JsonSessionRegistry()
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND!r}")
+
+
+registry = _make_registry()
+
 
 def get_active_sessions() -> Dict:
     """Get dictionary of active user sessions with locking"""
-    if not os.path.exists(ACTIVE_SESSIONS_PATH):
-        return {}
-        
-    try:
-        with open(ACTIVE_SESSIONS_PATH, "r+b") as f:
-            _acquire_lock(f)
-            try:
-                f.seek(0)
-                content = f.read().decode("utf-8")
-                sessions = json.loads(content or "{}")
-                sessions = _cleanup_stale_sessions(sessions)
-                # Write back cleaned sessions
-                f.seek(0)
-                f.truncate()
-                f.write(json.dumps(sessions).encode("utf-8"))
-                return sessions
-            finally:
-                _release_lock(f)
-    except (FileNotFoundError, json.JSONDecodeError, IOError):
-        return {}
+    return registry.get_active_sessions()
 
 def is_user_active(username: str) -> bool:
     """Check if a user has an active session"""
-    return bool(get_active_sessions().get(username))
+    return registry.is_user_active(username)
 
 def add_active_session(username: str) -> None:
     """Add/update a user's active session with locking"""
-    os.makedirs(os.path.dirname(ACTIVE_SESSIONS_PATH), exist_ok=True)
-    
-    # Ensure file exists
-    if not os.path.exists(ACTIVE_SESSIONS_PATH):
-        with open(ACTIVE_SESSIONS_PATH, "wb") as f:
-            f.write(b"{}")
-    
-    with open(ACTIVE_SESSIONS_PATH, "r+b") as f:
-        _acquire_lock(f)
-        try:
-            f.seek(0)
-            content = f.read().decode("utf-8")
-            sessions = json.loads(content or "{}")
-            sessions = _cleanup_stale_sessions(sessions)
-            sessions[username] = {
-                "pid": os.getpid(),
-                "last_active": _now_iso()
-            }
-            f.seek(0)
-            f.truncate()
-            f.write(json.dumps(sessions).encode("utf-8"))
-        finally:
-            _release_lock(f)
+    registry.add(username)
+
+def try_add_active_session(username: str) -> bool:
+    """Atomically add a session; False if the user is already active elsewhere"""
+    return registry.try_add(username)
 
 def remove_active_session(username: str) -> None:
     """Remove a user's active session with locking"""
-    if not os.path.exists(ACTIVE_SESSIONS_PATH):
-        return
-        
-    with open(ACTIVE_SESSIONS_PATH, "r+b") as f:
-        _acquire_lock(f)
-        try:
-            f.seek(0)
-            content = f.read().decode("utf-8")
-            sessions = json.loads(content or "{}")
-            if username in sessions:
-                del sessions[username]
-            f.seek(0)
-            f.truncate()
-            f.write(json.dumps(sessions).encode("utf-8"))
-        finally:
-            _release_lock(f)
+    registry.remove(username)
 
 def update_active_session(username: str) -> None:
     """Update last_active timestamp for a session"""
-    if is_user_active(username):
-        add_active_session(username)  # This will update the timestamp
\ No newline at end of file
+    registry.touch(username)
+
+def lock_metrics() -> Dict[str, float]:
+    """Lock wait metrics for the sessions file"""
+    return registry.lock_metrics()
@@ -1,8 +1,8 @@
 from typing import Tuple, List, Dict
-from user_store import get_all_users, get_user, upsert_user
+from user_store import get_all_users, get_user, upsert_user, list_usernames
 from session import session
 from logger import log_event
-import bcrypt
+from password_policy import hash_password
 from typing import Optional
 from datetime import datetime, timezone, timedelta
 from auth_manager import maybe_trigger_freeze
@@ -22,27 +22,58 @@ def reset_password(target_username: str, new_password: str) -> Tuple[bool, str]:
     user = get_user(target_username)
     if not user:
         return False, "User not found"
-    user["password_hash"] = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+    user["password_hash"] = hash_password(new_password)
     upsert_user(user)
     log_event("ADMIN_RESET_PASSWORD", session.get_current_user(), target=target_username)
     return True, "Password reset"
 
 
+def _summary(username: str, rec: Optional[dict]) -> Dict:
+    rec = rec or {}
+    return {
+        "username": username,
+        "is_admin": rec.get("is_admin", False),
+        "failed_attempts": rec.get("failed_attempts", 0),
+        "last_login_at": rec.get("last_login_at")
+    }
+
+
 def list_users() -> List[Dict]:
     require_admin()
     db = get_all_users()
-    result = []
-    for u, rec in db.items():
-        result.append({
-            "username": u,
-            "is_admin": rec.get("is_admin", False),
-            "failed_attempts": rec.get("failed_attempts", 0),
-            "last_login_at": rec.get("last_login_at")
-        })
+    result = [_summary(u, rec) for u, rec in db.items()]
     log_event("ADMIN_LIST_USERS", session.get_current_user(), count=len(result))
     return result
 
 
+def list_user_names() -> List[str]:
+    """
+    Just the usernames, from the store's encrypted username index (one
+    decryption rather than one per user record); pair with describe_users
+    for the rows on screen.
+    """
+    require_admin()
+    names = list_usernames()
+    log_event("ADMIN_LIST_USERS", session.get_current_user(), count=len(names))
+    return names
+
+
+def describe_users(usernames: List[str]) -> List[Dict]:
+    """Summaries for the given users, in order (missing users come back with defaults)."""
+    require_admin()
+    return [_summary(u, get_user(u)) for u in usernames]
+
+
+def search_log(username: Optional[str] = None, events: Optional[List[str]] = None,
+               since=None, until=None, limit: int = 500) -> List[Dict]:
+    """Indexed security-log search for incident investigation (see log_index.search)."""
+    require_admin()
+    from log_index import search
+    result = list(search(username=username, events=events, since=since, until=until, limit=limit))
+    log_event("ADMIN_SEARCH_LOG", session.get_current_user(), target=username, count=len(result))
+    return result
+
+
 def unlock_system() -> None:
     require_admin()
     from session import session as sess
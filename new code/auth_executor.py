@@ -0,0 +1,95 @@
+import os
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+from config import AUTH_WORKERS
+
+# bcrypt releases the GIL while hashing, so a plain thread pool spreads
+# checkpw/hashpw across cores without the pickling cost of a process pool.
+# password_policy (bcrypt) and auth_manager are imported inside the workers,
+# so importing this module at GUI startup stays cheap.
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+# per-user serialization through a fixed set of striped locks: a lock per
+# username ever seen would grow without bound under random-username attempts,
+# and two users sharing a stripe only means they take turns
+_USER_LOCK_STRIPES = 64
+_user_locks = [threading.Lock() for _ in range(_USER_LOCK_STRIPES)]
+_startup: Optional[Future] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = AUTH_WORKERS or os.cpu_count() or 2
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+    return _pool
+
+
+def user_lock(username: str) -> threading.Lock:
+    # one in-flight attempt per user so failed_attempts updates don't race;
+    # different users still verify in parallel (unless they share a stripe)
+    return _user_locks[hash(username) % _USER_LOCK_STRIPES]
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    return _executor().submit(fn, *args, **kwargs)
+
+
+def run_startup(fn, *args) -> Future:
+    """Run one-time startup work (e.g. bootstrap_admin) on the pool; logins and registrations wait for it."""
+    global _startup
+    _startup = submit(fn, *args)
+    return _startup
+
+
+def _after_startup() -> None:
+    if _startup is not None:
+        try:
+            _startup.result()
+        except Exception:
+            pass  # reported to whoever started it; auth goes ahead regardless
+
+
+def hash_password_async(password: str, rounds: Optional[int] = None) -> Future:
+    from password_policy import hash_password
+    return submit(hash_password, password, rounds)
+
+
+def check_password_async(password: str, pw_hash: str) -> Future:
+    from password_policy import verify_password
+    return submit(verify_password, password, pw_hash)
+
+
+def authenticate_async(username: str, password: str) -> Future:
+    """Run auth_manager.authenticate on the pool. Result is (ok, message)."""
+    def run():
+        from auth_manager import authenticate
+        _after_startup()
+        with user_lock(username):
+            return authenticate(username, password)
+    return submit(run)
+
+
+def register_user_async(username: str, password: str, is_admin: bool = False) -> Future:
+    def run():
+        from auth_manager import register_user
+        _after_startup()
+        with user_lock(username):
+            return register_user(username, password, is_admin)
+    return submit(run)
+
+
+def shutdown(wait: bool = True) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait)
+            _pool = None
+
+
+atexit.register(shutdown)
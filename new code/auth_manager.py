@@ -2,16 +2,17 @@ from __future__ import annotations
 from typing import Tuple, Optional
 from datetime import datetime, timezone, timedelta
 
-import bcrypt
-
 from config import (
     LOCKOUT_MAX_ATTEMPTS,
     SYSTEM_FREEZE_SECONDS,
     AUTO_UNLOCK_SECONDS,  # used as the per-user lock duration too (can separate if you want)
 )
-from user_store import get_user, upsert_user, get_all_users
+from user_store import get_user, upsert_user
+from file_lock import LockTimeout
 from session import session
 from logger import log_event
+from password_policy import hash_password, verify_password, needs_rehash
+import auth_executor
 
 
 # -------- time helpers --------
@@ -32,6 +33,9 @@ def _parse_iso(ts: Optional[str]) -> Optional[datetime]:
         return None
 
 
+_REGISTRY_BUSY = "Session registry busy, try again in a moment."
+
+
 # -------- public API --------
 def register_user(username: str, password: str, is_admin: bool = False) -> Tuple[bool, str]:
     """
@@ -41,11 +45,10 @@ def register_user(username: str, password: str, is_admin: bool = False) -> Tuple
     if not username or not password:
         return False, "Username and password required"
 
-    db = get_all_users()
-    if username in db:
+    if get_user(username) is not None:
         return False, "User already exists"
 
-    pw_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    pw_hash = hash_password(password)
     user = {
         "username": username,
         "password_hash": pw_hash,
@@ -87,16 +90,23 @@ def authenticate(username: str, password: str) -> Tuple[bool, str]:
         return False, f"Account temporarily locked. Try again in {remain}s."
 
     # 4) Check if user is already logged in elsewhere
-    if not session.can_login(username):
+    try:
+        can_login = session.can_login(username)
+    except LockTimeout:
+        log_event("LOGIN_FAIL", username, reason="session_registry_busy")
+        return False, _REGISTRY_BUSY
+    if not can_login:
         log_event("LOGIN_FAIL", username, reason="already_logged_in")
         return False, "This user is already logged in from another location"
     
     # 5) Verify password
-    ok = bcrypt.checkpw(password.encode(), user["password_hash"].encode())
+    ok = verify_password(password, user["password_hash"])
     if ok:
         user["failed_attempts"] = 0
         user["last_login_at"] = _now_iso()
         upsert_user(user)
+        if needs_rehash(user["password_hash"]):
+            auth_executor.submit(_upgrade_hash, username, password, user["password_hash"])
         try:
             session.login(username)
             log_event("LOGIN_SUCCESS", username)
@@ -105,6 +115,9 @@ def authenticate(username: str, password: str) -> Tuple[bool, str]:
             # Handle race condition where user logged in between our check and login
             log_event("LOGIN_FAIL", username, reason="race_condition")
             return False, str(e)
+        except LockTimeout:
+            log_event("LOGIN_FAIL", username, reason="session_registry_busy")
+            return False, _REGISTRY_BUSY
 
     # 5) Handle failure: bump attempts, warn/lock/freeze
     attempts = int(user.get("failed_attempts", 0)) + 1
@@ -197,6 +210,21 @@ def user_lock_remaining_seconds(user_or_username) -> Optional[int]:
 
 
 # -------- internal helpers --------
+def _upgrade_hash(username: str, password: str, old_hash: str) -> None:
+    """
+    Rehash at the configured cost after a successful login. Skips the write
+    if the hash changed meanwhile (e.g. an admin reset the password).
+    """
+    new_hash = hash_password(password)
+    with auth_executor.user_lock(username):
+        user = get_user(username)
+        if not user or user.get("password_hash") != old_hash:
+            return
+        user["password_hash"] = new_hash
+        upsert_user(user)
+    log_event("PASSWORD_REHASH", username)
+
+
 def _freeze_message() -> str:
     remain = freeze_remaining_seconds()
     if remain is None:
@@ -264,11 +292,10 @@ def bootstrap_admin(default_password: str = "admin123") -> None:
     """
     Ensure an 'admin' account exists. Idempotent: does nothing if admin already exists.
     """
-    db = get_all_users()
-    if "admin" in db:
+    if get_user("admin") is not None:
         return
 
-    pw_hash = bcrypt.hashpw(default_password.encode(), bcrypt.gensalt()).decode()
+    pw_hash = hash_password(default_password)
     user = {
         "username": "admin",
         "password_hash": pw_hash,
@@ -8,13 +8,71 @@ SYSTEM_FREEZE_SECONDS = 60
 AUTO_UNLOCK_SECONDS = 180
 # Data and key paths - absolute, based on repository layout
 USERS_DB_ENC_PATH = os.path.join(BASE_DIR, "data", "users.json.enc")
+USERS_DB_RECORDS_PATH = os.path.join(BASE_DIR, "data", "users.rec")
+USERS_DB_SQLITE_PATH = os.path.join(BASE_DIR, "data", "users.db")
 FERNET_KEY_PATH = os.path.join(BASE_DIR, "data", "key.key")
 LOG_PATH = os.path.join(BASE_DIR, "logs", "security.log")
+LOG_BATCH_SIZE = 256             # max events per write
+LOG_FLUSH_INTERVAL = 0.2         # seconds the writer idles before checking the queue again
+LOG_RETRY_MAX_LINES = 10000      # events held for retry while security.log can't be written; oldest dropped beyond this
+LOG_FSYNC = os.getenv("SECURITY_LOG_FSYNC", "0") == "1"  # fsync every batch (durability over speed)
+LOG_ROTATE_BYTES = 8 * 1024 * 1024  # seal the active log once it reaches this size (0 = never)
+LOG_ROTATE_DAILY = True          # also seal it when the day (UTC) changes
+LOG_COMPRESS_SEGMENTS = True     # gzip sealed segments
+LOG_RETENTION_DAYS = 365         # delete sealed segments older than this (0 = keep forever)
+LOG_MANIFEST_PATH = os.path.join(BASE_DIR, "logs", "security.manifest.json")
+LOG_INDEX_ON_WRITE = True        # keep security.log.idx current after every batch (else built on search)
+LOG_INDEX_TS_SLACK = 30.0        # seconds an event may be written after newer ones (see log_index)
+DASHBOARD_STATE_PATH = os.path.join(BASE_DIR, "data", "dashboard_state.json")  # incremental summary checkpoint
+METRICS_MINUTE_BUCKETS = 24 * 60   # per-minute event rates kept for a day
+METRICS_HOUR_BUCKETS = 7 * 24      # per-hour event rates kept for a week
+METRICS_USER_BURST_MINUTES = 15    # per-user failed-login window
+METRICS_MAX_USERS = 10000          # per-user rings kept before evicting the least recent
 PROTECTED_DIR = os.path.join(BASE_DIR, "protected_files")
+# Vault mode: new protected files are stored encrypted (chunked AES-GCM, key from key.key).
+# Existing plaintext files stay readable either way. Env SECURITY_VAULT=1 turns it on.
+PROTECTED_FILES_ENCRYPTED = os.getenv("SECURITY_VAULT", "0") == "1"
+VAULT_CHUNK_SIZE = 64 * 1024
+VAULT_MAX_CHUNK = 16 * 1024 * 1024  # largest chunk size a vault header may declare
+MMAP_THRESHOLD = 4 * 1024 * 1024   # range reads on plaintext files at least this big use mmap
+VIEWER_PAGE_SIZE = 64 * 1024       # bytes shown per page in the Files viewer
+# Metadata catalog (size, mtime, owner, hash) for the protected dir, kept outside it
+PROTECTED_CATALOG_PATH = os.path.join(BASE_DIR, "data", "protected_files.db")
+# Dedup mode: file bodies are stored once per content under protected_files/.blobs and
+# filenames become (hard-linked) references to them. Env SECURITY_DEDUP=1 turns it on.
+PROTECTED_DEDUP = os.getenv("SECURITY_DEDUP", "0") == "1"
+FS_WATCH_POLL_SECONDS = 2.0        # scandir diff interval when inotify isn't available
+FS_WATCH_DEBOUNCE = 0.1            # inotify events are coalesced over this window
+FS_WATCH_GUI_MS = 200              # FilesFrame check for queued change batches
 ACTIVE_SESSIONS_PATH = os.path.join(BASE_DIR, "data", "active_sessions.json")
 
-PASSWORD_HASH_ROUNDS = 12
+# User DB backend (env SECURITY_USER_STORE overrides):
+# "records": one encrypted record per user (users.rec, migrated from users.json.enc on first use)
+# "sqlite": SQLite in WAL mode with per-row encryption (users.db, imported from users.json.enc on first use)
+# "blob": legacy single Fernet blob (users.json.enc)
+USER_STORE_BACKEND = os.getenv("SECURITY_USER_STORE", "records")
+USERS_RECORDS_COMPACT_RATIO = 0.5  # users.rec is compacted once superseded records exceed this share of it
+
+# bcrypt cost for new/upgraded hashes (env SECURITY_HASH_ROUNDS overrides; see
+# `python password_policy.py --target-ms 250` to pick one for this machine).
+# Existing hashes at a different cost are rehashed after the next successful login.
+PASSWORD_HASH_ROUNDS = int(os.getenv("SECURITY_HASH_ROUNDS", "12"))
+AUTH_WORKERS = 0                 # bcrypt worker threads; 0 = one per CPU
 GUI_TITLE = "Basic Security System"
 USER_LOCK_SECONDS = 180          # per-user lock duration
 SYSTEM_FREEZE_SECONDS = 60       # system-wide freeze
 ACTIVE_SESSIONS_PATH = "data/active_sessions.json"  # track logged-in users
+SESSIONS_DB_PATH = os.path.join(BASE_DIR, "data", "sessions.db")
+FREEZE_STATE_PATH = os.path.join(BASE_DIR, "data", "system_state.bin")  # shared system freeze record
+FREEZE_POLL_MS = 250             # GUI check for freeze changes (one memory read)
+GUI_STALE_SECONDS = 30           # cached GUI frames reload their data when shown after this long
+GUI_TASK_WORKERS = 4             # threads for GUI background work (disk, crypto, bcrypt)
+GUI_PUMP_MS = 16                 # how often the Tk thread picks up finished background work
+STARTUP_BUDGET_MS = 400          # `main.py --profile-startup` fails if the login window takes longer
+# Session registry backend (env SECURITY_SESSION_BACKEND overrides):
+# "json": active_sessions.json under a file lock; "sqlite": one row per user in sessions.db
+SESSION_BACKEND = os.getenv("SECURITY_SESSION_BACKEND", "json")
+SESSION_LOCK_TIMEOUT = 10        # seconds to wait for the sessions file lock
+SESSION_STALE_SECONDS = 300      # sessions without a heartbeat this long are treated as crashed
+SESSION_HEARTBEAT_SECONDS = 60   # at most one last_active update per interval per instance
+SESSION_PRUNE_INTERVAL = 60      # min seconds between stale-session rewrites triggered by reads
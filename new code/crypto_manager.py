@@ -1,39 +1,122 @@
 import os
 import json
-from typing import Dict, Any, Optional
-from cryptography.fernet import Fernet, InvalidToken
-from config import FERNET_KEY_PATH, USERS_DB_ENC_PATH
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from config import FERNET_KEY_PATH, USERS_DB_ENC_PATH, USERS_DB_RECORDS_PATH, USERS_DB_SQLITE_PATH, PROTECTED_DIR
 
 # === Key Management ===
-# Prefer env var SECURITY_FERNET_KEY (base64 urlsafe 32-byte key)
-# else load from FERNET_KEY_PATH; create if missing with 0600 perms.
+# Prefer env var SECURITY_FERNET_KEY (base64 urlsafe 32-byte key, or several
+# comma-separated keys) else load from FERNET_KEY_PATH (one key per line);
+# create if missing with 0600 perms. The first key is the primary one used for
+# encryption, the rest are only used to decrypt data written before a rotation.
 
-def ensure_key() -> bytes:
+
+def _write_key_file(keys: List[bytes]) -> None:
+    os.makedirs(os.path.dirname(FERNET_KEY_PATH), exist_ok=True)
+    tmp = FERNET_KEY_PATH + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\n".join(keys))
+    try:
+        os.chmod(tmp, 0o600)
+    except Exception:
+        pass
+    os.replace(tmp, FERNET_KEY_PATH)
+
+
+def _read_keys() -> List[bytes]:
     env_key = os.getenv("SECURITY_FERNET_KEY")
     if env_key:
+        keys = [k.strip().encode() for k in env_key.split(",") if k.strip()]
         try:
             # Validate by constructing Fernet
-            Fernet(env_key.encode())
-            return env_key.encode()
+            for k in keys:
+                Fernet(k)
         except Exception:
             raise ValueError("SECURITY_FERNET_KEY is not a valid Fernet key")
+        return keys
 
-    os.makedirs(os.path.dirname(FERNET_KEY_PATH), exist_ok=True)
     if not os.path.exists(FERNET_KEY_PATH):
         key = Fernet.generate_key()
-        with open(FERNET_KEY_PATH, "wb") as f:
-            f.write(key)
-        try:
-            os.chmod(FERNET_KEY_PATH, 0o600)
-        except Exception:
-            pass
-        return key
+        _write_key_file([key])
+        return [key]
     with open(FERNET_KEY_PATH, "rb") as f:
-        return f.read()
+        return [line.strip() for line in f.read().splitlines() if line.strip()]
+
+
+class KeyManager:
+    """
+    Loads the key(s) once and keeps the MultiFernet around. Call reload() after
+    the key file/env changes; decrypt() also reloads once on InvalidToken in
+    case another process rotated the key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (keys, MultiFernet), swapped as one so readers never see a half-reloaded pair
+        self._state: Optional[Tuple[List[bytes], MultiFernet]] = None
+
+    def _ensure_loaded(self) -> Tuple[List[bytes], MultiFernet]:
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    keys = _read_keys()
+                    self._state = (keys, MultiFernet([Fernet(k) for k in keys]))
+                state = self._state
+        return state
+
+    def reload(self) -> None:
+        with self._lock:
+            self._state = None
+
+    def keys(self) -> List[bytes]:
+        return list(self._ensure_loaded()[0])
+
+    def primary_key(self) -> bytes:
+        return self.keys()[0]
+
+    def fernet(self) -> MultiFernet:
+        return self._ensure_loaded()[1]
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self.fernet().encrypt(data)
 
+    def decrypt(self, token: bytes) -> bytes:
+        try:
+            return self.fernet().decrypt(token)
+        except InvalidToken:
+            self.reload()
+            return self.fernet().decrypt(token)
+
+    def rotate(self, token: bytes) -> bytes:
+        """Re-encrypt a token under the primary key."""
+        return self.fernet().rotate(token)
+
+    def add_primary_key(self, new_key: bytes, keep_old: bool = True) -> None:
+        Fernet(new_key)  # validate
+        old = self.keys() if keep_old else []
+        _write_key_file([new_key] + [k for k in old if k != new_key])
+        self.reload()
+
+
+key_manager = KeyManager()
+
+
+def ensure_key() -> bytes:
+    return key_manager.primary_key()
+
+
+def _fernet() -> MultiFernet:
+    return key_manager.fernet()
+
+
+def encrypt_bytes(data: bytes) -> bytes:
+    return key_manager.encrypt(data)
 
-def _fernet() -> Fernet:
-    return Fernet(ensure_key())
+
+def decrypt_bytes(token: bytes) -> bytes:
+    return key_manager.decrypt(token)
 
 # === Encrypted Load/Save ===
 
@@ -43,7 +126,7 @@ def load_users_encrypted() -> Dict[str, Any]:
     with open(USERS_DB_ENC_PATH, "rb") as f:
         ciphertext = f.read()
     try:
-        plaintext = _fernet().decrypt(ciphertext)
+        plaintext = decrypt_bytes(ciphertext)
     except InvalidToken:
         # Helpful message if an older plaintext file exists under .enc
         raise RuntimeError(
@@ -56,7 +139,7 @@ def load_users_encrypted() -> Dict[str, Any]:
 def save_users_encrypted(users: Dict[str, Any]) -> None:
     os.makedirs(os.path.dirname(USERS_DB_ENC_PATH), exist_ok=True)
     data = json.dumps(users, indent=2).encode("utf-8")
-    token = _fernet().encrypt(data)
+    token = encrypt_bytes(data)
     tmp = USERS_DB_ENC_PATH + ".tmp"
     with open(tmp, "wb") as f:
         f.write(token)
@@ -64,31 +147,43 @@ def save_users_encrypted(users: Dict[str, Any]) -> None:
 
 # === Optional: Key Rotation ===
 
-def rotate_key(optional_new_key: Optional[bytes] = None) -> None:
+def rotate_key(optional_new_key: Optional[bytes] = None, keep_old: bool = True) -> None:
     """
-    Decrypt with current key, write a new key (or use provided), and re-encrypt.
-    NOTE: If using SECURITY_FERNET_KEY, rotation should be handled by changing that env
-    and re-encrypting; this helper assumes file-based key.
+    Make a new key (or the provided one) primary. With keep_old=True previous
+    keys stay in the key file for decryption, so per-record stores keep working
+    and pick up the new key as records are rewritten; the legacy blob is
+    re-encrypted right away.
+    With keep_old=False the record/SQLite user stores (records and index
+    secret) are re-encrypted too before the old keys are dropped. Vault files
+    aren't rewritten, so that is refused while any still needs an old key.
+    NOTE: If using SECURITY_FERNET_KEY, rotation should be handled by prepending the
+    new key to that env list; this helper assumes file-based key.
     """
-    # Load with current key
-    users = load_users_encrypted()
-
-    # Decide new key
     new_key = optional_new_key or Fernet.generate_key()
+    Fernet(new_key)  # validate before touching anything
+    if not keep_old:
+        from vault import key_ids_in_use, key_id
+        dropped = {key_id(k) for k in key_manager.keys() if k != new_key}
+        if key_ids_in_use(PROTECTED_DIR) & dropped:
+            raise RuntimeError("Protected files are still encrypted with an old key; rotate with keep_old=True")
+    # the old keys stay until everything below has been re-encrypted, so a
+    # crash part way leaves every file readable
+    key_manager.add_primary_key(new_key, keep_old=True)
 
-    # If using file key, overwrite file; otherwise just use in-memory
-    os.makedirs(os.path.dirname(FERNET_KEY_PATH), exist_ok=True)
-    with open(FERNET_KEY_PATH, "wb") as f:
-        f.write(new_key)
-    try:
-        os.chmod(FERNET_KEY_PATH, 0o600)
-    except Exception:
-        pass
+    if os.path.exists(USERS_DB_ENC_PATH):
+        with open(USERS_DB_ENC_PATH, "rb") as f:
+            token = f.read()
+        token = key_manager.rotate(token)
+        tmp = USERS_DB_ENC_PATH + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(token)
+        os.replace(tmp, USERS_DB_ENC_PATH)
 
-    # Re-encrypt using new key
-    data = json.dumps(users, indent=2).encode("utf-8")
-    token = Fernet(new_key).encrypt(data)
-    tmp = USERS_DB_ENC_PATH + ".tmp"
-    with open(tmp, "wb") as f:
-        f.write(token)
-    os.replace(tmp, USERS_DB_ENC_PATH)
+    if not keep_old:
+        if os.path.exists(USERS_DB_RECORDS_PATH):
+            from record_store import RecordUserStore
+            RecordUserStore(USERS_DB_RECORDS_PATH, USERS_DB_ENC_PATH).rekey()
+        if os.path.exists(USERS_DB_SQLITE_PATH):
+            from sqlite_store import SqliteUserStore
+            SqliteUserStore(USERS_DB_SQLITE_PATH, USERS_DB_ENC_PATH).rekey()
+        key_manager.add_primary_key(new_key, keep_old=False)
@@ -1,36 +1,216 @@
+import os
+import gzip
 import json
-from config import LOG_PATH
+import zlib
+from typing import Iterable, Iterator, Optional
+import logger
+from config import LOG_PATH, DASHBOARD_STATE_PATH
+from log_segments import list_segments, open_segment, to_utc_iso, read_manifest, segment_path, TimeBound
+
+_TS_PREFIX = '{"ts": "'
+_TAIL_BYTES = 256  # checkpointed fingerprint of what was summarized last
+
+
+def iter_events(since: TimeBound = None, until: TimeBound = None,
+                events: Optional[Iterable[str]] = None, username: Optional[str] = None) -> Iterator[dict]:
+    """
+    Stream events oldest first, one line at a time, optionally limited to a
+    time window, a set of event names and/or one username. Segments outside
+    the window are skipped via the manifest; inside a segment, lines are
+    rejected by substring/prefix checks before paying for json.loads.
+    """
+    logger.flush()
+    since, until = to_utc_iso(since), to_utc_iso(until)
+    wanted = set(events) if events else None
+    # log_event writes keys in a fixed order with json.dumps defaults, so these
+    # substrings appear verbatim in every matching line
+    event_needles = [f'"event": {json.dumps(e)}' for e in wanted] if wanted else None
+    user_needle = f'"username": {json.dumps(username)}' if username else None
+
+    for path in list_segments(since, until):
+        try:
+            f = open_segment(path)
+        except FileNotFoundError:
+            continue
+        with f:
+            for line in f:
+                if event_needles and not any(n in line for n in event_needles):
+                    continue
+                if user_needle and user_needle not in line:
+                    continue
+                if since or until:
+                    ts = _line_ts(line)
+                    if ts and ((since and ts < since) or (until and ts > until)):
+                        continue
+                if not line.strip():
+                    continue
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                if wanted and e.get("event") not in wanted:
+                    continue
+                if username and e.get("username") != username:
+                    continue
+                ts = e.get("ts") or ""
+                if (since and ts < since) or (until and ts > until):
+                    continue
+                yield e
 
 
 def read_events() -> list[dict]:
-    try:
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            return [json.loads(line) for line in f if line.strip()]
-    except FileNotFoundError:
-        return []
+    """All events from sealed segments and the active log, oldest first."""
+    return list(iter_events())
 
 
-def summarize_events(events: list[dict]) -> dict:
-    summary = {
+def _empty_summary() -> dict:
+    return {
         "logins": 0,
         "failed_attempts": 0,
         "freeze_events": 0,
         "last_login_per_user": {}
     }
+
+
+def _apply_event(summary: dict, e: dict) -> None:
+    event = e.get("event")
+    if event == "LOGIN_SUCCESS":
+        summary["logins"] += 1
+        u = e.get("username")
+        if u:
+            summary["last_login_per_user"][u] = e.get("ts")
+    elif event == "LOGIN_FAIL":
+        summary["failed_attempts"] += 1
+    elif event in ("FREEZE_ON", "FREEZE_OFF"):
+        summary["freeze_events"] += 1
+
+
+def summarize_events(events: Iterable[dict]) -> dict:
+    """Totals over any iterable of events; pass iter_events() to keep memory flat."""
+    summary = _empty_summary()
     for e in events:
-        event = e.get("event")
-        if event == "LOGIN_SUCCESS":
-            summary["logins"] += 1
-            u = e.get("username")
-            if u:
-                summary["last_login_per_user"][u] = e.get("ts")
-        elif event == "LOGIN_FAIL":
-            summary["failed_attempts"] += 1
-        elif event in ("FREEZE_ON", "FREEZE_OFF"):
-            summary["freeze_events"] += 1
+        _apply_event(summary, e)
     return summary
 
 
+# -------- incremental summary --------
+# The checkpoint remembers which file the active log was (inode + first line)
+# and how many bytes of it were already summarized, plus a crc of the bytes just
+# before that offset, so a log truncated and rewritten past the offset (same
+# inode, same first line) isn't mistaken for an append. A refresh only parses what
+# was appended since; if the file was rotated, the rest of it is read from its
+# sealed segment and newer segments are added whole; if it can't be matched
+# (truncated, deleted by retention) the summary is rebuilt from scratch.
+
+def _load_checkpoint() -> dict:
+    try:
+        with open(DASHBOARD_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_checkpoint(state: dict) -> None:
+    os.makedirs(os.path.dirname(DASHBOARD_STATE_PATH), exist_ok=True)
+    tmp = f"{DASHBOARD_STATE_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, DASHBOARD_STATE_PATH)
+
+
+def _tail(f, offset: int) -> int:
+    start = max(0, offset - _TAIL_BYTES)
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start))
+
+
+def _consume(f, summary: dict, offset: int = 0) -> int:
+    """Apply complete lines from a binary stream starting at offset; returns the new offset."""
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # half-written batch; pick it up next refresh
+        offset += len(line)
+        if line.strip():
+            try:
+                _apply_event(summary, json.loads(line))
+            except ValueError:
+                pass
+    return offset
+
+
+def _consume_segment(seg: dict, summary: dict, offset: int = 0) -> None:
+    path = segment_path(seg)
+    if not os.path.exists(path) and os.path.exists(path + ".gz"):
+        path += ".gz"
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        _consume(f, summary, offset)
+
+
+def refresh_summary() -> dict:
+    """
+    Summary of the whole log history, updated from the persisted checkpoint.
+    Cost is proportional to the events appended since the last refresh.
+    """
+    logger.flush()
+    state = _load_checkpoint()
+    summary = state.get("summary") or _empty_summary()
+    segments = read_manifest()["segments"]
+    ino, offset = state.get("inode"), state.get("offset", 0)
+    try:
+        st = os.stat(LOG_PATH)
+        with open(LOG_PATH, "rb") as f:
+            first = f.readline().decode("utf-8", "replace")
+            tail = _tail(f, offset) if st.st_size >= offset else None
+    except FileNotFoundError:
+        st, first, tail = None, "", None
+
+    same_file = (st is not None and st.st_ino == ino and first == state.get("first_line")
+                 and tail is not None and tail == state.get("tail"))
+    if not same_file:
+        rotated = None
+        if ino is not None:
+            first_ts = _line_ts(state.get("first_line", ""))
+            for i, seg in enumerate(segments):
+                if seg.get("inode") == ino and (not first_ts or seg.get("first_ts") == first_ts):
+                    rotated = i
+        try:
+            if rotated is None:
+                summary = _empty_summary()
+                for seg in segments:
+                    _consume_segment(seg, summary)
+            else:
+                _consume_segment(segments[rotated], summary, offset)
+                for seg in segments[rotated + 1:]:
+                    _consume_segment(seg, summary)
+        except FileNotFoundError:
+            # a segment vanished mid-refresh (retention); start over next time
+            _save_checkpoint({})
+            return summarize_events(iter_events())
+        offset = 0
+
+    tail = None
+    if st is not None:
+        with open(LOG_PATH, "rb") as f:
+            offset = _consume(f, summary, offset)
+            tail = _tail(f, offset)
+    _save_checkpoint({
+        "summary": summary,
+        "inode": st.st_ino if st else None,
+        "first_line": first,
+        "offset": offset if st else 0,
+        "tail": tail,
+    })
+    return summary
+
+
+def _line_ts(line: str) -> Optional[str]:
+    if not line.startswith(_TS_PREFIX):
+        return None
+    return line[len(_TS_PREFIX):line.find('"', len(_TS_PREFIX))]
+
+
 def print_console_dashboard(summary: dict) -> None:
     print("\n=== Activity Summary ===")
     print(f"Logins: {summary['logins']}")
@@ -1,7 +1,14 @@
+import io
 import os
-from typing import List
-from config import PROTECTED_DIR
+import mmap
+import codecs
+import hashlib
+import tempfile
+from typing import List, Dict, Optional, BinaryIO, Callable, Iterator
+from config import PROTECTED_DIR, PROTECTED_FILES_ENCRYPTED, PROTECTED_DEDUP, VAULT_CHUNK_SIZE, MMAP_THRESHOLD
 from session import session
+from file_catalog import catalog, TMP_SUFFIX, remove_name, replace_name
+import vault
 
 os.makedirs(PROTECTED_DIR, exist_ok=True)
 
@@ -14,22 +21,168 @@ def require_auth() -> None:
 
 
 def list_protected_files() -> List[str]:
+    return [e["name"] for e in list_protected_entries()]
+
+
+def list_protected_entries(sort: str = "name", descending: bool = False, pattern: Optional[str] = None,
+                           offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Catalog rows (name, size, mtime_ns, owner, created_by, created_at,
+    content_hash), sorted/filtered/paged by the catalog. Size is on-disk size.
+    """
     require_auth()
-    return [f for f in os.listdir(PROTECTED_DIR) if os.path.isfile(os.path.join(PROTECTED_DIR, f))]
+    catalog.reconcile()
+    return catalog.list_entries(sort, descending, pattern, offset, limit)
 
 
-def open_protected_file(filename: str) -> str:
+def describe_protected_files(names: List[str]) -> Dict[str, Dict]:
+    """Catalog rows for just these names (e.g. the rows on screen), without reconciling."""
+    require_auth()
+    found = catalog.get_many(names)
+    if len(found) < len(names) and catalog.reconcile():
+        found = catalog.get_many(names)  # names that showed up since the last listing
+    return found
+
+
+def refresh_protected_entry(filename: str) -> None:
+    """Update the catalog for one file that changed outside file_access."""
     require_auth()
+    catalog.restat(filename)
+
+
+def count_protected_files(pattern: Optional[str] = None) -> int:
+    require_auth()
+    catalog.reconcile()
+    return catalog.count(pattern)
+
+
+def _resolve_existing(filename: str) -> str:
     full = os.path.abspath(os.path.join(PROTECTED_DIR, filename))
     if not full.startswith(os.path.abspath(PROTECTED_DIR) + os.sep):
         raise PermissionError("Invalid path")
-    with open(full, "r", encoding="utf-8") as f:
-        return f.read()
+    return full
 
 
-def add_protected_file(filename: str, content: str) -> None:
-    """Create or overwrite a file inside the protected dir. Filename must be a simple name."""
+class _VaultStream(io.RawIOBase):
+    """Seekable, read-only plaintext view of a vault file (decrypts per chunk)."""
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        self._reader = vault.VaultReader(self._f)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._reader.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, b) -> int:
+        # stay within one chunk per call so each read decrypts at most one chunk
+        cs = self._reader.chunk_size
+        want = min(len(b), cs - self._pos % cs)
+        data = self._reader.read_range(self._pos, want)
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def open_protected_stream(filename: str) -> BinaryIO:
+    """Binary, seekable stream of a protected file's plaintext (vault files are decrypted on the fly)."""
+    require_auth()
+    full = _resolve_existing(filename)
+    if vault.is_vault_file(full):
+        return io.BufferedReader(_VaultStream(full), buffer_size=VAULT_CHUNK_SIZE)
+    return open(full, "rb")
+
+
+def protected_file_size(filename: str) -> int:
+    """Plaintext size in bytes."""
+    require_auth()
+    full = _resolve_existing(filename)
+    if vault.is_vault_file(full):
+        with open(full, "rb") as f:
+            return vault.VaultReader(f).size
+    return os.path.getsize(full)
+
+
+def iter_protected_chunks(filename: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open_protected_stream(filename) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def read_protected_range(filename: str, offset: int, length: int) -> bytes:
+    """
+    Bytes [offset, offset+length) of a protected file. Large plaintext files
+    are mmap'ed so only the touched pages are read; vault files decrypt only
+    the chunks covering the range.
+    """
     require_auth()
+    full = _resolve_existing(filename)
+    with open(full, "rb") as f:
+        if f.read(len(vault.MAGIC)) == vault.MAGIC:
+            f.seek(0)
+            return vault.VaultReader(f).read_range(offset, length)
+        size = os.fstat(f.fileno()).st_size
+        if offset >= size or length <= 0:
+            return b""
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm[offset:offset + length]
+        f.seek(offset)
+        return f.read(length)
+
+
+def is_binary_protected_file(filename: str, sample_size: int = 8192) -> bool:
+    """Heuristic: NUL bytes or invalid UTF-8 in the first sample_size bytes."""
+    sample = read_protected_range(filename, 0, sample_size)
+    if b"\0" in sample:
+        return True
+    try:
+        # final=False: a multibyte char cut off at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return True
+    return False
+
+
+def protected_file_info(filename: str) -> Optional[Dict]:
+    """Catalog row for one file; the content hash is computed now if the catalog doesn't have it yet."""
+    require_auth()
+    catalog.reconcile()
+    info = catalog.get(filename)
+    if info is not None and info["content_hash"] is None:
+        h = hashlib.sha256()
+        for chunk in iter_protected_chunks(filename):
+            h.update(chunk)
+        info["content_hash"] = h.hexdigest()
+        catalog.set_hash(filename, info["content_hash"])
+    return info
+
+
+def open_protected_file(filename: str) -> str:
+    """Whole file as text. Use open_protected_stream/read_protected_range for large or binary files."""
+    with open_protected_stream(filename) as f:
+        return f.read().decode("utf-8")
+
+
+def _resolve_new(filename: str) -> str:
     # basic validation: no path separators and simple basename only
     if os.path.sep in filename or (os.path.altsep and os.path.altsep in filename):
         raise PermissionError("Invalid filename")
@@ -38,9 +191,127 @@ def add_protected_file(filename: str, content: str) -> None:
     full = os.path.abspath(os.path.join(PROTECTED_DIR, filename))
     if not full.startswith(os.path.abspath(PROTECTED_DIR) + os.sep):
         raise PermissionError("Invalid path")
-    # write content
-    with open(full, "w", encoding="utf-8") as f:
-        f.write(content)
+    return full
+
+
+class _HashingReader:
+    """Pass-through reader that hashes what flows through it (and reports bytes read to progress)."""
+
+    def __init__(self, src: BinaryIO, progress: Optional[Callable[[int, int], None]] = None, total: int = 0):
+        self._src = src
+        self.hash = hashlib.sha256()
+        self._progress = progress
+        self._total = total
+        self._done = 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._src.read(n)
+        self.hash.update(data)
+        if self._progress is not None:
+            self._done += len(data)
+            self._progress(self._done, self._total)
+        return data
+
+
+def _write_tmp(tmp: str, src: BinaryIO, progress: Optional[Callable[[int, int], None]] = None,
+               total: int = 0) -> str:
+    """Stream src into tmp (encrypted in vault mode). Returns the sha256 of the plaintext."""
+    reader = _HashingReader(src, progress, total)
+    try:
+        with open(tmp, "wb") as dst:
+            if PROTECTED_FILES_ENCRYPTED:
+                vault.encrypt_stream(reader, dst)
+            else:
+                while True:
+                    chunk = reader.read(VAULT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return reader.hash.hexdigest()
+
+
+def _store(full: str, open_src: Callable[[], BinaryIO], digest: Optional[str] = None,
+           progress: Optional[Callable[[int, int], None]] = None, total: int = 0) -> None:
+    """
+    Write a protected file and record it in the catalog. With PROTECTED_DEDUP
+    the body goes to the blob store and full becomes a reference to it; if
+    the content's digest is known up front and already stored, nothing is written.
+    """
+    name = os.path.basename(full)
+    dir_before = catalog.dir_mtime()
+    if not PROTECTED_DEDUP:
+        tmp = full + TMP_SUFFIX
+        with open_src() as src:
+            digest = _write_tmp(tmp, src, progress, total)
+        replace_name(tmp, full)  # full may still be a read-only blob link from dedup mode
+        catalog.record_write(name, digest, session.current_user, dir_before)
+        return
+    # plaintext and vault bodies of the same content are different blobs
+    suffix = ".vault" if PROTECTED_FILES_ENCRYPTED else ""
+    if digest and catalog.link_blob(name, digest + suffix, digest, session.current_user,
+                                    dir_before=dir_before, verify=lambda p: _matches_digest(p, digest)):
+        return
+    fd, tmp = tempfile.mkstemp(suffix=TMP_SUFFIX, dir=PROTECTED_DIR)
+    os.close(fd)
+    try:
+        with open_src() as src:
+            digest = _write_tmp(tmp, src, progress, total)  # the source may have changed since it was hashed
+        os.makedirs(os.path.dirname(catalog.blob_path(digest + suffix)), exist_ok=True)
+        catalog.link_blob(name, digest + suffix, digest, session.current_user, fresh=tmp, dir_before=dir_before,
+                          verify=lambda p: _matches_digest(p, digest))
+    finally:
+        if os.path.exists(tmp):
+            remove_name(tmp)
+
+
+def _matches_digest(path: str, digest: str) -> bool:
+    """Whether a stored blob's plaintext still hashes to digest (it may have been edited in place)."""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            if path.endswith(".vault"):
+                for chunk in vault.VaultReader(f).iter_chunks():
+                    h.update(chunk)
+            else:
+                for chunk in iter(lambda: f.read(VAULT_CHUNK_SIZE), b""):
+                    h.update(chunk)
+    except (OSError, vault.VaultError):
+        return False
+    return h.hexdigest() == digest
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(VAULT_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def add_protected_file(filename: str, content: str) -> None:
+    """Create or overwrite a file inside the protected dir. Filename must be a simple name."""
+    require_auth()
+    full = _resolve_new(filename)
+    data = content.encode("utf-8")
+    _store(full, lambda: io.BytesIO(data), hashlib.sha256(data).hexdigest() if PROTECTED_DEDUP else None)
+
+
+def import_protected_file(filename: str, src_path: str,
+                          progress: Optional[Callable[[int, int], None]] = None) -> None:
+    """
+    Copy a file from disk into the protected dir, streaming (encrypted in
+    vault mode). progress(bytes_copied, total_bytes) is called per chunk; an
+    exception raised from it aborts the copy.
+    """
+    require_auth()
+    full = _resolve_new(filename)
+    # hashing first is one extra read, but a duplicate then costs nothing to store
+    _store(full, lambda: open(src_path, "rb"), _file_digest(src_path) if PROTECTED_DEDUP else None,
+           progress, os.path.getsize(src_path))
 
 
 def delete_protected_file(filename: str) -> None:
@@ -53,4 +324,6 @@ def delete_protected_file(filename: str) -> None:
         raise PermissionError("Invalid path")
     if not os.path.exists(full):
         raise FileNotFoundError(filename)
-    os.remove(full)
+    dir_before = catalog.dir_mtime()
+    remove_name(full)
+    catalog.record_delete(filename, dir_before)
@@ -0,0 +1,353 @@
+import os
+import stat
+import sqlite3
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Optional, List, Dict
+from config import PROTECTED_DIR, PROTECTED_CATALOG_PATH
+
+# Metadata for everything in PROTECTED_DIR, so listings (sorted, filtered,
+# paged) come from one indexed query instead of a stat per file. file_access
+# records its own writes/deletes here; anything changed behind its back is
+# picked up by reconcile(), a single os.scandir pass that only runs when the
+# directory's mtime moved since the last one. Callers pass the directory mtime
+# from before their own change, so a catalog that was in sync then stays
+# marked in sync and the app's writes don't cost a rescan.
+#
+# It also tracks the dedup blob store: with PROTECTED_DEDUP, file bodies live
+# once per content in PROTECTED_DIR/.blobs/<aa>/<id> and names are hard links
+# to them (plain copies where linking isn't possible). blobs.refs counts the
+# names pointing at each blob; the blob is removed when it drops to zero.
+# Blobs are read-only (0444), and so is every name linked to one, since they
+# share the inode: an in-place edit of one name would otherwise rewrite all
+# its duplicates and leave the blob out of step with its content hash. A
+# stored blob is re-verified (link_blob's verify) before it is reused.
+# File operations follow the transaction that justifies them: a blob moved
+# into place is taken out again if the transaction rolls back, and a blob
+# whose count hit zero is only unlinked after the commit (re-checked under a
+# fresh write lock, in case another writer stored the same content again).
+
+TMP_SUFFIX = ".~bss-tmp"  # in-flight writes, never listed
+BLOB_DIR = ".blobs"
+_READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name         TEXT PRIMARY KEY,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    owner        TEXT,
+    created_by   TEXT,
+    created_at   TEXT,
+    content_hash TEXT,
+    blob         TEXT
+);
+CREATE INDEX IF NOT EXISTS files_size ON files(size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files(mtime_ns);
+CREATE TABLE IF NOT EXISTS blobs (
+    id   TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+SORT_COLUMNS = {"name": "name", "size": "size", "mtime": "mtime_ns", "owner": "owner", "created_by": "created_by"}
+_COLUMNS = ("name", "size", "mtime_ns", "owner", "created_by", "created_at", "content_hash")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def remove_name(path: str) -> None:
+    """os.remove that also takes read-only (blob-linked) names; Windows refuses to delete those."""
+    try:
+        os.remove(path)
+    except PermissionError:
+        if not os.path.exists(path):
+            raise
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        os.remove(path)
+
+
+def replace_name(src: str, dst: str) -> None:
+    """os.replace onto a possibly read-only (blob-linked) dst; Windows refuses to replace those."""
+    try:
+        os.replace(src, dst)
+    except PermissionError:
+        if not os.path.exists(dst):
+            raise
+        os.chmod(dst, stat.S_IREAD | stat.S_IWRITE)
+        os.replace(src, dst)
+
+
+class FileCatalog:
+    def __init__(self, path: str = PROTECTED_CATALOG_PATH, root: str = PROTECTED_DIR):
+        self.path = path
+        self.root = root
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if "blob" not in {r[1] for r in conn.execute("PRAGMA table_info(files)")}:
+                conn.execute("ALTER TABLE files ADD COLUMN blob TEXT")  # catalogs from before dedup
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; also serializes blob store changes across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.dead, self._local.undo = [], []
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            for path in self._local.undo:
+                try:
+                    remove_name(path)
+                except FileNotFoundError:
+                    pass
+            raise
+        finally:
+            dead, self._local.dead, self._local.undo = self._local.dead, [], []
+        if dead:
+            self._remove_dead(conn, dead)
+
+    def _remove_dead(self, conn: sqlite3.Connection, blobs: List[str]) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for blob in blobs:
+                if conn.execute("SELECT 1 FROM blobs WHERE id = ?", (blob,)).fetchone() is None:
+                    try:
+                        remove_name(self.blob_path(blob))
+                    except OSError:
+                        pass  # the row is gone; a leftover file is just overwritten if the content returns
+        finally:
+            conn.execute("COMMIT")
+
+    def dir_mtime(self) -> int:
+        return os.stat(self.root).st_mtime_ns
+
+    def _mark_synced(self, conn: sqlite3.Connection, dir_before: Optional[int]) -> None:
+        """After our own change to root: if the catalog matched the directory as of dir_before, it still does."""
+        if dir_before is None:
+            return
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dir_mtime_ns'").fetchone()
+        if row and row[0] == dir_before:
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'dir_mtime_ns'", (self.dir_mtime(),))
+
+    def blob_path(self, blob: str) -> str:
+        return os.path.join(self.root, BLOB_DIR, blob[:2], blob)
+
+    def _release(self, conn: sqlite3.Connection, blob: Optional[str]) -> None:
+        if not blob:
+            return
+        conn.execute("UPDATE blobs SET refs = refs - 1 WHERE id = ?", (blob,))
+        row = conn.execute("SELECT refs FROM blobs WHERE id = ?", (blob,)).fetchone()
+        if row and row[0] <= 0:
+            conn.execute("DELETE FROM blobs WHERE id = ?", (blob,))
+            self._local.dead.append(blob)  # unlinked once this transaction has committed
+        elif row:
+            self._protect(self.blob_path(blob))  # removing a name on Windows cleared the shared read-only bit
+
+    @staticmethod
+    def _protect(path: str) -> None:
+        try:
+            os.chmod(path, _READ_ONLY)
+        except OSError:
+            pass
+    def _upsert(self, conn: sqlite3.Connection, name: str, content_hash: Optional[str],
+                user: Optional[str], blob: Optional[str]) -> None:
+        old = conn.execute("SELECT blob FROM files WHERE name = ?", (name,)).fetchone()
+        st = os.stat(os.path.join(self.root, name))
+        conn.execute(
+            "INSERT INTO files(name, size, mtime_ns, owner, created_by, created_at, content_hash, blob) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "owner = excluded.owner, content_hash = excluded.content_hash, blob = excluded.blob",
+            (name, st.st_size, st.st_mtime_ns, user, user, _now_iso(), content_hash, blob),
+        )
+        if blob:
+            conn.execute("UPDATE blobs SET refs = refs + 1 WHERE id = ?", (blob,))
+        if old:
+            self._release(conn, old[0])
+
+    # -------- write-through from file_access --------
+    def record_write(self, name: str, content_hash: Optional[str], user: Optional[str],
+                     dir_before: Optional[int] = None) -> None:
+        with self.transaction() as conn:
+            self._upsert(conn, name, content_hash, user, None)
+            self._mark_synced(conn, dir_before)
+
+    def record_delete(self, name: str, dir_before: Optional[int] = None) -> None:
+        with self.transaction() as conn:
+            row = conn.execute("SELECT blob FROM files WHERE name = ?", (name,)).fetchone()
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+            if row:
+                self._release(conn, row[0])
+            self._mark_synced(conn, dir_before)
+
+    def link_blob(self, name: str, blob: str, content_hash: str, user: Optional[str],
+                  fresh: Optional[str] = None, dir_before: Optional[int] = None,
+                  verify: Optional[Callable[[str], bool]] = None) -> bool:
+        """
+        Point name at blob. If the blob isn't stored yet, fresh (a finished tmp
+        file with its body) is moved into place; without fresh, returns False so
+        the caller can write one. A fresh file that lost a race is discarded.
+        verify(path) re-checks a stored body (e.g. its digest) before it is
+        reused; one that fails counts as not stored, and fresh replaces it.
+        """
+        path = self.blob_path(blob)
+        # outside the write lock: verify may read the whole body
+        intact = os.path.exists(path) and (verify is None or verify(path))
+        with self.transaction() as conn:
+            known = conn.execute("SELECT 1 FROM blobs WHERE id = ?", (blob,)).fetchone() and intact
+            if not known:
+                if fresh is None:
+                    return False
+                os.chmod(fresh, _READ_ONLY)
+                replace_name(fresh, path)
+                self._local.undo.append(path)
+                # the row may survive its file (deleted by hand): keep the names already counted
+                conn.execute("INSERT INTO blobs(id, size, refs) VALUES (?, ?, 0) "
+                             "ON CONFLICT(id) DO UPDATE SET size = excluded.size",
+                             (blob, os.path.getsize(path)))
+            elif fresh is not None:
+                os.remove(fresh)
+            full = os.path.join(self.root, name)
+            tmp = full + TMP_SUFFIX
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)  # no hard links here: a private copy still counts as a ref
+                self._protect(tmp)
+            self._protect(path)
+            replace_name(tmp, full)
+            self._upsert(conn, name, content_hash, user, blob)
+            self._mark_synced(conn, dir_before)
+        return True
+
+    def set_hash(self, name: str, content_hash: str) -> None:
+        self._conn().execute("UPDATE files SET content_hash = ? WHERE name = ?", (content_hash, name))
+
+    # -------- reconciliation --------
+    def reconcile(self, force: bool = False) -> bool:
+        """
+        Sync the catalog with the directory. Skipped unless the directory
+        mtime changed since the last pass (or force=True). Returns True if a
+        pass ran. Changed files keep their created_by but lose their cached hash.
+        """
+        conn = self._conn()
+        dir_mtime = os.stat(self.root).st_mtime_ns
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dir_mtime_ns'").fetchone()
+        if not force and row and row[0] == dir_mtime:
+            return False
+        on_disk = {}
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(TMP_SUFFIX) or not entry.is_file(follow_symlinks=False):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                on_disk[entry.name] = (st.st_size, st.st_mtime_ns)
+        known = {name: (size, mtime) for name, size, mtime in conn.execute("SELECT name, size, mtime_ns FROM files")}
+        with self.transaction():
+            for name in known.keys() - on_disk.keys():
+                self._forget(conn, name)
+            for name, (size, mtime) in on_disk.items():
+                if known.get(name) == (size, mtime):
+                    continue
+                self._note_external(conn, name, size, mtime, name in known)
+            conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('dir_mtime_ns', ?)", (dir_mtime,))
+        return True
+
+    def restat(self, name: str) -> None:
+        """
+        Re-read one file (e.g. on a change notification). In-place edits don't
+        touch the directory mtime, so reconcile() alone wouldn't notice them.
+        """
+        try:
+            st = os.stat(os.path.join(self.root, name), follow_symlinks=False)
+        except FileNotFoundError:
+            st = None
+        with self.transaction() as conn:
+            row = conn.execute("SELECT size, mtime_ns FROM files WHERE name = ?", (name,)).fetchone()
+            if st is None or not stat.S_ISREG(st.st_mode):
+                if row:
+                    self._forget(conn, name)
+                return
+            if row is None or tuple(row) != (st.st_size, st.st_mtime_ns):
+                self._note_external(conn, name, st.st_size, st.st_mtime_ns, row is not None)
+
+    def _note_external(self, conn: sqlite3.Connection, name: str, size: int, mtime: int, known: bool) -> None:
+        if known:
+            self._forget(conn, name)  # changed outside the app: no longer a blob reference
+        conn.execute(
+            "INSERT INTO files(name, size, mtime_ns, created_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "content_hash = NULL, blob = NULL",
+            (name, size, mtime, _now_iso()),
+        )
+
+    def _forget(self, conn: sqlite3.Connection, name: str) -> None:
+        row = conn.execute("SELECT blob FROM files WHERE name = ?", (name,)).fetchone()
+        if row and row[0]:
+            conn.execute("UPDATE files SET blob = NULL WHERE name = ?", (name,))
+            self._release(conn, row[0])
+        if not os.path.exists(os.path.join(self.root, name)):
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    # -------- queries --------
+    @staticmethod
+    def _where(pattern: Optional[str]):
+        if not pattern:
+            return "", ()
+        # case-insensitive substring match on the name
+        escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return " WHERE name LIKE ? ESCAPE '\\'", (f"%{escaped}%",)
+
+    def list_entries(self, sort: str = "name", descending: bool = False, pattern: Optional[str] = None,
+                     offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"Unknown sort key: {sort!r}")
+        where, params = self._where(pattern)
+        sql = (f"SELECT {', '.join(_COLUMNS)} FROM files{where} "
+               f"ORDER BY {column} {'DESC' if descending else 'ASC'}, name LIMIT ? OFFSET ?")
+        rows = self._conn().execute(sql, params + (limit if limit is not None else -1, offset))
+        return [dict(zip(_COLUMNS, r)) for r in rows]
+
+    def count(self, pattern: Optional[str] = None) -> int:
+        where, params = self._where(pattern)
+        return self._conn().execute(f"SELECT COUNT(*) FROM files{where}", params).fetchone()[0]
+
+    def get_many(self, names: List[str]) -> Dict[str, Dict]:
+        out = {}
+        conn = self._conn()
+        for i in range(0, len(names), 500):  # stay under SQLite's bound-parameter limit
+            batch = names[i:i + 500]
+            sql = f"SELECT {', '.join(_COLUMNS)} FROM files WHERE name IN ({', '.join('?' * len(batch))})"
+            for row in conn.execute(sql, batch):
+                out[row[0]] = dict(zip(_COLUMNS, row))
+        return out
+
+    def get(self, name: str) -> Optional[Dict]:
+        row = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM files WHERE name = ?", (name,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+
+catalog = FileCatalog()
@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Cross-platform advisory file locks.
+# POSIX: fcntl.flock, shared or exclusive. The wait always happens in the
+#        kernel. flock() has no timeout, so a timed wait blocks on a dup of the
+#        descriptor in a helper thread; if the deadline passes first, the helper
+#        drops the lock as soon as it gets it. A descriptor that timed out must
+#        be closed, not locked again (every caller opens a fresh one).
+# Windows: msvcrt.locking on the first byte (exclusive only, shared requests
+#        are promoted). It has no timed wait either (LK_LOCK itself retries once
+#        a second), so there we poll non-blocking with a short backoff.
+
+_BACKOFF_START = 0.0005
+_BACKOFF_MAX = 0.02
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+class LockStats:
+    """Lock wait metrics, shared by every lock taken through this module."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, contended: bool) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            if contended:
+                self.contended += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            avg = self.total_wait / self.acquisitions if self.acquisitions else 0.0
+            return {
+                "acquisitions": self.acquisitions,
+                "contended": self.contended,
+                "timeouts": self.timeouts,
+                "total_wait_ms": self.total_wait * 1000,
+                "avg_wait_ms": avg * 1000,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+lock_stats = LockStats()
+
+
+def _try_lock(fd: int, exclusive: bool) -> bool:
+    if os.name == "nt":
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+    flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+    try:
+        fcntl.flock(fd, flags)
+        return True
+    except (BlockingIOError, PermissionError):
+        return False
+
+
+def _wait_in_kernel(fd: int, exclusive: bool, timeout: float) -> bool:
+    """Blocking flock() on a helper thread, for at most timeout seconds. True once fd holds the lock."""
+    dup = os.dup(fd)  # same open file description, so a lock taken through it is fd's lock
+    cond = threading.Condition()
+    state = {"done": False, "abandoned": False, "error": None}
+
+    def wait():
+        try:
+            fcntl.flock(dup, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except OSError as e:
+            state["error"] = e
+        with cond:
+            if state["abandoned"]:
+                if state["error"] is None:
+                    fcntl.flock(dup, fcntl.LOCK_UN)  # too late: the caller gave up on it
+            else:
+                state["done"] = True
+                cond.notify()
+        os.close(dup)
+
+    threading.Thread(target=wait, name="flock-wait", daemon=True).start()
+    with cond:
+        if not cond.wait_for(lambda: state["done"], timeout):
+            state["abandoned"] = True
+            return False
+    if state["error"] is not None:
+        raise state["error"]
+    return True
+
+
+def acquire(fd: int, exclusive: bool = True, timeout: Optional[float] = None) -> None:
+    start = time.perf_counter()
+    if _try_lock(fd, exclusive):
+        lock_stats.record(0.0, False)
+        return
+    if os.name != "nt":
+        if timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        elif not _wait_in_kernel(fd, exclusive, timeout):
+            _timed_out(timeout)
+    else:
+        delay = _BACKOFF_START
+        deadline = None if timeout is None else start + timeout
+        while not _try_lock(fd, exclusive):
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                _timed_out(timeout)
+            time.sleep(delay if deadline is None else min(delay, deadline - now))
+            delay = min(delay * 2, _BACKOFF_MAX)
+    lock_stats.record(time.perf_counter() - start, True)
+
+
+def _timed_out(timeout: float) -> None:
+    with lock_stats._lock:
+        lock_stats.timeouts += 1
+    raise LockTimeout(f"Timed out after {timeout}s waiting for file lock")
+
+
+def release(fd: int) -> None:
+    try:
+        if os.name == "nt":
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    except OSError:
+        pass  # Ignore errors during unlock
+
+
+@contextmanager
+def locked(file_handle, exclusive: bool = True, timeout: Optional[float] = None):
+    """Hold a lock on an open file for the duration of the with-block."""
+    fd = file_handle.fileno()
+    acquire(fd, exclusive, timeout)
+    try:
+        yield file_handle
+    finally:
+        release(fd)
@@ -0,0 +1,89 @@
+import os
+import mmap
+import time
+import struct
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+from config import FREEZE_STATE_PATH
+from file_lock import locked
+
+# System freeze shared by every instance on this data directory.
+# The state file is a fixed 16-byte record, memory-mapped by readers:
+#   <Q seq> <d frozen_until (unix ts, 0 = not frozen)>
+# Writers hold the sidecar .lock file, bump seq to odd, write, bump to even
+# (a seqlock), so readers never need a lock or a syscall: checking for a change
+# is one 8-byte read from the map. version == seq // 2.
+
+_RECORD = struct.Struct("<Qd")
+
+
+class FreezeState:
+    def __init__(self, path: str = FREEZE_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mm: Optional[mmap.mmap] = None
+        self._seen_seq = -1
+        self._until = 0.0
+
+    def _map(self) -> mmap.mmap:
+        if self._mm is None:
+            with self._lock:
+                if self._mm is None:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    try:
+                        with open(self.path, "xb") as f:
+                            f.write(b"\0" * _RECORD.size)
+                    except FileExistsError:
+                        pass
+                    with open(self.path, "r+b") as f:
+                        self._mm = mmap.mmap(f.fileno(), _RECORD.size)
+        return self._mm
+
+    def _seq(self) -> int:
+        return struct.unpack_from("<Q", self._map(), 0)[0]
+
+    def _refresh(self) -> None:
+        mm = self._map()
+        for _ in range(100):
+            seq, until = _RECORD.unpack_from(mm, 0)
+            if seq == self._seen_seq:
+                return
+            if seq % 2 == 0 and struct.unpack_from("<Q", mm, 0)[0] == seq:
+                self._seen_seq = seq
+                self._until = until
+                return
+            time.sleep(0)  # writer mid-update
+
+    def version(self) -> int:
+        """Bumped on every set(); cheap enough to poll from a UI timer."""
+        return self._seq() // 2
+
+    def frozen_until_ts(self) -> float:
+        self._refresh()
+        return self._until
+
+    def frozen_until(self) -> Optional[str]:
+        until = self.frozen_until_ts()
+        if not until:
+            return None
+        return datetime.fromtimestamp(until, timezone.utc).isoformat()
+
+    def is_frozen(self) -> bool:
+        until = self.frozen_until_ts()
+        return bool(until) and time.time() < until
+
+    def set(self, iso_ts: Optional[str]) -> None:
+        until = datetime.fromisoformat(iso_ts).timestamp() if iso_ts else 0.0
+        mm = self._map()
+        with open(self.path + ".lock", "a+b") as lf, locked(lf):
+            seq = struct.unpack_from("<Q", mm, 0)[0]
+            if seq % 2:
+                seq += 1  # a writer died mid-update; its lock is gone, so recover
+            struct.pack_into("<Q", mm, 0, seq + 1)
+            struct.pack_into("<d", mm, 8, until)
+            struct.pack_into("<Q", mm, 0, seq + 2)
+            mm.flush()
+
+
+freeze_state = FreezeState()
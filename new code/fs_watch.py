@@ -0,0 +1,200 @@
+import os
+import sys
+import stat
+import queue
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from typing import Dict, List, Optional, Set, Tuple
+from config import PROTECTED_DIR, FS_WATCH_POLL_SECONDS, FS_WATCH_DEBOUNCE
+from file_catalog import TMP_SUFFIX
+
+# Change notifications for the protected dir. One background thread watches
+# it (inotify through ctypes on Linux, otherwise a periodic os.scandir diff)
+# and pushes batches of (kind, name) deltas, kind being "added", "removed" or
+# "modified", onto every subscriber's queue. The GUI drains its queue from an
+# after() poll, so nothing Tk-related runs on the watcher thread.
+
+Delta = Tuple[str, str]
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+# IN_MODIFY as well as IN_CLOSE_WRITE: a file held open and edited in place
+# (say a read-only dedup link someone chmodded) should show up while it's open
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DirWatcher:
+    def __init__(self, root: str = PROTECTED_DIR):
+        self.root = root
+        self._subscribers: List["queue.Queue"] = []
+        self._lock = threading.Lock()
+        self._stop: Optional[threading.Event] = None  # set to end the running watcher thread
+        self.backend: Optional[str] = None  # "inotify" or "poll" once started
+
+    # -------- subscriptions --------
+    def subscribe(self) -> "queue.Queue":
+        """Queue that receives lists of (kind, name) deltas. Starts the watcher if needed."""
+        q: "queue.Queue" = queue.Queue()
+        with self._lock:
+            self._subscribers.append(q)
+            if self._stop is None:
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), name="fs-watch", daemon=True).start()
+        return q
+
+    def unsubscribe(self, q: "queue.Queue") -> None:
+        """Drop a queue; the watcher thread stops with the last subscriber."""
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+            if not self._subscribers and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _publish(self, stop: threading.Event, deltas: List[Delta]) -> None:
+        if not deltas or stop.is_set():
+            return
+        with self._lock:
+            for q in self._subscribers:
+                q.put(deltas)
+
+    # -------- diffing --------
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snap = {}
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if entry.name.endswith(TMP_SUFFIX) or not entry.is_file(follow_symlinks=False):
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    snap[entry.name] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return snap
+
+    @staticmethod
+    def _diff(known: Dict[str, Tuple[int, int]], snap: Dict[str, Tuple[int, int]]) -> List[Delta]:
+        """Deltas from known to snap; known is updated in place."""
+        deltas = [("removed", name) for name in known.keys() - snap.keys()]
+        for name, sig in snap.items():
+            old = known.get(name)
+            if old is None:
+                deltas.append(("added", name))
+            elif old != sig:
+                deltas.append(("modified", name))
+        known.clear()
+        known.update(snap)
+        return sorted(deltas, key=lambda d: d[1])
+
+    def _recheck(self, known: Dict[str, Tuple[int, int]], names: Set[str]) -> List[Delta]:
+        """Like _diff, but only for the given names (inotify path)."""
+        deltas = []
+        for name in sorted(names):
+            if name.endswith(TMP_SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.root, name), follow_symlinks=False)
+                sig = (st.st_size, st.st_mtime_ns) if stat.S_ISREG(st.st_mode) else None
+            except FileNotFoundError:
+                sig = None
+            old = known.get(name)
+            if sig is None:
+                if old is not None:
+                    del known[name]
+                    deltas.append(("removed", name))
+            elif old is None:
+                known[name] = sig
+                deltas.append(("added", name))
+            elif old != sig:
+                known[name] = sig
+                deltas.append(("modified", name))
+        return deltas
+
+    # -------- backends --------
+    def _run(self, stop: threading.Event) -> None:
+        known = self._snapshot()
+        libc = _load_inotify()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC) if libc else -1
+        if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.root), _WATCH_MASK) >= 0:
+            self.backend = "inotify"
+            try:
+                self._run_inotify(fd, stop, known)
+            finally:
+                os.close(fd)
+        elif fd >= 0:
+            os.close(fd)
+        if not stop.is_set():
+            self.backend = "poll"
+            self._run_poll(stop, known)
+
+    def _run_poll(self, stop: threading.Event, known: Dict[str, Tuple[int, int]]) -> None:
+        while not stop.wait(FS_WATCH_POLL_SECONDS):
+            self._publish(stop, self._diff(known, self._snapshot()))
+
+    def _read_events(self, fd: int, names: Set[str]) -> bool:
+        """Collect touched names from pending events. Returns False if a full rescan is needed."""
+        try:
+            buf = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return True
+        ok = True
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            _, mask, _, length = _EVENT.unpack_from(buf, pos)
+            name = buf[pos + _EVENT.size:pos + _EVENT.size + length].split(b"\0", 1)[0]
+            pos += _EVENT.size + length
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF):
+                ok = False
+            elif name and not mask & IN_ISDIR:
+                names.add(os.fsdecode(name))
+        return ok
+
+    def _run_inotify(self, fd: int, stop: threading.Event, known: Dict[str, Tuple[int, int]]) -> None:
+        while not stop.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if not ready:
+                continue
+            names: Set[str] = set()
+            ok = self._read_events(fd, names)
+            # coalesce a burst (e.g. create + write + close, or a bulk copy) into one batch
+            while not stop.wait(FS_WATCH_DEBOUNCE):
+                if not select.select([fd], [], [], 0)[0]:
+                    break
+                ok = self._read_events(fd, names) and ok
+            if ok:
+                self._publish(stop, self._recheck(known, names))
+            else:
+                self._publish(stop, self._diff(known, self._snapshot()))
+                if not os.path.isdir(self.root):
+                    return  # watch is gone with the directory; keep going by polling
+
+
+watcher = DirWatcher()
@@ -1,12 +1,13 @@
 import tkinter as tk
 import tkinter.ttk as ttk
-from config import GUI_TITLE
+from config import GUI_TITLE, FREEZE_POLL_MS
+from session import session
 from .theme import apply_theme
-from .frames.login import LoginFrame
-from .frames.register import RegisterFrame
-from .frames.files import FilesFrame
-from .frames.admin import AdminFrame
-from .frames.dashboard import DashboardFrame
+from .tasks import TaskRunner
+from .widgets import Spinner
+
+# Frame modules are imported the first time they're shown, so startup only
+# pays for the login frame.
 
 class App(tk.Tk):
     def __init__(self):
@@ -16,13 +17,61 @@ class App(tk.Tk):
         apply_theme(self)
         self.container = ttk.Frame(self)
         self.container.pack(fill="both", expand=True)
-        self.frames = {}
+        self.frames = {}            # frame class -> built frame (see navigate)
+        self._frames_user = None    # who session-bound frames were built for
+        self.current_frame = None
 
         self.status_var = tk.StringVar(value="Ready")
-        status = ttk.Label(self, textvariable=self.status_var, anchor="w")
-        status.pack(fill="x")
+        status_bar = ttk.Frame(self)
+        status_bar.pack(fill="x")
+        status = ttk.Label(status_bar, textvariable=self.status_var, anchor="w")
+        status.pack(side="left", fill="x", expand=True)
+        # busy indicator for background tasks: spinner + label, progress bar when a task reports a total
+        self.busy_progress = ttk.Progressbar(status_bar, length=120, maximum=100)
+        self.busy_spinner = Spinner(status_bar)
+        self.busy_spinner.pack(side="right")
+        self.tasks = TaskRunner(self)
+        self.tasks.add_busy_listener(self._on_busy)
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
 
-        self.navigate(LoginFrame)
+        # freeze change notifications: one cheap poll of the shared freeze
+        # record fans out to whichever frames subscribed
+        self._freeze_listeners = []
+        self._freeze_seen = (session.freeze_version(), session.is_frozen())
+        self.after(FREEZE_POLL_MS, self._poll_freeze)
+
+        self.show_login()
+
+    def subscribe_freeze(self, widget, callback) -> None:
+        """Call callback(frozen: bool) whenever the system freeze starts, ends or changes."""
+        self._freeze_listeners.append((widget, callback))
+
+    def _poll_freeze(self):
+        state = (session.freeze_version(), session.is_frozen())
+        if state != self._freeze_seen:
+            self._freeze_seen = state
+            self._freeze_listeners = [(w, cb) for w, cb in self._freeze_listeners if w.winfo_exists()]
+            # hidden (cached) frames catch up in their on_show instead
+            for w, cb in list(self._freeze_listeners):
+                if w.winfo_ismapped():
+                    cb(state[1])
+        self.after(FREEZE_POLL_MS, self._poll_freeze)
+
+    def _on_busy(self, count, label, done, total) -> None:
+        if not count:
+            self.busy_spinner.stop()
+            self.busy_progress.pack_forget()
+            return
+        self.busy_spinner.start((label or "Working...") + (f" (+{count - 1} more)" if count > 1 else ""))
+        if total:
+            self.busy_progress["value"] = 100 * done / total
+            if not self.busy_progress.winfo_ismapped():
+                self.busy_progress.pack(side="right", padx=(0, 6))
+
+    def destroy(self) -> None:
+        # window closed or app quitting: stop background tasks before Tk goes away
+        self.tasks.shutdown(cancel=True)
+        super().destroy()
 
     def set_status(self, msg: str) -> None:
         self.status_var.set(msg)
@@ -32,24 +81,50 @@ class App(tk.Tk):
         Toast(self, msg, duration)
 
     def navigate(self, frame_cls, **kwargs) -> None:
-        # Destroy current frame, create new
-        for child in self.container.winfo_children():
-            child.destroy()
-        frame = frame_cls(self.container, app=self, **kwargs)
+        """
+        Show frame_cls, building it the first time. Built frames are cached
+        and only hidden when navigating away; their optional on_hide/on_show
+        hooks stop and restart timers and refresh whatever went stale.
+        Frames with session_bound = True are rebuilt when the logged-in user
+        changes. Passing kwargs always builds a fresh frame.
+        """
+        if self.current_frame is not None:
+            if hasattr(self.current_frame, "on_hide"):
+                self.current_frame.on_hide()
+            self.current_frame.pack_forget()
+            self.current_frame = None
+        user = session.get_current_user()
+        if user != self._frames_user:
+            self._frames_user = user
+            for cls in [c for c, f in self.frames.items() if getattr(f, "session_bound", False)]:
+                self.frames.pop(cls).destroy()
+        frame = self.frames.get(frame_cls)
+        if frame is None or kwargs:
+            if frame is not None:
+                frame.destroy()
+            frame = self.frames[frame_cls] = frame_cls(self.container, app=self, **kwargs)
         frame.pack(fill="both", expand=True)
+        self.current_frame = frame
+        if hasattr(frame, "on_show"):
+            frame.on_show()
 
     # Convenience helpers for frames
     def show_login(self):
+        from .frames.login import LoginFrame
         self.navigate(LoginFrame)
 
     def show_register(self):
+        from .frames.register import RegisterFrame
         self.navigate(RegisterFrame)
 
     def show_files(self):
+        from .frames.files import FilesFrame
         self.navigate(FilesFrame)
 
     def show_admin(self):
+        from .frames.admin import AdminFrame
         self.navigate(AdminFrame)
 
     def show_dashboard(self):
+        from .frames.dashboard import DashboardFrame
         self.navigate(DashboardFrame)
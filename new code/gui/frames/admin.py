@@ -1,9 +1,13 @@
+import time
 import tkinter as tk
 import tkinter.ttk as ttk
-from admin import reset_password, list_users, unlock_system, lock_system
-import tkinter as tk
+from config import GUI_STALE_SECONDS
+from admin import reset_password, list_user_names, describe_users, unlock_system, lock_system
+from ..widgets import VirtualTable
 
 class AdminFrame(ttk.Frame):
+    session_bound = True
+
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -32,33 +36,52 @@ class AdminFrame(ttk.Frame):
         self.freeze_status = ttk.Label(self, text="")
         self.freeze_status.pack(anchor="w", pady=(4,0))
 
-        self.user_table = ttk.Treeview(self, columns=("username", "is_admin", "failed_attempts", "last_login_at"), show="headings", height=12)
-        self.user_table.heading("username", text="Username")
-        self.user_table.heading("is_admin", text="Admin")
-        self.user_table.heading("failed_attempts", text="Failed Attempts")
-        self.user_table.heading("last_login_at", text="Last Login")
-        self.user_table.column("username", width=120)
-        self.user_table.column("is_admin", width=60, anchor="center")
-        self.user_table.column("failed_attempts", width=100, anchor="center")
-        self.user_table.column("last_login_at", width=160)
+        self.user_table = VirtualTable(
+            self, [("username", "Username", 120), ("is_admin", "Admin", 60),
+                   ("failed_attempts", "Failed Attempts", 100), ("last_login_at", "Last Login", 160)],
+            self._fetch_rows, self.app.tasks, on_fetch_error=self._on_list_error, filter_label="Find user:")
         self.user_table.pack(fill="both", expand=True, pady=8)
 
+        self._freeze_job = None
+        self._listed_at = None
+        self.app.subscribe_freeze(self, lambda frozen: self._refresh_freeze_status())
+
+    def on_show(self):
         self._refresh_freeze_status()
+        if self._listed_at is not None and time.monotonic() - self._listed_at > GUI_STALE_SECONDS:
+            self.on_list()
+
+    def on_hide(self):
+        if self._freeze_job is not None:
+            self.after_cancel(self._freeze_job)
+            self._freeze_job = None
 
     def _refresh_freeze_status(self):
+        # driven by App freeze notifications; ticks every second only while frozen
         from auth_manager import is_system_frozen, freeze_remaining_seconds
+        if self._freeze_job is not None:
+            self.after_cancel(self._freeze_job)
+            self._freeze_job = None
         if is_system_frozen():
             secs = freeze_remaining_seconds()
             self.freeze_status.config(text=f"System is LOCKED (frozen) for {secs if secs else '?'} seconds")
+            self._freeze_job = self.after(1000, self._refresh_freeze_status)
         else:
             self.freeze_status.config(text="System is UNLOCKED (not frozen)")
-        self.after(1000, self._refresh_freeze_status)
 
-    def on_reset(self):
-        ok, msg = reset_password(self.u_var.get().strip(), self.p_var.get().strip())
+    def _report(self, msg):
         self.app.set_status(msg)
         self.app.show_toast(msg)
 
+    def _on_error(self, e):
+        self._report(str(e))
+
+    def on_reset(self):
+        # bcrypt hash of the new password: off the Tk thread
+        self.app.tasks.run(reset_password, self.u_var.get().strip(), self.p_var.get().strip(),
+                           owner=self, label="Resetting password...",
+                           on_done=lambda r: self._report(r[1]), on_error=self._on_error)
+
     def on_lock(self):
         s = self.lock_secs_var.get().strip()
         try:
@@ -67,19 +90,38 @@ class AdminFrame(ttk.Frame):
             self.app.set_status("Invalid seconds value")
             self.app.show_toast("Invalid seconds value")
             return
-        lock_system(secs)
         msg = f"System locked for {secs if secs else 'default'} seconds"
-        self.app.set_status(msg)
-        self.app.show_toast(msg)
+        self.app.tasks.run(lock_system, secs, owner=self, label="Locking...",
+                           on_done=lambda _: self._report(msg), on_error=self._on_error)
 
     def on_list(self):
-        users = list_users()
-        self.user_table.delete(*self.user_table.get_children())
-        for u in users:
-            self.user_table.insert("", "end", values=(u["username"], "Yes" if u["is_admin"] else "No", u["failed_attempts"], u["last_login_at"] or "-"))
+        self.app.tasks.run(list_user_names, owner=self, label="Loading users...",
+                           on_done=self._on_listed, on_error=self._on_list_error)
+
+    def _on_list_error(self, e):
+        if isinstance(e, PermissionError):
+            self._denied(e)
+        else:
+            self.app.set_status(str(e))
+
+    def _denied(self, e):
+        # logged out or no longer an admin: nothing on this frame works any more
+        self.user_table.set_keys([])
+        self._listed_at = None
+        self._report(str(e))
+        self.app.show_login()
+
+    def _on_listed(self, names):
+        self.user_table.set_keys(names)
+        self._listed_at = time.monotonic()
+
+    @staticmethod
+    def _fetch_rows(usernames):
+        # worker side: the page of users around what's on screen (PermissionError ends up in _on_list_error)
+        users = describe_users(usernames)
+        return [(u["username"], "Yes" if u["is_admin"] else "No", u["failed_attempts"], u["last_login_at"] or "-")
+                for u in users]
 
     def on_unlock(self):
-        unlock_system()
-        msg = "System unlocked"
-        self.app.set_status(msg)
-        self.app.show_toast(msg)
+        self.app.tasks.run(unlock_system, owner=self, label="Unlocking...",
+                           on_done=lambda _: self._report("System unlocked"), on_error=self._on_error)
@@ -1,7 +1,13 @@
+import time
 import tkinter.ttk as ttk
-from dashboard import read_events, summarize_events
+from config import GUI_STALE_SECONDS
+from dashboard import refresh_summary
+from metrics import metrics
+from gui.widgets import BarChart
 
 class DashboardFrame(ttk.Frame):
+    session_bound = True
+
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -9,16 +15,54 @@ class DashboardFrame(ttk.Frame):
 
         self.kpis = ttk.Label(self, text="")
         self.kpis.pack(anchor="w")
+
+        self.rates = ttk.Label(self, text="")
+        self.rates.pack(anchor="w", pady=(6,0))
+        charts = ttk.Frame(self)
+        charts.pack(anchor="w", pady=(6,0))
+        self.fail_chart = BarChart(charts, "Failed logins / minute (last 30 min)", color="#c62828")
+        self.fail_chart.pack(side="left", padx=(0,8))
+        self.lock_chart = BarChart(charts, "Lockouts / hour (last 24 h)")
+        self.lock_chart.pack(side="left")
+
         ttk.Button(self, text="Refresh", command=self.load_summary).pack(anchor="w", pady=(6,0))
         ttk.Button(self, text="Back", command=self.app.show_files).pack(anchor="w", pady=(6,0))
+        self._loaded_at = None
         self.load_summary()
 
+    def on_show(self):
+        if time.monotonic() - self._loaded_at > GUI_STALE_SECONDS:
+            self.load_summary()
+
     def load_summary(self):
-        ev = read_events()
-        s = summarize_events(ev)
+        self._loaded_at = time.monotonic()
+        self.app.tasks.run(_load, owner=self, label="Loading dashboard...", on_done=self._show,
+                           on_error=lambda e: self.app.set_status(str(e)))
+
+    def _show(self, data):
+        s, (fails, locks, bursts) = data
         text = (
             f"Logins: {s['logins']}\n"
             f"Failed Attempts: {s['failed_attempts']}\n"
             f"Freeze Events: {s['freeze_events']}\n"
         )
         self.kpis.config(text=text)
+        self.show_rates(fails, locks, bursts)
+
+    def show_rates(self, fails, locks, bursts):
+        lines = [
+            f"Failed logins, last 5 min: {sum(fails[-5:])}   last 30 min: {sum(fails)}",
+            f"Lockouts, last hour: {locks[-1]}   last 24 h: {sum(locks)}",
+        ]
+        if bursts:
+            lines.append("Failure bursts (5 min): " + ", ".join(f"{u} ({n})" for u, n in bursts[:5]))
+        self.rates.config(text="\n".join(lines))
+        self.fail_chart.set_series(fails)
+        self.lock_chart.set_series(locks)
+
+
+def _load():
+    # worker: incremental log summary plus the in-memory rates (seeded from the log on first use)
+    rates = (metrics.per_minute("LOGIN_FAIL", 30), metrics.per_hour("USER_LOCK_ON", 24),
+             metrics.failure_bursts(minutes=5))
+    return refresh_summary(), rates
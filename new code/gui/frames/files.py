@@ -1,13 +1,24 @@
 import os
+import queue
 import tkinter as tk
 import tkinter.ttk as ttk
 from tkinter import messagebox, filedialog
-from file_access import list_protected_files, open_protected_file, add_protected_file, delete_protected_file
+from datetime import datetime
+from file_access import (
+    list_protected_files, add_protected_file, delete_protected_file, import_protected_file,
+    protected_file_size, read_protected_range, is_binary_protected_file,
+    describe_protected_files, refresh_protected_entry,
+)
+from config import VIEWER_PAGE_SIZE, FS_WATCH_GUI_MS
+from fs_watch import watcher
 from auth_manager import logout
 from user_store import get_user
 from session import session
+from ..widgets import VirtualTable
 
 class FilesFrame(ttk.Frame):
+    session_bound = True  # header shows the user and their admin button
+
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
@@ -18,22 +29,22 @@ class FilesFrame(ttk.Frame):
         self.user_label = ttk.Label(top, text=f"Logged in as: {session.get_current_user()}")
         self.user_label.pack(side="left")
 
-        # Admin button visible if admin
-        current = session.get_current_user()
-        rec = get_user(current) if current else None
-        if rec and rec.get("is_admin"):
-            ttk.Button(top, text="Admin", command=self.app.show_admin).pack(side="right", padx=4)
-        ttk.Button(top, text="Dashboard", command=self.app.show_dashboard).pack(side="right", padx=4)
+        self.dashboard_btn = ttk.Button(top, text="Dashboard", command=self.app.show_dashboard)
+        self.dashboard_btn.pack(side="right", padx=4)
         ttk.Button(top, text="Logout", command=self.on_logout).pack(side="right", padx=4)
+        # Admin button visible if admin; the user record is looked up off the Tk thread
+        self.admin_btn = ttk.Button(top, text="Admin", command=self.app.show_admin)
+        current = session.get_current_user()
+        if current:
+            self.app.tasks.run(_is_admin, current, owner=self, on_done=self._show_admin_button)
 
         body = ttk.Frame(self)
         body.pack(fill="both", expand=True, pady=8)
 
-        self.listbox = tk.Listbox(body)
-        self.listbox.pack(side="left", fill="both", expand=True)
-        sb = ttk.Scrollbar(body, orient="vertical", command=self.listbox.yview)
-        sb.pack(side="left", fill="y")
-        self.listbox.configure(yscrollcommand=sb.set)
+        self.table = VirtualTable(
+            body, [("name", "Name", 240), ("size", "Size", 80), ("modified", "Modified", 130)],
+            _fetch_rows, self.app.tasks, on_activate=lambda name: self.on_open(), on_fetch_error=self._on_error)
+        self.table.pack(side="left", fill="both", expand=True)
 
         right = ttk.Frame(body)
         right.pack(side="left", fill="both", padx=8)
@@ -42,35 +53,162 @@ class FilesFrame(ttk.Frame):
         ttk.Button(right, text="Delete", command=self.on_delete).pack(fill="x", pady=(6,0))
         ttk.Button(right, text="Open", command=self.on_open).pack(fill="x", pady=(6,0))
 
+        # paged viewer: only the current page of the open file is read and shown
+        pager = ttk.Frame(self)
+        pager.pack(fill="x", pady=(8,0))
+        self.prev_btn = ttk.Button(pager, text="< Prev", command=lambda: self._show_page(self._page - 1))
+        self.prev_btn.pack(side="left")
+        self.next_btn = ttk.Button(pager, text="Next >", command=lambda: self._show_page(self._page + 1))
+        self.next_btn.pack(side="left", padx=(6,0))
+        self.page_label = ttk.Label(pager, text="")
+        self.page_label.pack(side="left", padx=(8,0))
+        self._open_name = None
+        self._open_size = 0
+        self._open_binary = False
+        self._page = 0
+        self._page_task = None
+        self._list_task = None
+
         self.content = tk.Text(self, height=10)
         self.content.pack(fill="both", expand=True, pady=8)
+        self._update_pager()
 
         self.refresh_list()
+        # stays subscribed while hidden, so on_show only has to apply what queued up
+        self._changes = watcher.subscribe()
+        self._changes_job = None
+        self.bind("<Destroy>", self._on_destroy)
+
+    def on_show(self):
+        self._drain_changes()
+
+    def _show_admin_button(self, is_admin):
+        if is_admin:
+            self.admin_btn.pack(side="right", padx=4, before=self.dashboard_btn)
+
+    def on_hide(self):
+        if self._changes_job is not None:
+            self.after_cancel(self._changes_job)
+            self._changes_job = None
+
+    def _on_error(self, e):
+        self.app.set_status(str(e))
 
     def refresh_list(self):
-        self.listbox.delete(0, tk.END)
-        try:
-            for name in list_protected_files():
-                self.listbox.insert(tk.END, name)
-        except Exception as e:
-            self.app.set_status(str(e))
+        # watcher deltas wait in the queue until the listing lands, then replay on top of it
+        if self._list_task is not None:
+            self._list_task.cancel()
+        self._list_task = self.app.tasks.run(
+            list_protected_files, owner=self, label="Listing files...",
+            on_done=self._on_listed, on_error=self._on_list_error)
+
+    def _on_listed(self, names):
+        self._list_task = None
+        self.table.set_keys(names)
+
+    def _on_list_error(self, e):
+        self._list_task = None
+        self._on_error(e)
+
+    def _apply_changes(self, deltas):
+        for kind, name in deltas:
+            if kind == "removed":
+                self.table.remove_key(name)
+                if self._open_name == name:
+                    self._close_viewer()
+                    self.app.set_status(f"{name} was deleted")
+            elif kind == "added":
+                self.table.insert_key(name)
+            elif kind == "modified":
+                self.app.tasks.run(_restat, name, owner=self,
+                                   on_done=lambda size, name=name: self._on_modified(name, size))
+
+    def _on_modified(self, name, size):
+        self.table.refresh_key(name)
+        if self._open_name == name:
+            self._open_size = size
+            self._show_page(min(self._page, self._page_count() - 1))
+
+    def _drain_changes(self):
+        if self._list_task is None:
+            try:
+                while True:
+                    self._apply_changes(self._changes.get_nowait())
+            except queue.Empty:
+                pass
+        self._changes_job = self.after(FS_WATCH_GUI_MS, self._drain_changes)
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.on_hide()
+            watcher.unsubscribe(self._changes)
 
     def on_open(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        name = self.table.selected()
+        if name is None:
             return
-        name = self.listbox.get(sel[0])
-        try:
-            text = open_protected_file(name)
-        except Exception as e:
-            self.app.set_status(str(e))
+        self.app.tasks.run(lambda: (protected_file_size(name), is_binary_protected_file(name)),
+                           owner=self, label=f"Opening {name}...",
+                           on_done=lambda r: self._on_opened(name, *r), on_error=self._on_error)
+
+    def _on_opened(self, name, size, binary):
+        self._open_name, self._open_size, self._open_binary = name, size, binary
+        self._show_page(0)
+
+    def _page_size(self) -> int:
+        # hex dumps are ~4x larger on screen than the bytes they show
+        return VIEWER_PAGE_SIZE // 4 if self._open_binary else VIEWER_PAGE_SIZE
+
+    def _page_count(self) -> int:
+        return max(1, -(-self._open_size // self._page_size()))
+
+    def _show_page(self, page: int):
+        if self._open_name is None or not 0 <= page < self._page_count():
+            return
+        start = page * self._page_size()
+        # only the latest page request matters when paging quickly
+        if self._page_task is not None:
+            self._page_task.cancel()
+        name = self._open_name
+        self._page_task = self.app.tasks.run(
+            read_protected_range, name, start, self._page_size(), owner=self, label="Reading...",
+            on_done=lambda data: self._render_page(name, page, start, data), on_error=self._on_error)
+
+    def _render_page(self, name, page, start, data):
+        self._page_task = None
+        if name != self._open_name:
+            return
+        self._page = page
+        self.content.delete("1.0", tk.END)
+        if self._open_binary:
+            self.content.insert("1.0", _hexdump(data, start))
+        else:
+            self.content.insert("1.0", data.decode("utf-8", errors="replace"))
+        self._update_pager()
+
+    def _update_pager(self):
+        if self._open_name is None:
+            self.page_label.config(text="")
+            self.prev_btn.state(["disabled"])
+            self.next_btn.state(["disabled"])
             return
+        kind = "binary" if self._open_binary else "text"
+        self.page_label.config(text=f"{self._open_name} ({kind}, {self._open_size} bytes) - page {self._page + 1} of {self._page_count()}")
+        self.prev_btn.state(["!disabled" if self._page > 0 else "disabled"])
+        self.next_btn.state(["!disabled" if self._page + 1 < self._page_count() else "disabled"])
+
+    def _close_viewer(self):
+        if self._page_task is not None:
+            self._page_task.cancel()
+            self._page_task = None
+        self._open_name = None
         self.content.delete("1.0", tk.END)
-        self.content.insert("1.0", text)
+        self._update_pager()
 
     def on_logout(self):
-        logout()
-        self.app.show_login()
+        # the session registry sits behind a file lock: off the Tk thread like the rest
+        self.app.tasks.run(logout, owner=self, label="Logging out...",
+                           on_done=lambda _: self.app.show_login(), on_error=self._on_error)
 
     def on_add(self):
         # Popup to add a new file
@@ -98,54 +236,104 @@ class FilesFrame(ttk.Frame):
             if os.path.sep in name or os.path.altsep and os.path.altsep in name:
                 messagebox.showerror("Error", "Invalid filename")
                 return
-            content = content_text.get("1.0", tk.END)
-            try:
-                add_protected_file(name, content)
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-                return
-            self.refresh_list()
+            path = chosen["path"]
+            if path:
+                work = lambda task: import_protected_file(name, path, progress=task.progress)
+            else:
+                text = content_text.get("1.0", tk.END)
+                work = lambda task: add_protected_file(name, text)
+            create_btn.state(["disabled"])
+            task = self.app.tasks.run(work, with_task=True, owner=popup, label=f"Adding {name}...",
+                                      on_progress=lambda done, total, _: progress.set(f"{done * 100 // max(total, 1)}%"),
+                                      on_done=lambda _: added(name), on_error=failed)
+            # closing the popup abandons the copy (the partial file is removed)
+            popup.bind("<Destroy>", lambda e: task.cancel() if e.widget is popup else None)
+
+        def added(name):
+            self._apply_changes([("added", name)])
+            self.table.refresh_key(name)  # may have overwritten an existing file
             self.app.set_status(f"Added {name}")
             popup.destroy()
 
+        def failed(e):
+            create_btn.state(["!disabled"])
+            messagebox.showerror("Error", str(e))
+
+        # a chosen file is copied (streamed) as-is on Create instead of going through the text box
+        chosen = {"path": None}
+
         def choose_file():
             path = filedialog.askopenfilename(title="Choose file to add")
             if not path:
                 return
-            # populate filename and content
-            try:
-                with open(path, "r", encoding="utf-8") as rf:
-                    data = rf.read()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not read file: {e}")
-                return
+            chosen["path"] = path
             name_entry.delete(0, tk.END)
             name_entry.insert(0, os.path.basename(path))
+            content_text.config(state="normal")
             content_text.delete("1.0", tk.END)
-            content_text.insert("1.0", data)
+            content_text.insert("1.0", f"(contents of {path}, {os.path.getsize(path)} bytes, will be copied as-is)")
+            content_text.config(state="disabled")
 
-        ttk.Button(btn_frame, text="Create", command=create_and_close).pack(side="right")
+        create_btn = ttk.Button(btn_frame, text="Create", command=create_and_close)
+        create_btn.pack(side="right")
         ttk.Button(btn_frame, text="Cancel", command=popup.destroy).pack(side="right", padx=(0,8))
+        progress = tk.StringVar()
+        ttk.Label(btn_frame, textvariable=progress).pack(side="right", padx=(0,8))
         # file chooser
         ttk.Button(btn_frame, text="Choose File...", command=choose_file).pack(side="left")
 
     def on_delete(self):
-        sel = self.listbox.curselection()
-        if not sel:
+        name = self.table.selected()
+        if name is None:
             return
-        name = self.listbox.get(sel[0])
         ok = messagebox.askyesno("Confirm Delete", f'Do you want to delete "{name}" ?')
         if not ok:
             return
-        try:
-            delete_protected_file(name)
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.app.set_status(str(e))
-            return
+        self.app.tasks.run(delete_protected_file, name, owner=self, label=f"Deleting {name}...",
+                           on_done=lambda _: self._on_deleted(name), on_error=self._on_delete_error)
+
+    def _on_deleted(self, name):
         # clear displayed content if that file was open
-        current = self.listbox.get(sel[0])
-        if self.content.get("1.0", tk.END) and current == name:
-            self.content.delete("1.0", tk.END)
-        self.refresh_list()
+        if self._open_name == name:
+            self._close_viewer()
+        self._apply_changes([("removed", name)])
         self.app.set_status(f"Deleted {name}")
+
+    def _on_delete_error(self, e):
+        messagebox.showerror("Error", str(e))
+        self.app.set_status(str(e))
+
+
+def _is_admin(username):
+    rec = get_user(username)
+    return bool(rec and rec.get("is_admin"))
+
+
+def _fetch_rows(names):
+    # worker side of the table: catalog rows for the page around what's on screen
+    found = describe_protected_files(names)
+    rows = []
+    for name in names:
+        e = found.get(name)
+        if e is None:
+            rows.append((name, "", ""))
+        else:
+            modified = datetime.fromtimestamp(e["mtime_ns"] / 1e9).strftime("%Y-%m-%d %H:%M")
+            rows.append((name, e["size"], modified))
+    return rows
+
+
+def _restat(name):
+    # worker side of a "modified" notification
+    refresh_protected_entry(name)
+    return protected_file_size(name)
+
+
+def _hexdump(data: bytes, base: int = 0) -> str:
+    lines = []
+    for i in range(0, len(data), 16):
+        row = data[i:i + 16]
+        hexpart = " ".join(f"{b:02x}" for b in row)
+        text = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+        lines.append(f"{base + i:08x}  {hexpart:<47}  {text}")
+    return "\n".join(lines)
@@ -1,7 +1,9 @@
 import tkinter as tk
 import tkinter.ttk as ttk
-from gui.widgets import LabeledEntry, Banner
-from auth_manager import authenticate, is_system_frozen
+from gui.widgets import LabeledEntry, Banner, Spinner
+from gui.tasks import TaskRunner
+from session import session
+from auth_executor import authenticate_async
 from ..theme import apply_theme
 
 
@@ -20,9 +22,12 @@ class LoginFrame(ttk.Frame):
         self.freeze_countdown_var = tk.StringVar()
         self.freeze_countdown_label = ttk.Label(container, textvariable=self.freeze_countdown_var, foreground="#c00")
         self.freeze_countdown_label.pack(anchor="center")
-        if is_system_frozen():
+        self._countdown_job = None
+        if session.is_frozen():
             self.banner.show("System is frozen. Try again later or contact admin.")
             self._start_freeze_countdown()
+        if hasattr(self.app, "subscribe_freeze"):
+            self.app.subscribe_freeze(self, self._on_freeze_change)
 
         form = ttk.Frame(container)
         form.pack(anchor="center", pady=8)
@@ -35,21 +40,50 @@ class LoginFrame(ttk.Frame):
         btns = ttk.Frame(container)
         btns.pack(anchor="center", pady=8)
 
-        ttk.Button(btns, text="Login", command=self.on_login, style="Accent.TButton").pack(side="left", padx=(0, 8))
+        self.login_btn = ttk.Button(btns, text="Login", command=self.on_login, style="Accent.TButton")
+        self.login_btn.pack(side="left", padx=(0, 8))
         ttk.Button(btns, text="Register", command=self.app.show_register, style="Accent.TButton").pack(side="left")
 
+        self.spinner = Spinner(container)
+        self.spinner.pack(anchor="center")
+
         self.msg = tk.StringVar()
         ttk.Label(container, textvariable=self.msg, foreground="#444").pack(anchor="center", pady=(6, 0))
 
    
+    def on_show(self):
+        # cached between visits: start clean and catch up on freeze changes missed while hidden
+        self.password.entry.delete(0, tk.END)
+        self.msg.set("")
+        self._on_freeze_change(session.is_frozen())
+
+    def on_hide(self):
+        if self._countdown_job is not None:
+            self.after_cancel(self._countdown_job)
+            self._countdown_job = None
+
     def on_login(self):
+        if self.login_btn.instate(["disabled"]):
+            return
         username = self.username.get().strip()
         password = self.password.get().strip()
 
-        ok, message = authenticate(username, password)
+        # bcrypt + DB work runs on the auth pool; keep the Tk loop free
+        self.login_btn.state(["disabled"])
+        self.spinner.start("Signing in...")
+        self.app.tasks.watch(authenticate_async(username, password), owner=self,
+                             on_done=self._on_login_done, on_error=self._on_login_error)
+
+    def _on_login_error(self, e):
+        self._on_login_done((False, str(e)))
+
+    def _on_login_done(self, result):
+        self.login_btn.state(["!disabled"])
+        self.spinner.stop()
+        ok, message = result
         self.msg.set(message)
         self.app.set_status(message)
-        if not ok and is_system_frozen():
+        if not ok and session.is_frozen():
             self.banner.show(message)
             self._start_freeze_countdown()
         else:
@@ -58,18 +92,35 @@ class LoginFrame(ttk.Frame):
         if ok:
             self.app.show_files()
 
+    def _on_freeze_change(self, frozen: bool):
+        if frozen:
+            self.banner.show("System is frozen. Try again later or contact admin.")
+            self._start_freeze_countdown()
+        else:
+            self._stop_freeze_countdown()
+
     def _start_freeze_countdown(self):
+        # 1s ticks only while frozen, and only one countdown loop at a time
         from auth_manager import freeze_remaining_seconds, is_system_frozen
+        if self._countdown_job is not None:
+            self.after_cancel(self._countdown_job)
+            self._countdown_job = None
         def update():
             if is_system_frozen():
                 secs = freeze_remaining_seconds()
                 self.freeze_countdown_var.set(f"System frozen: {secs if secs else '?'} seconds left")
-                self.after(1000, update)
+                self._countdown_job = self.after(1000, update)
             else:
-                self.freeze_countdown_var.set("")
-                self.banner.hide()
+                self._stop_freeze_countdown()
         update()
 
+    def _stop_freeze_countdown(self):
+        if self._countdown_job is not None:
+            self.after_cancel(self._countdown_job)
+            self._countdown_job = None
+        self.freeze_countdown_var.set("")
+        self.banner.hide()
+
 
 class LoginApp(tk.Tk):
     def __init__(self):
@@ -79,6 +130,7 @@ class LoginApp(tk.Tk):
         self.configure(bg="#0d47a1")
 
         apply_theme(self)
+        self.tasks = TaskRunner(self)
 
         main_frame = ttk.Frame(self)
         main_frame.pack(fill="both", expand=True)
@@ -1,6 +1,6 @@
 import tkinter.ttk as ttk
-from gui.widgets import LabeledEntry
-from auth_manager import register_user
+from gui.widgets import LabeledEntry, Spinner
+from auth_executor import register_user_async
 
 class RegisterFrame(ttk.Frame):
     def __init__(self, parent, app):
@@ -17,16 +17,34 @@ class RegisterFrame(ttk.Frame):
 
         btns = ttk.Frame(self)
         btns.pack(fill="x", pady=8)
-        ttk.Button(btns, text="Create", command=self.on_create).pack(side="left")
+        self.create_btn = ttk.Button(btns, text="Create", command=self.on_create)
+        self.create_btn.pack(side="left")
         ttk.Button(btns, text="Back to Login", command=self.app.show_login).pack(side="left", padx=8)
+        self.spinner = Spinner(btns)
+        self.spinner.pack(side="left")
 
         self.msg = ttk.Label(self, text="")
         self.msg.pack(anchor="w")
 
+    def on_show(self):
+        self.username.entry.delete(0, "end")
+        self.password.entry.delete(0, "end")
+        self.msg.config(text="")
+
     def on_create(self):
+        if self.create_btn.instate(["disabled"]):
+            return
         u = self.username.get().strip()
         p = self.password.get().strip()
-        ok, message = register_user(u, p)
+        self.create_btn.state(["disabled"])
+        self.spinner.start("Creating...")
+        self.app.tasks.watch(register_user_async(u, p), owner=self,
+                             on_done=self._on_create_done, on_error=lambda e: self._on_create_done((False, str(e))))
+
+    def _on_create_done(self, result):
+        self.create_btn.state(["!disabled"])
+        self.spinner.stop()
+        ok, message = result
         self.msg.config(text=message)
         self.app.set_status(message)
         if ok:
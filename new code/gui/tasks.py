@@ -0,0 +1,173 @@
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional
+from config import GUI_TASK_WORKERS, GUI_PUMP_MS
+
+# Background work for the GUI. Frames hand blocking calls (disk, crypto,
+# bcrypt) to TaskRunner.run, or an already running Future to watch; workers
+# never touch Tk. Results, errors and progress reports go through one
+# thread-safe queue that a single after() pump drains on the Tk thread, where
+# the callbacks run. The pump works under a small time budget per tick so a
+# burst of results can't stall redraws.
+
+_PUMP_BUDGET = 0.008  # seconds of callbacks per tick, half a 60 fps frame
+
+
+class TaskCancelled(Exception):
+    """Raised by Task.progress() in a worker once the task has been cancelled."""
+
+
+class Task:
+    def __init__(self, runner: "TaskRunner", label: str, owner, on_done, on_error, on_progress):
+        self.runner = runner
+        self.label = label
+        self.owner = owner
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.future: Optional[Future] = None
+        self._cancelled = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self) -> None:
+        """Drop the task's callbacks; a queued task won't start and a running one stops at its next progress()."""
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            if self.future is not None:
+                self.future.cancel()
+            self.runner._post(("end", self, None))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def progress(self, done: float, total: Optional[float] = None, text: str = "") -> None:
+        """Report progress from the worker (done/total, or just text). Raises TaskCancelled once cancelled."""
+        if self.cancelled:
+            raise TaskCancelled()
+        # at most ~30 updates a second reach the Tk thread, plus the final one
+        now = time.monotonic()
+        if now - self._last_progress >= 1 / 30 or (total is not None and done >= total):
+            self._last_progress = now
+            self.runner._post(("progress", self, (done, total, text)))
+
+
+class TaskRunner:
+    def __init__(self, root, workers: int = GUI_TASK_WORKERS, interval: int = GUI_PUMP_MS):
+        self.root = root
+        self.interval = interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gui-task")
+        self._queue: "queue.Queue" = queue.Queue()
+        self._active = []
+        self._busy_listeners = []
+        self._closed = False
+        self._pump_job = root.after(interval, self._pump)
+
+    # -------- submitting --------
+    def run(self, fn: Callable, *args, on_done=None, on_error=None, on_progress=None,
+            owner=None, label: str = "", with_task: bool = False, **kwargs) -> Task:
+        """
+        Run fn(*args, **kwargs) on the pool. on_done(result) / on_error(exc) /
+        on_progress(done, total, text) run on the Tk thread, and not at all if
+        the task was cancelled or owner (a widget) was destroyed meanwhile.
+        With with_task=True fn gets the Task as its first argument so it can
+        report progress.
+        """
+        task = self._start(label, owner, on_done, on_error, on_progress)
+        call_args = (task,) + args if with_task else args
+        task.future = self._pool.submit(fn, *call_args, **kwargs)
+        task.future.add_done_callback(lambda f: self._post(("result", task, f)))
+        return task
+
+    def watch(self, future: Future, on_done=None, on_error=None, owner=None, label: str = "") -> Task:
+        """Same delivery for a Future started elsewhere (e.g. auth_executor)."""
+        task = self._start(label, owner, on_done, on_error, None)
+        task.future = future
+        future.add_done_callback(lambda f: self._post(("result", task, f)))
+        return task
+
+    def _start(self, label, owner, on_done, on_error, on_progress) -> Task:
+        task = Task(self, label, owner, on_done, on_error, on_progress)
+        self._active.append(task)
+        self._notify_busy()
+        return task
+
+    def _post(self, item) -> None:
+        self._queue.put(item)
+
+    def cancel_owner(self, owner) -> None:
+        """Cancel every task started for owner (e.g. a frame being hidden)."""
+        for task in [t for t in self._active if t.owner is owner]:
+            task.cancel()
+
+    def shutdown(self, cancel: bool = True) -> None:
+        """
+        Stop the pump and the pool without waiting for workers. With cancel,
+        queued tasks are dropped and running ones stop at their next
+        progress(); otherwise they finish, but no callbacks run any more.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if cancel:
+            for task in list(self._active):
+                task.cancel()
+        self.root.after_cancel(self._pump_job)
+        self._pool.shutdown(wait=False, cancel_futures=cancel)
+
+    # -------- busy indicator --------
+    def add_busy_listener(self, callback) -> None:
+        """callback(active_count, label, done, total) whenever the set of running tasks or their progress changes."""
+        self._busy_listeners.append(callback)
+
+    def _notify_busy(self, done=None, total=None) -> None:
+        label = next((t.label for t in reversed(self._active) if t.label), "")
+        for cb in self._busy_listeners:
+            cb(len(self._active), label, done, total)
+
+    # -------- delivery (Tk thread) --------
+    def _pump(self) -> None:
+        # reschedule first so a failing callback can't stop the pump
+        self._pump_job = self.root.after(self.interval, self._pump)
+        deadline = time.monotonic() + _PUMP_BUDGET
+        try:
+            while time.monotonic() < deadline:
+                kind, task, payload = self._queue.get_nowait()
+                self._deliver(kind, task, payload)
+        except queue.Empty:
+            pass
+
+    def _owner_alive(self, task: Task) -> bool:
+        try:
+            return task.owner is None or bool(task.owner.winfo_exists())
+        except Exception:
+            return False
+
+    def _deliver(self, kind, task: Task, payload) -> None:
+        if kind == "progress":
+            if not task.cancelled and self._owner_alive(task):
+                if task.on_progress:
+                    task.on_progress(*payload)
+                done, total, _ = payload
+                self._notify_busy(done, total)
+            return
+        if task in self._active:
+            self._active.remove(task)
+            self._notify_busy()
+        if kind != "result" or task.cancelled or not self._owner_alive(task):
+            return
+        future: Future = payload
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is None:
+            if task.on_done:
+                task.on_done(future.result())
+        elif isinstance(exc, TaskCancelled):
+            return
+        elif task.on_error:
+            task.on_error(exc)
+        elif hasattr(self.root, "set_status"):
+            self.root.set_status(str(exc))
@@ -1,5 +1,7 @@
+import bisect
 import tkinter as tk
 import tkinter.ttk as ttk
+from collections import OrderedDict
 
 class LabeledEntry(ttk.Frame):
     def __init__(self, parent, label_text: str, show: str | None = None):
@@ -40,3 +42,318 @@ class Toast(tk.Toplevel):
         x = parent.winfo_rootx() + parent.winfo_width() - self.winfo_width() - 30
         y = parent.winfo_rooty() + parent.winfo_height() - self.winfo_height() - 30
         self.geometry(f"+{x}+{y}")
+
+class Spinner(ttk.Label):
+    """Small text spinner shown while background work is running."""
+    FRAMES = "|/-\\"
+
+    def __init__(self, parent, interval=100):
+        super().__init__(parent, text="")
+        self.interval = interval
+        self._i = 0
+        self._job = None
+
+    def start(self, text: str = ""):
+        self._text = text
+        if self._job is None:
+            self._tick()
+
+    def stop(self):
+        if self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+        self.config(text="")
+
+    def _tick(self):
+        self.config(text=f"{self.FRAMES[self._i % len(self.FRAMES)]} {self._text}".rstrip())
+        self._i += 1
+        self._job = self.after(self.interval, self._tick)
+
+class BarChart(tk.Canvas):
+    """Minimal bar chart for a short series of counts (oldest first)."""
+
+    def __init__(self, parent, title: str = "", width=320, height=80, color="#1565c0"):
+        super().__init__(parent, width=width, height=height, bg="white", highlightthickness=0)
+        self.title = title
+        self.color = color
+
+    def set_series(self, values):
+        self.delete("all")
+        w, h = int(self["width"]), int(self["height"])
+        top = 16
+        peak = max(values) if values else 0
+        self.create_text(2, 2, anchor="nw", text=f"{self.title} (max {peak})", fill="#0d47a1", font=("Segoe UI", 8))
+        if not values:
+            return
+        bar_w = w / len(values)
+        for i, v in enumerate(values):
+            if not v:
+                continue
+            bar_h = (h - top) * v / peak
+            x0 = i * bar_w
+            self.create_rectangle(x0 + 1, h - bar_h, x0 + bar_w - 1, h, fill=self.color, outline="")
+
+class VirtualTable(ttk.Frame):
+    """
+    Table for very large key sets. Keys live in an in-memory index sorted
+    case-insensitively; only the rows that fit on screen are materialized in
+    the Treeview, and their values are fetched on demand, a page at a time,
+    through fetch_rows(keys) -> list of value tuples (same order). Fetches
+    run on tasks (the app's TaskRunner), never on the Tk thread: rows show
+    just their key until their page arrives, and a fetch whose rows have
+    scrolled out of view (or been invalidated) is dropped. Errors go to
+    on_fetch_error(exc). Typing in the filter box narrows the view to keys
+    starting with the text, found by bisecting the index (within the previous
+    range while the text grows).
+    """
+    PAGE_SIZE = 200
+    CACHE_ROWS = 4000
+
+    def __init__(self, parent, columns, fetch_rows, tasks, on_activate=None, on_fetch_error=None,
+                 filter_label="Filter:"):
+        super().__init__(parent)
+        self.fetch_rows = fetch_rows
+        self.tasks = tasks
+        self.on_activate = on_activate
+        self.on_fetch_error = on_fetch_error
+        self._index = []            # sorted (folded key, key)
+        self._lo = self._hi = 0     # view = self._index[lo:hi]
+        self._prefix = ""
+        self._top = 0
+        self._rows = 1
+        self._selected = None
+        self._cache = OrderedDict()  # key -> values, LRU
+        self._fetching = {}          # key -> Task fetching it
+
+        bar = ttk.Frame(self)
+        bar.pack(fill="x")
+        ttk.Label(bar, text=filter_label).pack(side="left")
+        self.filter_var = tk.StringVar()
+        entry = ttk.Entry(bar, textvariable=self.filter_var)
+        entry.pack(side="left", fill="x", expand=True, padx=(6, 0))
+        self.count_label = ttk.Label(bar, text="")
+        self.count_label.pack(side="left", padx=(6, 0))
+        self.filter_var.trace_add("write", lambda *_: self.set_filter(self.filter_var.get()))
+
+        body = ttk.Frame(self)
+        body.pack(fill="both", expand=True)
+        names = [c[0] for c in columns]
+        self.tree = ttk.Treeview(body, columns=names, show="headings", selectmode="browse", height=1)
+        for name, heading, width in columns:
+            self.tree.heading(name, text=heading)
+            self.tree.column(name, width=width, stretch=(name == names[0]))
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="left", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units", step=3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-1, "units", step=3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(1, "units", step=3))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self._rows))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self._rows))
+        self.tree.bind("<Double-1>", lambda e: self._activate())
+        self.tree.bind("<Return>", lambda e: self._activate())
+
+    # -------- index --------
+    @staticmethod
+    def _entry(key):
+        return (key.casefold(), key)
+
+    def set_keys(self, keys) -> None:
+        """Replace the whole index (keeps the filter text and, if still present, the selection)."""
+        self._index = sorted(self._entry(k) for k in keys)
+        self._cache.clear()
+        self._drop_fetches()
+        if self._selected is not None and not self._contains(self._selected):
+            self._selected = None
+        self._apply_filter(self._prefix, incremental=False)
+
+    def keys(self):
+        return [k for _, k in self._index]
+
+    def _contains(self, key) -> bool:
+        e = self._entry(key)
+        i = bisect.bisect_left(self._index, e)
+        return i < len(self._index) and self._index[i] == e
+
+    def insert_key(self, key) -> None:
+        e = self._entry(key)
+        i = bisect.bisect_left(self._index, e)
+        if i < len(self._index) and self._index[i] == e:
+            return
+        self._index.insert(i, e)
+        self._apply_filter(self._prefix, incremental=False, keep_top=True)
+
+    def remove_key(self, key) -> None:
+        e = self._entry(key)
+        i = bisect.bisect_left(self._index, e)
+        if i < len(self._index) and self._index[i] == e:
+            del self._index[i]
+            self._cache.pop(key, None)
+            self._fetching.pop(key, None)
+            if self._selected == key:
+                self._selected = None
+            self._apply_filter(self._prefix, incremental=False, keep_top=True)
+
+    def refresh_key(self, key) -> None:
+        """Drop cached values for key so they are fetched again."""
+        self._cache.pop(key, None)
+        self._fetching.pop(key, None)  # a fetch already under way may predate the change
+        self._render()
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+        self._drop_fetches()
+        self._render()
+
+    # -------- filtering --------
+    def set_filter(self, text: str) -> None:
+        text = text.casefold()
+        self._apply_filter(text, incremental=text.startswith(self._prefix))
+
+    def _apply_filter(self, prefix, incremental, keep_top=False) -> None:
+        lo, hi = (self._lo, self._hi) if incremental else (0, len(self._index))
+        if prefix:
+            lo = bisect.bisect_left(self._index, (prefix,), lo, hi)
+            hi = bisect.bisect_left(self._index, (prefix + "\U0010ffff",), lo, hi)
+        self._prefix, self._lo, self._hi = prefix, lo, hi
+        if not keep_top:
+            self._top = 0
+        self._render()
+
+    def total(self) -> int:
+        return self._hi - self._lo
+
+    # -------- scrolling / rendering --------
+    def _on_resize(self, event) -> None:
+        style = ttk.Style(self)
+        row_h = int(style.lookup("Treeview", "rowheight") or 20)
+        rows = max(1, (event.height - row_h - 4) // row_h)  # minus the heading row
+        if rows != self._rows:
+            self._rows = rows
+            self.tree.configure(height=rows)
+            self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None) -> None:
+        if action == "moveto":
+            self._top = int(float(amount) * self.total())
+            self._render()
+        else:
+            self.scroll(int(amount), unit)
+
+    def scroll(self, amount: int, unit: str = "units", step: int = 1) -> None:
+        self._top += amount * (self._rows if unit == "pages" else step)
+        self._render()
+
+    # -------- row fetching --------
+    def _drop_fetches(self, keep=()) -> None:
+        """Cancel fetches that no longer cover any key in keep (all of them by default)."""
+        keep = set(keep)
+        tasks = {}
+        for k, task in self._fetching.items():
+            tasks[task] = tasks.get(task, False) or k in keep
+        for task, wanted in tasks.items():
+            if not wanted:
+                task.cancel()
+        self._fetching = {k: t for k, t in self._fetching.items() if tasks[t]}
+
+    def _fetch(self, start: int, keys) -> None:
+        """Start fetching whole pages around the uncached keys of view positions [start, ...)."""
+        missing = [i for i, k in enumerate(keys) if k not in self._cache and k not in self._fetching]
+        if not missing:
+            return
+        first = (start + missing[0]) // self.PAGE_SIZE * self.PAGE_SIZE
+        last = min(self.total(), -(-(start + missing[-1] + 1) // self.PAGE_SIZE) * self.PAGE_SIZE)
+        page_keys = [k for _, k in self._index[self._lo + first:self._lo + last]
+                     if k not in self._cache and k not in self._fetching]
+        task = self.tasks.run(self.fetch_rows, page_keys, owner=self,
+                              on_done=lambda rows: self._on_fetched(task, page_keys, rows),
+                              on_error=lambda e: self._on_fetch_failed(task, page_keys, e))
+        for k in page_keys:
+            self._fetching[k] = task
+
+    def _on_fetched(self, task, keys, rows) -> None:
+        visible = set(self.tree.get_children())
+        shown = False
+        for i, k in enumerate(keys):
+            if self._fetching.get(k) is task:  # otherwise refreshed or dropped since
+                del self._fetching[k]
+                self._cache[k] = rows[i] if i < len(rows) else (k,)  # a short answer mustn't refetch forever
+                shown = shown or k in visible
+        while len(self._cache) > self.CACHE_ROWS:
+            self._cache.popitem(last=False)
+        if shown:
+            self._render()
+
+    def _on_fetch_failed(self, task, keys, e) -> None:
+        for k in keys:
+            if self._fetching.get(k) is task:
+                del self._fetching[k]
+        if self.on_fetch_error:
+            self.on_fetch_error(e)
+
+    def _rows_for(self, start: int, end: int):
+        """Values for view positions [start, end); uncached rows are fetched and show just their key meanwhile."""
+        keys = [k for _, k in self._index[self._lo + start:self._lo + end]]
+        self._drop_fetches(keep=keys)  # the view moved on: their rows aren't needed any more
+        self._fetch(start, keys)
+        out = []
+        for k in keys:
+            values = self._cache.get(k, (k,))
+            if k in self._cache:
+                self._cache.move_to_end(k)
+            out.append((k, values))
+        return out
+
+    def _render(self) -> None:
+        total = self.total()
+        self._top = max(0, min(self._top, total - self._rows))
+        end = min(total, self._top + self._rows)
+        self.tree.delete(*self.tree.get_children())
+        for key, values in self._rows_for(self._top, end):
+            self.tree.insert("", "end", iid=key, values=values)
+        if self._selected is not None and self.tree.exists(self._selected):
+            self.tree.selection_set(self._selected)
+        if total:
+            self.scrollbar.set(self._top / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+        shown = f"{total} of {len(self._index)}" if self._prefix else f"{total}"
+        self.count_label.config(text=shown)
+
+    # -------- selection --------
+    def _on_select(self, _event=None) -> None:
+        sel = self.tree.selection()
+        if sel:
+            self._selected = sel[0]
+
+    def selected(self):
+        return self._selected
+
+    def _view_position(self, key):
+        i = bisect.bisect_left(self._index, self._entry(key), self._lo, self._hi)
+        if i < self._hi and self._index[i][1] == key:
+            return i - self._lo
+        return None
+
+    def _move_selection(self, delta: int):
+        if not self.total():
+            return "break"
+        pos = self._view_position(self._selected) if self._selected is not None else None
+        pos = self._top if pos is None else max(0, min(self.total() - 1, pos + delta))
+        self._selected = self._index[self._lo + pos][1]
+        if pos < self._top:
+            self._top = pos
+        elif pos >= self._top + self._rows:
+            self._top = pos - self._rows + 1
+        self._render()
+        self.tree.focus(self._selected)
+        return "break"
+
+    def _activate(self):
+        if self.on_activate and self._selected is not None:
+            self.on_activate(self._selected)
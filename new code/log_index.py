@@ -0,0 +1,331 @@
+import os
+import mmap
+import gzip
+import json
+import struct
+import zlib
+from datetime import datetime
+from contextlib import ExitStack
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+import log_segments
+from log_segments import list_segments, to_utc_iso, TimeBound
+from file_lock import locked
+from config import LOG_INDEX_TS_SLACK
+
+# Secondary index for security.log segments, one "<segment>.idx" per segment
+# (the active log's is security.log.idx and is renamed along with it on
+# rotation). Fixed-width records, appended in log order:
+#   <d ts> <Q offset> <I length> <I crc32(username)> <I crc32(event)>
+# offset/length locate the line in the uncompressed segment.
+#
+# Next to it, "<segment>.pst" holds per-key postings so a user or event lookup
+# doesn't walk every record in the time window. It is a sequence of sorted
+# runs, each a header <4s magic> <I entries> <I first record> <I end record>
+# followed by <B kind> <I key> <d ts> <I record number> entries sorted by
+# (kind, key, ts). Every update() appends a run for the records it added and
+# merges it with its predecessor while that one is no bigger, so a segment has
+# O(log n) runs, each binary-searched. Runs cover consecutive record ranges;
+# anything past the last run (e.g. a torn merge) is rebuilt from the .idx.
+#
+# Lookups mmap the files, bisect the postings (or, with no user/event filter,
+# the time range of the .idx), then seek straight to the matching lines.
+
+_REC = struct.Struct("<dQIII")
+_RUN = struct.Struct("<4sIII")
+_RUN_MAGIC = b"PST1"
+_POST = struct.Struct("<BIdI")
+_USER, _EVENT = 1, 2
+# Events are timestamped when logged but written in batches, possibly by several
+# instances, so the file is only "almost" sorted by ts and time bounds are
+# widened by LOG_INDEX_TS_SLACK before bisecting (the exact bounds are applied
+# to the decoded events afterwards). An event trails the newest line already
+# in the file by at most the time it sat in its writer's queue: up to
+# LOG_FLUSH_INTERVAL (0.2 s) plus that writer's wait for the rotation lock.
+# Every instance appends from the same host, so there is no clock skew
+# between writers beyond that. 30 s covers a lock wait of many seconds; the
+# case it can't bound is a batch held for retry while security.log was
+# unwritable for longer (logger._pending), so raise it if a log lives on
+# storage that goes away for minutes at a time.
+_TS_SLACK = LOG_INDEX_TS_SLACK
+
+
+def _key(value: Optional[str]) -> int:
+    return zlib.crc32(value.encode("utf-8")) if value else 0
+
+
+def index_path(segment: str) -> str:
+    if segment.endswith(".gz"):
+        segment = segment[:-3]
+    return segment + ".idx"
+
+
+def postings_path(segment: str) -> str:
+    return index_path(segment)[:-len(".idx")] + ".pst"
+
+
+def _open_segment_bytes(segment: str):
+    if not os.path.exists(segment) and os.path.exists(segment + ".gz"):
+        segment += ".gz"
+    return gzip.open(segment, "rb") if segment.endswith(".gz") else open(segment, "rb")
+
+
+def update(segment: str) -> int:
+    """
+    Index whatever was appended to the segment since the last update.
+    Returns the number of new records.
+    """
+    idx = index_path(segment)
+    with ExitStack() as stack:
+        if os.path.abspath(segment) == os.path.abspath(log_segments.LOG_PATH):
+            # the active log: hold off rotation, or security.log and its .idx could be
+            # renamed between reading the one and appending to the other
+            stack.enter_context(locked(stack.enter_context(log_segments.lock_file()), exclusive=False))
+        f = stack.enter_context(open(idx, "a+b"))
+        stack.enter_context(locked(f))
+        try:
+            src = stack.enter_context(_open_segment_bytes(segment))
+        except FileNotFoundError:
+            return 0
+        added = _extend(f, src)
+        _update_postings(segment, f)
+    return added
+
+
+def _extend(f, src) -> int:
+    """Append records for lines of src past the last indexed one."""
+    size = os.fstat(f.fileno()).st_size
+    size -= size % _REC.size  # drop a torn trailing record
+    upto = 0
+    if size:
+        f.seek(size - _REC.size)
+        _, offset, length, _, _ = _REC.unpack(f.read(_REC.size))
+        upto = offset + length
+    if not isinstance(src, gzip.GzipFile) and upto > os.fstat(src.fileno()).st_size:
+        size = upto = 0  # index belongs to an earlier file of this name (e.g. a rotation cut short): rebuild
+    f.truncate(size)
+    out = []
+    src.seek(upto)
+    offset = upto
+    for line in src:
+        if not line.endswith(b"\n"):
+            break
+        if line.strip():
+            try:
+                e = json.loads(line)
+                ts = datetime.fromisoformat(e["ts"]).timestamp()
+                out.append(_REC.pack(ts, offset, len(line), _key(e.get("username")), _key(e.get("event"))))
+            except (ValueError, KeyError):
+                pass
+        offset += len(line)
+    if out:
+        f.seek(0, os.SEEK_END)
+        f.write(b"".join(out))
+        f.flush()
+    return len(out)
+
+
+def _runs(mm, size: int) -> List[Tuple[int, int, int, int]]:
+    """(position, entries, first record, end record) of each intact run, in file order."""
+    runs = []
+    pos = 0
+    end_rec = 0
+    while pos + _RUN.size <= size:
+        magic, count, first, end = _RUN.unpack_from(mm, pos)
+        if magic != _RUN_MAGIC or first != end_rec or pos + _RUN.size + count * _POST.size > size:
+            break  # torn by a crash mid-merge; the records it covered are re-posted from the .idx
+        runs.append((pos, count, first, end))
+        pos += _RUN.size + count * _POST.size
+        end_rec = end
+    return runs
+
+
+def _runs_end(runs) -> int:
+    return runs[-1][0] + _RUN.size + runs[-1][1] * _POST.size if runs else 0
+
+
+def _postings_for(idx_f, first: int, end: int) -> List[tuple]:
+    idx_f.seek(first * _REC.size)
+    data = idx_f.read((end - first) * _REC.size)
+    out = []
+    for n, (ts, _, _, u, ev) in enumerate(_REC.iter_unpack(data), first):
+        if u:
+            out.append((_USER, u, ts, n))
+        if ev:
+            out.append((_EVENT, ev, ts, n))
+    return out
+
+
+def _update_postings(segment: str, idx_f) -> None:
+    """Bring <segment>.pst up to the .idx; caller holds the .idx lock."""
+    records = os.fstat(idx_f.fileno()).st_size // _REC.size
+    with open(postings_path(segment), "a+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) if size else None
+        try:
+            runs = _runs(mm, size) if mm else []
+            if runs and runs[-1][3] > records:
+                runs = []  # the .idx was rebuilt: so are the postings
+            first = runs[-1][3] if runs else 0
+            if first == records:
+                f.truncate(_runs_end(runs))
+                return
+            pending = _postings_for(idx_f, first, records)
+            # binary-counter merging keeps run sizes shrinking towards the tail
+            while runs and runs[-1][1] <= len(pending):
+                run = runs.pop()
+                pending = _run_entries(mm, run) + pending
+                first = run[2]
+        finally:
+            if mm is not None:
+                mm.close()
+        pending.sort()
+        start = _runs_end(runs)
+        f.truncate(start)  # a+b: the write below lands at the new end
+        f.write(_RUN.pack(_RUN_MAGIC, len(pending), first, records) + b"".join(_POST.pack(*e) for e in pending))
+
+
+def _run_entries(mm, run) -> List[tuple]:
+    base = run[0] + _RUN.size
+    return [_POST.unpack_from(mm, base + i * _POST.size) for i in range(run[1])]
+
+
+def _first_at_or_after(mm, count: int, ts: float) -> int:
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _REC.unpack_from(mm, mid * _REC.size)[0] < ts:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _posted(mm, runs, kind: int, key: int, lo: Optional[float], hi: Optional[float]) -> Set[int]:
+    """Record numbers posted under (kind, key) with lo <= ts <= hi."""
+    target = (kind, key, lo if lo is not None else float("-inf"))
+    out = set()
+    for pos, count, _, _ in runs:
+        base = pos + _RUN.size
+        a, b = 0, count
+        while a < b:
+            mid = (a + b) // 2
+            if _POST.unpack_from(mm, base + mid * _POST.size)[:3] < target:
+                a = mid + 1
+            else:
+                b = mid
+        for i in range(a, count):
+            k, kk, ts, n = _POST.unpack_from(mm, base + i * _POST.size)
+            if k != kind or kk != key or (hi is not None and ts > hi):
+                break
+            out.add(n)
+    return out
+
+
+def _lookup(segment: str, count: int, user_key: int, event_keys: Optional[set],
+            lo: Optional[float], hi: Optional[float]) -> Tuple[Set[int], int]:
+    """Matching record numbers from the postings, and how many records those cover."""
+    try:
+        f = open(postings_path(segment), "rb")
+    except FileNotFoundError:
+        return set(), 0
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return set(), 0
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            runs = _runs(mm, size)
+            if not runs or runs[-1][3] > count:
+                return set(), 0
+            found = _posted(mm, runs, _USER, user_key, lo, hi) if user_key else None
+            if event_keys:
+                by_event = set()
+                for key in event_keys:
+                    by_event |= _posted(mm, runs, _EVENT, key, lo, hi)
+                found = by_event if found is None else found & by_event
+            return found, runs[-1][3]
+
+
+def _matches(segment: str, since: Optional[float], until: Optional[float],
+             user_key: int, event_keys: Optional[set]) -> List[tuple]:
+    try:
+        f = open(index_path(segment), "rb")
+    except FileNotFoundError:
+        return []
+    with f, locked(f, exclusive=False):
+        count = os.fstat(f.fileno()).st_size // _REC.size
+        if not count:
+            return []
+        lo = since - _TS_SLACK if since is not None else None
+        hi = until + _TS_SLACK if until is not None else None
+        with mmap.mmap(f.fileno(), count * _REC.size, access=mmap.ACCESS_READ) as mm:
+            if user_key or event_keys:
+                found, start = _lookup(segment, count, user_key, event_keys, lo, hi)
+                hits = [_REC.unpack_from(mm, n * _REC.size)[1:3] for n in sorted(found)]
+            else:
+                hits, start = [], _first_at_or_after(mm, count, lo) if lo is not None else 0
+            # records past the postings (or every record in the window, unfiltered) straight from the .idx
+            for i in range(start, count):
+                ts, offset, length, u, ev = _REC.unpack_from(mm, i * _REC.size)
+                if hi is not None and ts > hi:
+                    if not (user_key or event_keys):
+                        break
+                    continue
+                if lo is not None and ts < lo:
+                    continue
+                if user_key and u != user_key:
+                    continue
+                if event_keys and ev not in event_keys:
+                    continue
+                hits.append((offset, length))
+    return hits
+
+
+def _read_lines(segment: str, hits: List[tuple]) -> Iterator[bytes]:
+    if segment.endswith(".gz") or not os.path.exists(segment):
+        with _open_segment_bytes(segment) as f:
+            for offset, length in sorted(hits):
+                f.seek(offset)  # forward-only in gzip, hits are sorted
+                yield f.read(length)
+        return
+    with open(segment, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            for offset, length in hits:
+                yield mm[offset:offset + length]
+
+
+def search(username: Optional[str] = None, events: Optional[Iterable[str]] = None,
+           since: TimeBound = None, until: TimeBound = None, limit: Optional[int] = None) -> Iterator[dict]:
+    """
+    Events for a user and/or event types in a time window, oldest first,
+    served from the segment indexes instead of scanning the log.
+    """
+    since_iso, until_iso = to_utc_iso(since), to_utc_iso(until)
+    since_ts = datetime.fromisoformat(since_iso).timestamp() if since_iso else None
+    until_ts = datetime.fromisoformat(until_iso).timestamp() if until_iso else None
+    wanted = set(events) if events else None
+    event_keys = {_key(e) for e in wanted} if wanted else None
+    user_key = _key(username)
+    found = 0
+    for segment in list_segments(since_iso, until_iso):
+        if not os.path.exists(index_path(segment)) or not segment.endswith(".gz"):
+            update(segment)  # active/raw segments may have grown; missing indexes get built
+        hits = _matches(segment, since_ts, until_ts, user_key, event_keys)
+        for line in _read_lines(segment, hits):
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            if username and e.get("username") != username:
+                continue
+            if wanted and e.get("event") not in wanted:
+                continue
+            ts = e.get("ts") or ""
+            if (since_iso and ts < since_iso) or (until_iso and ts > until_iso):
+                continue
+            yield e
+            found += 1
+            if limit and found >= limit:
+                return
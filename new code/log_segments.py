@@ -0,0 +1,238 @@
+import os
+import io
+import gzip
+import json
+import shutil
+from datetime import datetime, timezone, timedelta
+from typing import Optional, List, Dict, Union
+from config import LOG_PATH, LOG_MANIFEST_PATH, LOG_RETENTION_DAYS, LOG_COMPRESS_SEGMENTS
+from file_lock import locked
+
+# Sealed log segments live next to security.log as
+#   security.log.<first-ts>            (just rotated, not compressed yet)
+#   security.log.<first-ts>.gz         (sealed)
+# with their search index (see log_index) at security.log.<first-ts>.idx/.pst.
+# security.manifest.json lists them oldest first, with each segment's
+# first/last timestamp and event count so readers can skip whole segments.
+# Rotation and manifest updates happen under an exclusive lock on
+# security.log.lock; writers hold it shared while appending a batch.
+
+LOCK_PATH = LOG_PATH + ".lock"
+
+TimeBound = Union[str, datetime, None]
+
+
+def to_utc_iso(ts: TimeBound) -> Optional[str]:
+    """Normalize a time bound to the UTC isoformat used in the log, so plain string comparison works."""
+    if ts is None:
+        return None
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).isoformat()
+
+
+def lock_file():
+    return open(LOCK_PATH, "a+b")
+
+
+def read_manifest() -> Dict:
+    try:
+        with open(LOG_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"segments": []}
+
+
+def _write_manifest(manifest: Dict) -> None:
+    tmp = LOG_MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, LOG_MANIFEST_PATH)
+
+
+def _scan(path: str) -> Dict:
+    """first/last ts and line count of an uncompressed segment."""
+    first = last = None
+    count = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            count += 1
+            try:
+                ts = json.loads(line).get("ts")
+            except ValueError:
+                continue
+            if first is None:
+                first = ts
+            last = ts
+    return {"first_ts": first, "last_ts": last, "count": count}
+
+
+def rotate(first_ts: Optional[str] = None) -> Optional[str]:
+    """
+    Move the active log aside as a new segment and start a fresh one.
+    Caller must hold the exclusive lock. Returns the raw segment path.
+    """
+    try:
+        st = os.stat(LOG_PATH)
+    except FileNotFoundError:
+        return None
+    if st.st_size == 0:
+        return None
+    stamp = (first_ts or datetime.now(timezone.utc).isoformat())[:19].replace("-", "").replace(":", "")
+    raw = f"{LOG_PATH}.{stamp}"
+    n = 1
+    while os.path.exists(raw) or os.path.exists(raw + ".gz"):
+        raw = f"{LOG_PATH}.{stamp}-{n}"
+        n += 1
+    try:
+        os.rename(LOG_PATH, raw)
+    except OSError:
+        # Windows refuses to rename while another instance holds it open; retry later
+        return None
+    for ext in (".idx", ".pst"):
+        try:
+            os.rename(LOG_PATH + ext, raw + ext)  # the index travels with its segment
+        except OSError:
+            pass
+    manifest = read_manifest()
+    manifest["segments"].append({
+        "file": os.path.basename(raw),
+        "first_ts": first_ts,
+        "last_ts": None,  # unknown until sealed
+        "count": None,
+        "bytes": st.st_size,
+        "inode": st.st_ino,
+    })
+    _write_manifest(manifest)
+    return raw
+
+
+def seal(raw: str) -> None:
+    """
+    Compute the segment's time range/count and (optionally) gzip it. Runs
+    without the lock held: nobody appends to a rotated segment.
+    """
+    import log_index
+    log_index.update(raw)  # finish indexing before the raw bytes go away
+    meta = _scan(raw)
+    final = raw
+    if LOG_COMPRESS_SEGMENTS:
+        final = raw + ".gz"
+        with open(raw, "rb") as src, gzip.open(final + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(final + ".tmp", final)
+    with lock_file() as lf, locked(lf):
+        manifest = read_manifest()
+        for seg in manifest["segments"]:
+            if seg["file"] == os.path.basename(raw):
+                seg.update(meta)
+                seg["file"] = os.path.basename(final)
+                if final != raw:
+                    seg["compressed_bytes"] = os.path.getsize(final)
+        _write_manifest(manifest)
+    if final != raw:
+        os.remove(raw)
+
+
+def seal_orphans() -> List[str]:
+    """
+    Seal plain segments the manifest doesn't know about (an instance died
+    between renaming security.log and recording it, or files rotated by hand).
+    Each is entered in the manifest under the lock before sealing, so only one
+    instance picks it up. Returns the paths sealed.
+    """
+    folder = os.path.dirname(LOG_PATH)
+    prefix = os.path.basename(LOG_PATH) + "."
+    orphans = []
+    with lock_file() as lf, locked(lf):
+        manifest = read_manifest()
+        known = {seg["file"] for seg in manifest["segments"]}
+        known |= {name[:-3] for name in known if name.endswith(".gz")}
+        for name in sorted(os.listdir(folder)):
+            if not name.startswith(prefix) or name in known or name.endswith((".gz", ".idx", ".pst", ".lock", ".tmp")):
+                continue
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            manifest["segments"].append({
+                "file": name,
+                "first_ts": _scan(path)["first_ts"],
+                "last_ts": None,
+                "count": None,
+                "bytes": st.st_size,
+                "inode": st.st_ino,
+            })
+            orphans.append(path)
+        if orphans:
+            manifest["segments"].sort(key=lambda seg: seg.get("first_ts") or "")
+            _write_manifest(manifest)
+    for path in orphans:
+        seal(path)
+    return orphans
+
+
+def apply_retention(now: Optional[datetime] = None) -> List[str]:
+    """Delete sealed segments whose newest event is older than LOG_RETENTION_DAYS."""
+    if not LOG_RETENTION_DAYS:
+        return []
+    cutoff = ((now or datetime.now(timezone.utc)) - timedelta(days=LOG_RETENTION_DAYS)).isoformat()
+    removed = []
+    with lock_file() as lf, locked(lf):
+        manifest = read_manifest()
+        keep = []
+        for seg in manifest["segments"]:
+            if seg.get("last_ts") and seg["last_ts"] < cutoff:
+                idx = segment_index_path(seg)
+                for path in (segment_path(seg), idx, idx[:-len(".idx")] + ".pst"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                removed.append(seg["file"])
+            else:
+                keep.append(seg)
+        if removed:
+            manifest["segments"] = keep
+            _write_manifest(manifest)
+    return removed
+
+
+def segment_path(seg: Dict) -> str:
+    return os.path.join(os.path.dirname(LOG_PATH), seg["file"])
+
+
+def segment_index_path(seg: Dict) -> str:
+    path = segment_path(seg)
+    return (path[:-3] if path.endswith(".gz") else path) + ".idx"
+
+
+def list_segments(since: TimeBound = None, until: TimeBound = None) -> List[str]:
+    """
+    Paths of the segments (oldest first, active log last) that may hold
+    events in [since, until]. Sealed segments outside the window are skipped
+    using the manifest, without opening them.
+    """
+    since, until = to_utc_iso(since), to_utc_iso(until)
+    paths = []
+    for seg in read_manifest()["segments"]:
+        if since and seg.get("last_ts") and seg["last_ts"] < since:
+            continue
+        if until and seg.get("first_ts") and seg["first_ts"] > until:
+            continue
+        paths.append(segment_path(seg))
+    paths.append(LOG_PATH)
+    return paths
+
+
+def open_segment(path: str) -> io.TextIOBase:
+    """Open a segment (plain or .gz) for reading text lines."""
+    if not os.path.exists(path) and os.path.exists(path + ".gz"):
+        path += ".gz"  # sealed since the manifest was read
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
@@ -1,7 +1,16 @@
 import json
 import os
+import sys
+import queue
+import atexit
+import threading
 from datetime import datetime, timezone
-from config import LOG_PATH
+from config import (LOG_PATH, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_FSYNC, LOG_ROTATE_BYTES, LOG_ROTATE_DAILY,
+                    LOG_INDEX_ON_WRITE, LOG_RETRY_MAX_LINES)
+from file_lock import locked
+import log_segments
+import log_index
+from metrics import metrics
 
 os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
 
@@ -10,11 +19,224 @@ def _now_iso():
     return datetime.now(timezone.utc).isoformat()
 
 
+class LogWriter:
+    """
+    Background writer for security.log. Events are queued by log_event and
+    written by one thread through a single append-mode handle, in batches of up
+    to LOG_BATCH_SIZE lines or every LOG_FLUSH_INTERVAL seconds. Each batch is
+    one write() on an O_APPEND handle so lines from several instances never
+    interleave. With LOG_FSYNC the batch is fsync'ed before the next one.
+
+    The active file is rotated into a sealed segment (see log_segments) once it
+    reaches LOG_ROTATE_BYTES or, with LOG_ROTATE_DAILY, when the day changes.
+
+    A batch that can't be written is reported on stderr and kept (up to
+    LOG_RETRY_MAX_LINES events) for the next attempt. After close() events are
+    written synchronously by the caller, so shutdown-time logging isn't lost.
+    """
+
+    def __init__(self, path: str = LOG_PATH, batch_size: int = LOG_BATCH_SIZE,
+                 interval: float = LOG_FLUSH_INTERVAL, fsync: bool = LOG_FSYNC):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fsync = fsync
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._lock_fh = None
+        self._first_ts = None
+        self._pending = []  # lines of failed batches, retried first
+        self._failing = False
+        self._closed = False
+        self._orphans_checked = False
+        self._sync_lock = threading.Lock()
+
+    def _ensure_started(self) -> bool:
+        """Start the writer thread if needed; False once closed."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._closed:
+                    return False
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+        return True
+
+    def write(self, line: str) -> None:
+        if self._closed or not self._ensure_started():
+            with self._sync_lock:
+                self._write_batch([line])
+            return
+        self._queue.put(line)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Block until everything queued so far is on disk."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._start_lock:
+            self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        thread, self._thread = self._thread, None
+        thread.join(timeout)
+        if thread.is_alive():
+            return
+        # events queued while closing, or a batch still waiting for its retry
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, str):
+                leftover.append(item)
+        if leftover or self._pending:
+            with self._sync_lock:
+                self._write_batch(leftover)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                if self._pending:
+                    self._write_batch([])
+                continue
+            lines, waiters = [], []
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(item)
+                if stop or len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if lines or self._pending:
+                self._write_batch(lines)
+            for w in waiters:
+                w.set()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_fh is not None:
+            self._lock_fh.close()
+            self._lock_fh = None
+
+    def _open(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "ab", buffering=0)
+        self._first_ts = None
+        try:
+            with open(self.path, "rb") as f:
+                first = f.readline()
+            if first.strip():
+                self._first_ts = json.loads(first).get("ts")
+        except (OSError, ValueError):
+            pass
+
+    def _is_current(self) -> bool:
+        """False once another instance has rotated the file out from under us."""
+        try:
+            return os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return False
+
+    def _needs_rotation(self) -> bool:
+        size = os.fstat(self._file.fileno()).st_size
+        if LOG_ROTATE_BYTES and size >= LOG_ROTATE_BYTES:
+            return True
+        if LOG_ROTATE_DAILY and self._first_ts and size:
+            return self._first_ts[:10] != _now_iso()[:10]
+        return False
+
+    def _write_batch(self, lines) -> None:
+        raw_segment = None
+        lines = self._pending + lines
+        self._pending = []
+        try:
+            if self._lock_fh is None:
+                self._lock_fh = log_segments.lock_file()
+            if self._file is None:
+                self._open()
+            if self._needs_rotation():
+                with locked(self._lock_fh):
+                    if self._is_current() and self._needs_rotation():
+                        raw_segment = log_segments.rotate(self._first_ts)
+                    self._open()
+            # shared lock: many writers may append, but not while a rotation renames the file
+            with locked(self._lock_fh, exclusive=False):
+                if not self._is_current():
+                    self._open()
+                self._file.write("".join(lines).encode("utf-8"))
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            if self._first_ts is None:
+                self._first_ts = json.loads(lines[0]).get("ts")
+            if self._failing:
+                self._failing = False
+                sys.stderr.write(f"security log: writing {self.path} works again\n")
+        except OSError as exc:
+            # logging must never take the app down; keep the batch and retry with a fresh handle
+            if self._file is not None:
+                self._file.close()
+            self._file = None
+            self._hold(lines, exc)
+        if LOG_INDEX_ON_WRITE:
+            try:
+                log_index.update(self.path)
+            except OSError:
+                pass  # search() catches up on its own
+        if raw_segment or not self._orphans_checked:
+            # first batch after startup, or a rotation: also finish segments a crashed instance left behind
+            self._orphans_checked = True
+            try:
+                if raw_segment:
+                    log_segments.seal(raw_segment)
+                log_segments.seal_orphans()
+                log_segments.apply_retention()
+            except OSError:
+                pass
+
+    def _hold(self, lines, exc: OSError) -> None:
+        dropped = max(0, len(lines) - LOG_RETRY_MAX_LINES)
+        self._pending = lines[dropped:]
+        if not self._failing or dropped:
+            self._failing = True
+            msg = f"security log: cannot write {self.path} ({exc}); {len(self._pending)} event(s) held for retry"
+            if dropped:
+                msg += f", {dropped} oldest dropped"
+            sys.stderr.write(msg + "\n")
+
+
+_writer = LogWriter()
+atexit.register(_writer.close)
+
+
 def log_event(event: str, username: str | None = None, **meta):
     line = {"ts": _now_iso(), "event": event}
     if username:
         line["username"] = username
     if meta:
         line["meta"] = meta
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(line) + "\n")
+    _writer.write(json.dumps(line) + "\n")
+    metrics.record(event, username)
+
+
+def flush() -> None:
+    """Wait for queued events to be written (e.g. before reading the log)."""
+    _writer.flush()
@@ -1,10 +1,39 @@
+import sys
+import time
+_STARTED = time.perf_counter()
 import argparse
-from auth_manager import bootstrap_admin
+from contextlib import nullcontext
 
-def run_gui():
-    from gui.app import App
-    app = App()
-    app.mainloop()
+# Startup keeps the login window first: heavy modules (bcrypt, cryptography,
+# the user store, the logger) are imported on first use, and bootstrap_admin
+# runs on the auth pool once the window is up (logins wait for it).
+
+
+def _bootstrap():
+    from auth_manager import bootstrap_admin
+    bootstrap_admin()
+
+
+def run_gui(profile=None):
+    phase = profile.phase if profile else (lambda name, critical=True: nullcontext())
+    with phase("import gui.app"):
+        from gui.app import App
+    with phase("build window"):
+        app = App()
+    import auth_executor
+    if profile is None:
+        app.after_idle(lambda: auth_executor.run_startup(_bootstrap))
+        app.mainloop()
+        return True
+    with phase("first paint"):
+        app.update()
+    profile.mark_ready()
+    with phase("bootstrap_admin + auth imports", critical=False):
+        auth_executor.run_startup(_bootstrap).result()
+    app.destroy()
+    profile.imports.uninstall()
+    profile.report()
+    return profile.within_budget()
 
 def run_cli():
     print("CLI mode not implemented yet. Use the GUI or add CLI menus.")
@@ -13,13 +42,19 @@ def run_cli():
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--cli", action="store_true", help="Run in CLI mode")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Open the GUI, print an import/phase timing breakdown against STARTUP_BUDGET_MS, then exit")
     args = parser.parse_args()
 
-
-    bootstrap_admin()
-
     if args.cli:
+        _bootstrap()
         run_cli()
+    elif args.profile_startup:
+        from config import STARTUP_BUDGET_MS
+        from startup_profile import StartupProfile
+        profile = StartupProfile(STARTUP_BUDGET_MS, started=_STARTED)
+        profile.imports.install()
+        sys.exit(0 if run_gui(profile) else 1)
     else:
         run_gui()
 
@@ -0,0 +1,124 @@
+import time
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from config import METRICS_MINUTE_BUCKETS, METRICS_HOUR_BUCKETS, METRICS_USER_BURST_MINUTES, METRICS_MAX_USERS
+
+# Rolling event rates kept in memory. Each counter is a ring of fixed-width
+# time buckets backed by two arrays (count + which absolute bucket the slot
+# currently holds), so recording is O(1) and "last N minutes" is O(N) with no
+# log scan. Fed by logger.log_event in this process; history from before the
+# process started (and from other instances up to then) is seeded from the
+# log on first query.
+
+TRACKED_EVENTS = ("LOGIN_SUCCESS", "LOGIN_FAIL", "LOCK_WARN", "USER_LOCK_ON", "FREEZE_ON")
+
+
+class RingCounter:
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self.counts = array("L", [0]) * size
+        self.slots = array("q", [-1]) * size
+
+    def add(self, ts: float, n: int = 1) -> None:
+        b = int(ts // self.width)
+        i = b % self.size
+        if self.slots[i] != b:
+            if self.slots[i] > b:
+                return  # older than the ring reaches
+            self.slots[i] = b
+            self.counts[i] = 0
+        self.counts[i] += n
+
+    def series(self, n: int, now: Optional[float] = None) -> List[int]:
+        """Counts for the last n buckets, oldest first (current bucket last)."""
+        n = min(n, self.size)
+        cur = int((now if now is not None else time.time()) // self.width)
+        out = []
+        for b in range(cur - n + 1, cur + 1):
+            i = b % self.size
+            out.append(self.counts[i] if self.slots[i] == b else 0)
+        return out
+
+    def total(self, n: int, now: Optional[float] = None) -> int:
+        return sum(self.series(n, now))
+
+    def latest_bucket(self) -> int:
+        return max(self.slots)
+
+
+class MetricsStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()  # separate: seeding calls record(), which takes _lock
+        self.started_at = time.time()
+        self._seeded = False
+        self._minutes: Dict[str, RingCounter] = {e: RingCounter(60, METRICS_MINUTE_BUCKETS) for e in TRACKED_EVENTS}
+        self._hours: Dict[str, RingCounter] = {e: RingCounter(3600, METRICS_HOUR_BUCKETS) for e in TRACKED_EVENTS}
+        self._user_failures: Dict[str, RingCounter] = {}
+
+    def record(self, event: str, username: Optional[str] = None, ts: Optional[float] = None) -> None:
+        if event not in self._minutes:
+            return
+        ts = ts if ts is not None else time.time()
+        with self._lock:
+            self._minutes[event].add(ts)
+            self._hours[event].add(ts)
+            if event == "LOGIN_FAIL" and username:
+                ring = self._user_failures.get(username)
+                if ring is None:
+                    if len(self._user_failures) >= METRICS_MAX_USERS:
+                        self._evict_users()
+                    ring = self._user_failures[username] = RingCounter(60, METRICS_USER_BURST_MINUTES)
+                ring.add(ts)
+
+    def _evict_users(self) -> None:
+        # drop the half of the per-user rings that were touched longest ago
+        by_age = sorted(self._user_failures.items(), key=lambda kv: kv[1].latest_bucket())
+        for u, _ in by_age[: len(by_age) // 2 + 1]:
+            del self._user_failures[u]
+
+    def _ensure_seeded(self) -> None:
+        # queries from other threads wait for the scan rather than answer from half-seeded rings
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            from dashboard import iter_events
+            start = datetime.now(timezone.utc) - timedelta(hours=METRICS_HOUR_BUCKETS)
+            until = datetime.fromtimestamp(self.started_at, timezone.utc)
+            for e in iter_events(since=start, until=until, events=TRACKED_EVENTS):
+                try:
+                    ts = datetime.fromisoformat(e["ts"]).timestamp()
+                except (KeyError, ValueError):
+                    continue
+                if ts < self.started_at:
+                    self.record(e["event"], e.get("username"), ts)
+            self._seeded = True  # only now: a scan that raised is retried by the next query
+
+    # -------- queries --------
+    def per_minute(self, event: str, minutes: int = 30) -> List[int]:
+        self._ensure_seeded()
+        with self._lock:
+            return self._minutes[event].series(minutes)
+
+    def per_hour(self, event: str, hours: int = 24) -> List[int]:
+        self._ensure_seeded()
+        with self._lock:
+            return self._hours[event].series(hours)
+
+    def count_last_minutes(self, event: str, minutes: int) -> int:
+        return sum(self.per_minute(event, minutes))
+
+    def failure_bursts(self, minutes: int = 5, threshold: int = 3) -> List[Tuple[str, int]]:
+        """Users with at least threshold failed logins in the last N minutes, worst first."""
+        self._ensure_seeded()
+        with self._lock:
+            hits = [(u, r.total(minutes)) for u, r in self._user_failures.items()]
+        return sorted([h for h in hits if h[1] >= threshold], key=lambda h: -h[1])
+
+
+metrics = MetricsStore()
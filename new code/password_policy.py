@@ -0,0 +1,65 @@
+import time
+from typing import Optional
+import bcrypt
+from config import PASSWORD_HASH_ROUNDS
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    """bcrypt-hash a password at the configured cost (PASSWORD_HASH_ROUNDS)."""
+    rounds = rounds or PASSWORD_HASH_ROUNDS
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def verify_password(password: str, pw_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode(), pw_hash.encode())
+    except ValueError:
+        # malformed hash in the DB
+        return False
+
+
+def hash_cost(pw_hash: str) -> Optional[int]:
+    """Cost factor of a '$2b$12$...' style hash, or None if it can't be parsed."""
+    parts = pw_hash.split("$")
+    if len(parts) < 4:
+        return None
+    try:
+        return int(parts[2])
+    except ValueError:
+        return None
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    return hash_cost(pw_hash) != PASSWORD_HASH_ROUNDS
+
+
+def calibrate(target_ms: float = 250.0, min_rounds: int = 10, max_rounds: int = 16) -> int:
+    """
+    Pick the highest cost whose verify time on this machine stays within
+    target_ms. Each extra round doubles the work, so one timing at min_rounds
+    is enough to extrapolate; the chosen cost is then measured once to confirm.
+    """
+    def timed(rounds: int) -> float:
+        h = bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        start = time.perf_counter()
+        bcrypt.checkpw(b"calibration", h)
+        return (time.perf_counter() - start) * 1000
+
+    base = timed(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and base * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+    while rounds > min_rounds and timed(rounds) > target_ms:
+        rounds -= 1
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Suggest PASSWORD_HASH_ROUNDS for this machine")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    args = parser.parse_args()
+    print(f"PASSWORD_HASH_ROUNDS = {calibrate(args.target_ms)}")
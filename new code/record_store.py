@@ -0,0 +1,315 @@
+import os
+import hmac
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple
+from cryptography.fernet import InvalidToken
+from crypto_manager import encrypt_bytes, decrypt_bytes, load_users_encrypted, key_manager
+from file_lock import locked
+from config import USERS_DB_RECORDS_PATH, USERS_DB_ENC_PATH, USERS_RECORDS_COMPACT_RATIO
+
+# === Record file layout ===
+# Line 1:   "#BSSREC1 <fernet token of the index secret> <epoch>"
+# Others:   "<hmac(username) hex> <fernet token of the JSON user record>"
+# Records are only ever appended; the last record for a key wins. The username
+# never appears in plaintext, only its keyed HMAC, which is what the index uses.
+# Writers (appends and compaction) hold an exclusive lock on users.rec.lock;
+# once superseded records make up more than USERS_RECORDS_COMPACT_RATIO of the
+# file, the writer that noticed rewrites it before releasing the lock.
+# Every rewrite gets a fresh random epoch in the header; readers compare the
+# header they indexed with the current one before trusting cached offsets,
+# since a replaced file can come back with the same inode, size and mtime.
+# users.rec.names holds one fernet token of {hmac: username} for every user,
+# so listing usernames costs one decryption instead of one per record. Writers
+# add new users to it under the same lock.
+
+_MAGIC = b"#BSSREC1"
+
+
+def _header(secret_token: bytes) -> bytes:
+    return _MAGIC + b" " + secret_token + b" " + os.urandom(8).hex().encode("ascii") + b"\n"
+
+
+def _write_private(path: str, data: bytes) -> None:
+    """Write path as 0600, like the record file itself (a leftover file keeps its inode, so chmod too)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o600)
+    with os.fdopen(fd, "wb") as f:
+        try:
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+        f.write(data)
+
+
+class RecordUserStore:
+    """
+    Per-user encrypted records in an append-only file with an in-memory
+    username -> offset index. Single-user reads/writes touch only one record.
+    """
+
+    def __init__(self, path: str = USERS_DB_RECORDS_PATH, legacy_path: str = USERS_DB_ENC_PATH):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock = threading.RLock()
+        self._secret: Optional[bytes] = None
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._records: Dict[int, dict] = {}  # offset -> decrypted record (records are immutable)
+        self._header: Optional[bytes] = None  # first line of the file the index was built from
+        self._size = 0
+        self._names: Dict[str, str] = {}
+        self._names_sig: Optional[Tuple[int, int, int]] = None
+        self.dead_records = 0
+        self.dead_bytes = 0
+        self.compactions = 0
+        self.hits = 0
+        self.misses = 0
+
+    # -------- file/index maintenance --------
+    def _ensure_file(self) -> None:
+        if os.path.exists(self.path):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        legacy = load_users_encrypted() if os.path.exists(self.legacy_path) else {}
+        secret = os.urandom(32)
+        lines = [_header(encrypt_bytes(secret))]
+        lines += [self._encode(secret, rec) for rec in legacy.values()]
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+        except FileExistsError:
+            return  # another instance created it first
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"".join(lines))
+        if legacy:
+            self._save_names({self._key(name, secret): name for name in legacy})
+
+    def _reset(self) -> None:
+        self._secret = None
+        self._index = {}
+        self._records = {}
+        self._header = None
+        self._size = 0
+        self.dead_records = 0
+        self.dead_bytes = 0
+
+    @contextmanager
+    def _write_lock(self):
+        """Cross-process writer lock; callers already hold self._lock."""
+        with open(self.path + ".lock", "a+b") as lf, locked(lf):
+            yield
+
+    def _refresh(self) -> None:
+        """Bring the index up to date with whatever has been appended since the last look."""
+        self._ensure_file()
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            if header != self._header or os.fstat(f.fileno()).st_size < self._size:
+                self._reset()  # rewritten (compacted or rekeyed) since the index was built
+                if not header.startswith(_MAGIC):
+                    raise RuntimeError(f"{self.path} is not a user record file")
+                self._secret = decrypt_bytes(header[len(_MAGIC):].split()[0])
+                self._header = header
+                self._size = len(header)
+            f.seek(self._size)
+            offset = self._size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written record; pick it up next time
+                key, _, _ = line.partition(b" ")
+                key = key.decode("ascii")
+                if key in self._index:
+                    self.dead_records += 1
+                    self.dead_bytes += self._index[key][1]
+                self._index[key] = (offset, len(line))
+                offset += len(line)
+        self._size = offset
+
+    def _load_names(self) -> Dict[str, str]:
+        """hmac -> username from users.rec.names, decrypted again only when the file changes."""
+        try:
+            st = os.stat(self.path + ".names")
+        except FileNotFoundError:
+            return {}
+        sig = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if sig != self._names_sig:
+            with open(self.path + ".names", "rb") as f:
+                token = f.read()
+            try:
+                self._names = json.loads(decrypt_bytes(token).decode("utf-8"))
+            except (InvalidToken, ValueError):
+                self._names = {}  # unreadable: rebuilt from the records on the next listing
+            self._names_sig = sig
+        return self._names
+
+    def _save_names(self, names: Dict[str, str]) -> None:
+        # callers hold the write lock (or own a file nobody else has seen yet)
+        path = self.path + ".names"
+        _write_private(path + ".tmp", encrypt_bytes(json.dumps(names, separators=(",", ":")).encode("utf-8")))
+        os.replace(path + ".tmp", path)
+        st = os.stat(path)
+        self._names, self._names_sig = names, (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _key(self, username: str, secret: Optional[bytes] = None) -> str:
+        secret = secret if secret is not None else self._secret
+        return hmac.new(secret, username.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def _encode(self, secret: bytes, user: dict) -> bytes:
+        token = encrypt_bytes(json.dumps(user, separators=(",", ":")).encode("utf-8"))
+        return self._key(user["username"], secret).encode("ascii") + b" " + token + b"\n"
+
+    def _read_record(self, offset: int, length: int) -> Optional[dict]:
+        """The record at offset, or None if the file was compacted since the last _refresh()."""
+        rec = self._records.get(offset)
+        if rec is not None:
+            self.hits += 1
+            return rec
+        with open(self.path, "rb") as f:
+            if f.readline() != self._header:
+                return None
+            f.seek(offset)
+            line = f.read(length)
+        self.misses += 1
+        _, _, token = line.rstrip(b"\n").partition(b" ")
+        rec = json.loads(decrypt_bytes(token).decode("utf-8"))
+        self._records[offset] = rec
+        return rec
+
+    # -------- user_store API --------
+    def get_user(self, username: str) -> Optional[dict]:
+        with self._lock:
+            while True:
+                self._refresh()
+                loc = self._index.get(self._key(username))
+                if loc is None:
+                    return None
+                rec = self._read_record(*loc)
+                if rec is not None:
+                    return dict(rec) if rec.get("username") == username else None
+
+    def get_all_users(self) -> Dict[str, dict]:
+        with self._lock:
+            while True:
+                self._refresh()
+                result = {}
+                for loc in self._index.values():
+                    rec = self._read_record(*loc)
+                    if rec is None:
+                        break  # compacted by another instance: start over on the new file
+                    result[rec["username"]] = dict(rec)
+                else:
+                    return result
+
+    def list_usernames(self) -> List[str]:
+        """All usernames from the names file; only users missing from it are decrypted (and added)."""
+        with self._lock:
+            while True:
+                self._refresh()
+                names = self._load_names()
+                found = {}
+                for key, loc in self._index.items():
+                    if key not in names:
+                        rec = self._read_record(*loc)
+                        if rec is None:
+                            break  # compacted by another instance: start over on the new file
+                        found[key] = rec["username"]
+                else:
+                    break
+            if found:
+                with self._write_lock():
+                    merged = dict(self._load_names(), **found)
+                    self._save_names({k: v for k, v in merged.items() if k in self._index})
+                names = self._names
+            return [names[key] for key in self._index if key in names]
+
+    def upsert_user(self, user: dict) -> None:
+        with self._lock:
+            self._refresh()
+            line = self._encode(self._secret, user)
+            with self._write_lock():
+                # single O_APPEND write so concurrent writers never interleave records
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0))
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+                self._refresh()
+                key = line.partition(b" ")[0].decode("ascii")
+                names = self._load_names()
+                if names.get(key) != user["username"]:
+                    merged = {k: v for k, v in names.items() if k in self._index}
+                    merged[key] = user["username"]
+                    self._save_names(merged)
+                if self.dead_bytes > self._size * USERS_RECORDS_COMPACT_RATIO:
+                    self._compact()
+
+    def compact(self) -> None:
+        """
+        Rewrite the file keeping only the latest record per user. Tokens are
+        copied as-is, nothing is re-encrypted. upsert_user() calls this on its
+        own once enough of the file is dead weight.
+        """
+        with self._lock, self._write_lock():
+            self._compact()
+
+    def _compact(self) -> None:
+        # caller holds both locks, so no append can land in the file being replaced
+        self._refresh()
+        with open(self.path, "rb") as f:
+            header = _header(f.readline()[len(_MAGIC):].split()[0])
+            live = []
+            for offset, length in sorted(self._index.values()):
+                f.seek(offset)
+                live.append(f.read(length))
+        self._replace([header] + live)
+        self.compactions += 1
+
+    def rekey(self) -> None:
+        """
+        Re-encrypt the index secret and every live record under the current
+        primary key (compacting on the way), so older keys can be dropped.
+        """
+        with self._lock, self._write_lock():
+            self._refresh()
+            lines = [_header(encrypt_bytes(self._secret))]
+            with open(self.path, "rb") as f:
+                for offset, length in sorted(self._index.values()):
+                    f.seek(offset)
+                    key, _, token = f.read(length).rstrip(b"\n").partition(b" ")
+                    lines.append(key + b" " + key_manager.rotate(token) + b"\n")
+            names = self._load_names()
+            self._replace(lines)
+            if names:
+                self._save_names(names)
+
+    def _replace(self, lines: List[bytes]) -> None:
+        tmp = self.path + ".tmp"
+        _write_private(tmp, b"".join(lines))
+        os.replace(tmp, self.path)
+        self._reset()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "records": len(self._index),
+            "dead_records": self.dead_records,
+            "dead_bytes": self.dead_bytes,
+            "compactions": self.compactions,
+        }
+
+
+def migrate_from_blob(force: bool = False) -> int:
+    """
+    One-shot migration of users.json.enc into the record file.
+    Returns the number of users written. With force=True an existing record
+    file is replaced.
+    """
+    if force and os.path.exists(USERS_DB_RECORDS_PATH):
+        os.remove(USERS_DB_RECORDS_PATH)
+    store = RecordUserStore()
+    return len(store.get_all_users())
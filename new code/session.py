@@ -1,18 +1,27 @@
-from datetime import datetime, timezone
 from typing import Optional
 import atexit
-from active_sessions import add_active_session, remove_active_session, update_active_session, is_user_active
+import time
+from config import SESSION_HEARTBEAT_SECONDS
+from freeze_state import freeze_state
+from active_sessions import try_add_active_session, remove_active_session, update_active_session, is_user_active
 
 class SessionManager:
     def __init__(self):
         self.current_user: Optional[str] = None
-        self.is_frozen_until: Optional[str] = None
+        self._last_heartbeat = 0.0
         atexit.register(self.cleanup)
 
     def get_current_user(self) -> Optional[str]:
         if self.current_user:
-            update_active_session(self.current_user)
+            self.heartbeat()
         return self.current_user
+
+    def heartbeat(self, force: bool = False) -> None:
+        """Refresh our last_active, coalesced to once per SESSION_HEARTBEAT_SECONDS."""
+        now = time.monotonic()
+        if self.current_user and (force or now - self._last_heartbeat >= SESSION_HEARTBEAT_SECONDS):
+            self._last_heartbeat = now
+            update_active_session(self.current_user)
     
     def is_authenticated(self) -> bool:
         return self.current_user is not None
@@ -22,10 +31,10 @@ class SessionManager:
         return not is_user_active(username)
 
     def login(self, username: str) -> None:
-        if not self.can_login(username):
+        if not try_add_active_session(username):
             raise PermissionError("User already logged in")
         self.current_user = username
-        add_active_session(username)
+        self._last_heartbeat = time.monotonic()
 
     def logout(self) -> None:
         if self.current_user:
@@ -37,16 +46,23 @@ class SessionManager:
         if self.current_user:
             remove_active_session(self.current_user)
 
+    # Freeze state lives in freeze_state (shared across instances, survives restarts)
+    @property
+    def is_frozen_until(self) -> Optional[str]:
+        return freeze_state.frozen_until()
+
+    @is_frozen_until.setter
+    def is_frozen_until(self, iso_ts: Optional[str]) -> None:
+        freeze_state.set(iso_ts)
+
     def freeze_until(self, iso_ts: str) -> None:
         self.is_frozen_until = iso_ts
 
     def is_frozen(self) -> bool:
-        if not self.is_frozen_until:
-            return False
-        try:
-            return datetime.now(timezone.utc) < datetime.fromisoformat(self.is_frozen_until)
-        except Exception:
-            return False
+        return freeze_state.is_frozen()
+
+    def freeze_version(self) -> int:
+        return freeze_state.version()
 
     def clear_freeze(self) -> None:
         self.is_frozen_until = None
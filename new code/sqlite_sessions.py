@@ -0,0 +1,90 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict
+from datetime import datetime, timezone
+from config import SESSIONS_DB_PATH, SESSION_STALE_SECONDS, SESSION_LOCK_TIMEOUT
+
+# One row per logged-in user. last_active is a unix timestamp so stale-session
+# expiry is a range delete on its index; login is a single conditional upsert,
+# which closes the check-then-add window SessionManager.login used to have.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    username    TEXT PRIMARY KEY,
+    pid         INTEGER NOT NULL,
+    last_active REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions(last_active);
+"""
+
+
+class SqliteSessionRegistry:
+    def __init__(self, path: str = SESSIONS_DB_PATH, lock_timeout: float = SESSION_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _cutoff() -> float:
+        return time.time() - SESSION_STALE_SECONDS
+
+    def get_active_sessions(self) -> Dict:
+        rows = self._conn().execute(
+            "SELECT username, pid, last_active FROM sessions WHERE last_active > ?", (self._cutoff(),)
+        )
+        return {
+            u: {"pid": pid, "last_active": datetime.fromtimestamp(ts, timezone.utc).isoformat()}
+            for u, pid, ts in rows
+        }
+
+    def is_user_active(self, username: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM sessions WHERE username = ? AND last_active > ?", (username, self._cutoff())
+        ).fetchone()
+        return row is not None
+
+    def try_add(self, username: str) -> bool:
+        """Claim the session unless someone else holds a live one. Atomic."""
+        cur = self._conn().execute(
+            "INSERT INTO sessions(username, pid, last_active) VALUES (?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET pid = excluded.pid, last_active = excluded.last_active "
+            "WHERE sessions.last_active <= ?",
+            (username, os.getpid(), time.time(), self._cutoff()),
+        )
+        return cur.rowcount == 1
+
+    def add(self, username: str) -> None:
+        self._conn().execute(
+            "INSERT INTO sessions(username, pid, last_active) VALUES (?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET pid = excluded.pid, last_active = excluded.last_active",
+            (username, os.getpid(), time.time()),
+        )
+
+    def remove(self, username: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+    def touch(self, username: str) -> None:
+        self._conn().execute(
+            "UPDATE sessions SET last_active = ? WHERE username = ? AND last_active > ?",
+            (time.time(), username, self._cutoff()),
+        )
+
+    def prune_stale(self) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE last_active <= ?", (self._cutoff(),))
+
+    def lock_metrics(self) -> Dict[str, float]:
+        # SQLite does its own locking (busy timeout = lock_timeout); nothing to report
+        return {}
@@ -0,0 +1,216 @@
+import os
+import hmac
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict, List, Tuple
+from crypto_manager import encrypt_bytes, decrypt_bytes, load_users_encrypted, key_manager
+from config import USERS_DB_SQLITE_PATH, USERS_DB_ENC_PATH
+
+# users.user_key is an HMAC of the username (keyed by a secret kept encrypted
+# in the meta table), so lookups hit the primary-key index without storing
+# usernames in plaintext. The whole user record lives in the Fernet-encrypted
+# payload column; version bumps on every write so readers can reuse a
+# previously decrypted payload. meta 'usernames' is one encrypted
+# {user_key: username} map, extended in the transaction that adds a user, so
+# listing usernames costs one decryption instead of one per row.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name  TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_key TEXT PRIMARY KEY,
+    payload  BLOB NOT NULL,
+    version  INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+
+class SqliteUserStore:
+    def __init__(self, path: str = USERS_DB_SQLITE_PATH, legacy_path: str = USERS_DB_ENC_PATH):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._local = threading.local()
+        self._secret: Optional[bytes] = None
+        self._cache: Dict[str, Tuple[int, dict]] = {}  # user_key -> (version, record)
+        self._cache_lock = threading.Lock()
+        self._names: Tuple[Optional[bytes], Dict[str, str]] = (None, {})  # (token, decrypted map)
+        self.hits = 0
+        self.misses = 0
+
+    # -------- connection / schema --------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            if self._secret is None:
+                self._secret = self._load_secret(conn)
+        return conn
+
+    def _load_secret(self, conn: sqlite3.Connection) -> bytes:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'index_secret'").fetchone()
+            if row is None:
+                secret = os.urandom(32)
+                conn.execute("INSERT INTO meta(name, value) VALUES ('index_secret', ?)", (encrypt_bytes(secret),))
+                # first open of a fresh DB: pull in the legacy encrypted blob
+                if os.path.exists(self.legacy_path):
+                    legacy = load_users_encrypted()
+                    for rec in legacy.values():
+                        self._write(conn, secret, rec)
+                    self._add_names(conn, {self._key(name, secret): name for name in legacy})
+            else:
+                secret = decrypt_bytes(bytes(row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return secret
+
+    def _key(self, username: str, secret: Optional[bytes] = None) -> str:
+        secret = secret if secret is not None else self._secret
+        return hmac.new(secret, username.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def _write(self, conn: sqlite3.Connection, secret: bytes, user: dict) -> None:
+        payload = encrypt_bytes(json.dumps(user, separators=(",", ":")).encode("utf-8"))
+        conn.execute(
+            "INSERT INTO users(user_key, payload, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(user_key) DO UPDATE SET payload = excluded.payload, version = users.version + 1",
+            (self._key(user["username"], secret), payload),
+        )
+
+    def _read_names(self, conn: sqlite3.Connection) -> Dict[str, str]:
+        row = conn.execute("SELECT value FROM meta WHERE name = 'usernames'").fetchone()
+        if row is None:
+            return {}
+        token = bytes(row[0])
+        cached_token, names = self._names
+        if token != cached_token:
+            names = json.loads(decrypt_bytes(token).decode("utf-8"))
+            self._names = (token, names)
+        return names
+
+    def _add_names(self, conn: sqlite3.Connection, new: Dict[str, str]) -> None:
+        """Merge new entries into meta 'usernames'; caller holds a write transaction."""
+        names = dict(self._read_names(conn), **new)
+        conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('usernames', ?)",
+                     (encrypt_bytes(json.dumps(names, separators=(",", ":")).encode("utf-8")),))
+
+    def _decode(self, user_key: str, payload: bytes, version: int) -> dict:
+        with self._cache_lock:
+            cached = self._cache.get(user_key)
+            if cached and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+        self.misses += 1
+        rec = json.loads(decrypt_bytes(bytes(payload)).decode("utf-8"))
+        with self._cache_lock:
+            self._cache[user_key] = (version, rec)
+        return rec
+
+    # -------- user_store API --------
+    def get_user(self, username: str) -> Optional[dict]:
+        conn = self._conn()
+        key = self._key(username)
+        row = conn.execute("SELECT payload, version FROM users WHERE user_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        rec = self._decode(key, row[0], row[1])
+        return dict(rec) if rec.get("username") == username else None
+
+    def get_all_users(self) -> Dict[str, dict]:
+        conn = self._conn()
+        result = {}
+        for key, payload, version in conn.execute("SELECT user_key, payload, version FROM users"):
+            rec = self._decode(key, payload, version)
+            result[rec["username"]] = dict(rec)
+        return result
+
+    def list_usernames(self) -> List[str]:
+        """All usernames from meta 'usernames'; only rows missing from it are decrypted (and added)."""
+        conn = self._conn()
+        names = self._read_names(conn)
+        keys = [r[0] for r in conn.execute("SELECT user_key FROM users")]
+        missing = [k for k in keys if k not in names]
+        if missing:
+            found = {}
+            for key in missing:
+                row = conn.execute("SELECT payload, version FROM users WHERE user_key = ?", (key,)).fetchone()
+                if row is not None:
+                    found[key] = self._decode(key, row[0], row[1])["username"]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._add_names(conn, found)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            names = dict(names, **found)
+        return [names[k] for k in keys if k in names]
+
+    def upsert_user(self, user: dict) -> None:
+        conn = self._conn()
+        key = self._key(user["username"])
+        if key in self._read_names(conn):
+            self._write(conn, self._secret, user)
+            return
+        # a new user: the row and its entry in the username map go in together
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._write(conn, self._secret, user)
+            self._add_names(conn, {key: user["username"]})
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rekey(self) -> None:
+        """Re-encrypt the index secret and every payload under the current primary key."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, value in conn.execute("SELECT name, value FROM meta").fetchall():
+                conn.execute("UPDATE meta SET value = ? WHERE name = ?", (key_manager.rotate(bytes(value)), name))
+            for user_key, payload in conn.execute("SELECT user_key, payload FROM users").fetchall():
+                conn.execute("UPDATE users SET payload = ?, version = version + 1 WHERE user_key = ?",
+                             (key_manager.rotate(bytes(payload)), user_key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def invalidate(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache)}
+
+
+def import_from_blob(path: str = USERS_DB_SQLITE_PATH) -> int:
+    """
+    One-shot import of users.json.enc into the SQLite store (existing rows are
+    overwritten by the blob's version). Returns the number of users imported.
+    """
+    store = SqliteUserStore(path)
+    conn = store._conn()
+    users = load_users_encrypted()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for rec in users.values():
+            store._write(conn, store._secret, rec)
+        store._add_names(conn, {store._key(name): name for name in users})
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return len(users)
@@ -0,0 +1,110 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# Cold-start measurement for `main.py --profile-startup`. ImportTimer sits at
+# the front of sys.meta_path and times each module's execution (cumulative and
+# self, like `python -X importtime`, minus path search). StartupProfile adds
+# named phases and checks the time to a painted login window against a budget.
+
+
+class ImportTimer:
+    def __init__(self):
+        self.records: List[Tuple[str, float, float, int]] = []  # name, cumulative s, self s, depth
+        self._local = threading.local()  # per-thread stack of child time; imports also run on worker threads
+
+    def _stack(self) -> List[float]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+            self._local.finding = False
+        return self._local.stack
+
+    def find_spec(self, fullname, path=None, target=None):
+        self._stack()
+        if self._local.finding:
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        loader = spec.loader
+        # builtin/frozen loaders are classes shared by every module: leave those alone
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, name, exec_module):
+        def run(module):
+            stack = self._stack()
+            depth = len(stack)
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                total = time.perf_counter() - start
+                children = stack.pop()
+                self.records.append((name, total, total - children, depth))
+                if stack:
+                    stack[-1] += total
+        return run
+
+    def install(self) -> None:
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+class StartupProfile:
+    def __init__(self, budget_ms: float, started: Optional[float] = None):
+        self.budget_ms = budget_ms
+        self.started = started if started is not None else time.perf_counter()
+        self.imports = ImportTimer()
+        self.phases: List[Tuple[str, float, bool]] = []  # name, seconds, on the critical path
+        self.ready_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str, critical: bool = True):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start, critical))
+
+    def mark_ready(self) -> None:
+        """The login window is on screen: this is what the budget covers."""
+        self.ready_at = time.perf_counter()
+
+    def ready_ms(self) -> float:
+        return ((self.ready_at or time.perf_counter()) - self.started) * 1000
+
+    def within_budget(self) -> bool:
+        return self.ready_ms() <= self.budget_ms
+
+    def report(self, top: int = 15, out=None) -> None:
+        out = out or sys.stdout
+        w = out.write
+        w("Startup profile\n")
+        w("  phases:\n")
+        for name, secs, critical in self.phases:
+            w(f"    {secs * 1000:8.1f} ms  {name}{'' if critical else '  (deferred)'}\n")
+        ready = self.ready_ms()
+        verdict = "ok" if self.within_budget() else f"OVER BUDGET by {ready - self.budget_ms:.1f} ms"
+        w(f"  window ready after {ready:.1f} ms (budget {self.budget_ms:.0f} ms): {verdict}\n")
+        total_imports = sum(r[1] for r in self.imports.records if r[3] == 0)
+        w(f"  imports: {len(self.imports.records)} modules, {total_imports * 1000:.1f} ms\n")
+        w("  slowest imports (cumulative / self):\n")
+        for name, cum, own, depth in sorted(self.imports.records, key=lambda r: -r[1])[:top]:
+            w(f"    {cum * 1000:8.1f} ms {own * 1000:8.1f} ms  {'  ' * min(depth, 4)}{name}\n")
@@ -0,0 +1,26 @@
+import os
+import sys
+
+from cryptography.fernet import Fernet
+
+# The modules live flat in "new code/" and read their paths from config at
+# import time, so tests build their objects on tmp_path explicitly. The Fernet
+# key comes from the environment so nothing touches the real data/key.key.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ["SECURITY_FERNET_KEY"] = Fernet.generate_key().decode()
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    """Point security.log, its lock and the segment manifest at tmp_path/logs."""
+    import log_segments
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    log_path = str(logs / "security.log")
+    monkeypatch.setattr(log_segments, "LOG_PATH", log_path)
+    monkeypatch.setattr(log_segments, "LOCK_PATH", log_path + ".lock")
+    monkeypatch.setattr(log_segments, "LOG_MANIFEST_PATH", str(logs / "security.manifest.json"))
+    return logs
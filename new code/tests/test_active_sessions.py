@@ -0,0 +1,44 @@
+import pytest
+
+import auth_manager
+from active_sessions import JsonSessionRegistry
+from file_lock import LockTimeout, locked
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return JsonSessionRegistry(str(tmp_path / "active_sessions.json"), lock_timeout=0.05)
+
+
+def test_claim_and_release(registry):
+    assert registry.try_add("alice")
+    assert not registry.try_add("alice")
+    assert registry.is_user_active("alice")
+    registry.remove("alice")
+    assert registry.get_active_sessions() == {}
+
+
+def test_read_times_out_instead_of_reporting_nobody(registry):
+    registry.add("alice")
+    with open(registry.path, "r+b") as f, locked(f):
+        with pytest.raises(LockTimeout):
+            registry.get_active_sessions()
+        with pytest.raises(LockTimeout):
+            registry.try_add("bob")
+    assert registry.is_user_active("alice")
+
+
+def test_authenticate_reports_busy_registry(monkeypatch):
+    def busy(username):
+        raise LockTimeout("held")
+
+    events = []
+    monkeypatch.setattr(auth_manager, "_auto_unlock_system_if_due", lambda: None)
+    monkeypatch.setattr(auth_manager, "_auto_unlock_user_if_due", lambda u: None)
+    monkeypatch.setattr(auth_manager, "is_system_frozen", lambda: False)
+    monkeypatch.setattr(auth_manager, "get_user", lambda u: {"username": u, "password_hash": "x"})
+    monkeypatch.setattr(auth_manager, "log_event", lambda event, user, **kw: events.append((event, kw)))
+    monkeypatch.setattr(auth_manager.session, "can_login", busy)
+    ok, msg = auth_manager.authenticate("alice", "pw")
+    assert not ok and "busy" in msg
+    assert events == [("LOGIN_FAIL", {"reason": "session_registry_busy"})]
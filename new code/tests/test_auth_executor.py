@@ -0,0 +1,8 @@
+import auth_executor
+
+
+def test_user_locks_are_stable_and_bounded():
+    assert auth_executor.user_lock("alice") is auth_executor.user_lock("alice")
+    seen = {id(auth_executor.user_lock(f"random-{i}")) for i in range(10000)}
+    assert len(seen) <= auth_executor._USER_LOCK_STRIPES
+    assert len(auth_executor._user_locks) == auth_executor._USER_LOCK_STRIPES
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+import crypto_manager
+import vault
+from crypto_manager import key_manager, rotate_key
+from record_store import RecordUserStore
+from sqlite_store import SqliteUserStore
+
+
+@pytest.fixture
+def key_file(tmp_path, monkeypatch):
+    """File-based keys and user stores under tmp_path."""
+    monkeypatch.delenv("SECURITY_FERNET_KEY")
+    for name, rel in (("FERNET_KEY_PATH", "key.key"), ("USERS_DB_ENC_PATH", "users.json.enc"),
+                      ("USERS_DB_RECORDS_PATH", "users.rec"), ("USERS_DB_SQLITE_PATH", "users.db"),
+                      ("PROTECTED_DIR", "protected")):
+        monkeypatch.setattr(crypto_manager, name, str(tmp_path / rel))
+    (tmp_path / "protected").mkdir()
+    key_manager.reload()
+    yield tmp_path
+    key_manager.reload()
+
+
+def test_keys_consistent_under_reload():
+    errors = []
+
+    def reader():
+        for _ in range(2000):
+            try:
+                assert key_manager.keys()
+            except Exception as exc:  # e.g. TypeError from a half-reset manager
+                errors.append(exc)
+                return
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for _ in range(2000):
+        key_manager.reload()
+    for t in threads:
+        t.join()
+    assert not errors
+
+
+def test_rotate_keep_old(key_file):
+    token = crypto_manager.encrypt_bytes(b"data")
+    old = key_manager.primary_key()
+    rotate_key()
+    assert key_manager.keys()[1:] == [old]
+    assert crypto_manager.decrypt_bytes(token) == b"data"
+
+
+def test_rotate_drop_old_reencrypts_user_stores(key_file):
+    records = RecordUserStore(str(key_file / "users.rec"), str(key_file / "users.json.enc"))
+    records.upsert_user({"username": "alice", "n": 1})
+    db = SqliteUserStore(str(key_file / "users.db"), str(key_file / "users.json.enc"))
+    db.upsert_user({"username": "bob", "n": 2})
+    crypto_manager.save_users_encrypted({"carol": {"username": "carol"}})
+    old = key_manager.primary_key()
+
+    rotate_key(keep_old=False)
+    assert old not in key_manager.keys() and len(key_manager.keys()) == 1
+
+    old_only = Fernet(old)
+    raw = (key_file / "users.rec").read_bytes()
+    with pytest.raises(InvalidToken):
+        old_only.decrypt(raw.split(b"\n")[0].split(b" ")[1])
+    assert RecordUserStore(records.path, records.legacy_path).get_user("alice")["n"] == 1
+    assert SqliteUserStore(db.path, db.legacy_path).get_user("bob")["n"] == 2
+    assert crypto_manager.load_users_encrypted()["carol"]["username"] == "carol"
+    # instances opened before the rotation pick up the rewritten data
+    assert records.get_user("alice")["n"] == 1
+    assert db.get_user("bob")["n"] == 2
+
+
+def test_rotate_drop_old_refused_while_vault_files_need_it(key_file):
+    vault.write_bytes(str(key_file / "protected" / "secret.bin"), b"payload")
+    old = key_manager.primary_key()
+    with pytest.raises(RuntimeError):
+        rotate_key(keep_old=False)
+    assert key_manager.keys() == [old]
+    rotate_key()  # keeping the old key is fine
+    with open(key_file / "protected" / "secret.bin", "rb") as f:
+        assert vault.VaultReader(f).read_range(0, 7) == b"payload"
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import dashboard
+import log_segments
+from dashboard import iter_events, refresh_summary, summarize_events
+
+USERS = ["alice", "bob", "carol"]
+
+
+@pytest.fixture
+def log(log_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard, "LOG_PATH", log_segments.LOG_PATH)
+    monkeypatch.setattr(dashboard, "DASHBOARD_STATE_PATH", str(tmp_path / "dashboard_state.json"))
+    return log_dir / "security.log"
+
+
+def _append(path, start, n, day="2026-02-01"):
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(start, start + n):
+            event = ["LOGIN_SUCCESS", "LOGIN_FAIL", "FREEZE_ON"][i % 3]
+            e = {"ts": f"{day}T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+                 "event": event, "username": USERS[i % len(USERS)]}
+            f.write(json.dumps(e) + "\n")
+
+
+def _check():
+    assert refresh_summary() == summarize_events(iter_events())
+
+
+def test_append_is_consumed_incrementally(log, monkeypatch):
+    _append(log, 0, 30)
+    _check()
+    summarized = os.path.getsize(log)
+    _append(log, 30, 20)
+    offsets = []
+    real = dashboard._consume
+    monkeypatch.setattr(dashboard, "_consume", lambda f, s, offset=0: offsets.append(offset) or real(f, s, offset))
+    _check()
+    assert offsets == [summarized]  # only the appended lines were parsed
+
+
+@pytest.mark.parametrize("sealed", [False, True])
+def test_rotation_continues_from_the_segment(log, sealed):
+    _append(log, 0, 30)
+    _check()
+    _append(log, 30, 10)  # not summarized yet when the log is rotated
+    with log_segments.lock_file() as lf, log_segments.locked(lf):
+        raw = log_segments.rotate("2026-02-01T00:00:00+00:00")
+    if sealed:
+        log_segments.seal(raw)
+    _append(log, 40, 15, day="2026-02-02")
+    _check()
+    _append(log, 55, 5, day="2026-02-02")
+    _check()
+
+
+def test_truncated_log_is_rebuilt(log):
+    _append(log, 0, 30)
+    _check()
+    with open(log, "r+b") as f:
+        f.truncate(0)  # copytruncate-style rotation elsewhere
+    _append(log, 100, 5)
+    _check()
+
+
+def test_log_rewritten_past_the_checkpoint_is_rebuilt(log):
+    _append(log, 0, 30)
+    _check()
+    with open(log, "r+b") as f:
+        f.truncate(0)
+    _append(log, 0, 1)  # same first line as before
+    _append(log, 200, 60)  # and longer than the old offset
+    _check()
+
+
+def test_replaced_log_with_a_new_inode_is_rebuilt(log):
+    _append(log, 0, 30)
+    _check()
+    os.remove(log)  # deleted by hand, no manifest entry
+    _append(log, 300, 7)
+    _check()
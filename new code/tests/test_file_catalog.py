@@ -0,0 +1,150 @@
+import os
+import time
+
+import pytest
+
+from file_catalog import FileCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    root = tmp_path / "protected"
+    root.mkdir()
+    return FileCatalog(str(tmp_path / "catalog.db"), str(root))
+
+
+def _tick():
+    time.sleep(0.02)  # directory mtimes are only as fine as the kernel's clock tick
+
+
+def _write(catalog, name, data):
+    with open(os.path.join(catalog.root, name), "wb") as f:
+        f.write(data)
+
+
+def test_reconcile_picks_up_external_changes(catalog):
+    _write(catalog, "a.txt", b"one")
+    assert catalog.reconcile()
+    assert [e["name"] for e in catalog.list_entries()] == ["a.txt"]
+    assert not catalog.reconcile()  # nothing moved
+    _tick()
+    os.remove(os.path.join(catalog.root, "a.txt"))
+    assert catalog.reconcile()
+    assert catalog.count() == 0
+
+
+def test_own_writes_keep_catalog_in_sync(catalog):
+    catalog.reconcile()
+    _tick()
+    before = catalog.dir_mtime()
+    _write(catalog, "a.txt", b"one")
+    catalog.record_write("a.txt", None, "alice", before)
+    assert not catalog.reconcile()
+    assert catalog.get("a.txt")["owner"] == "alice"
+
+    _tick()
+    before = catalog.dir_mtime()
+    os.remove(os.path.join(catalog.root, "a.txt"))
+    catalog.record_delete("a.txt", before)
+    assert not catalog.reconcile()
+    assert catalog.count() == 0
+
+
+def test_own_write_does_not_hide_an_earlier_external_change(catalog):
+    catalog.reconcile()
+    _tick()
+    _write(catalog, "external.txt", b"dropped in by hand")
+    _tick()
+    before = catalog.dir_mtime()
+    _write(catalog, "a.txt", b"one")
+    catalog.record_write("a.txt", None, "alice", before)
+    assert catalog.reconcile()
+    assert {e["name"] for e in catalog.list_entries()} == {"a.txt", "external.txt"}
+
+
+def _fresh(catalog, data):
+    path = os.path.join(catalog.root, "body" + os.urandom(4).hex() + ".~bss-tmp")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _store(catalog, name, blob, data):
+    os.makedirs(os.path.dirname(catalog.blob_path(blob)), exist_ok=True)
+    if not catalog.link_blob(name, blob, blob, "alice"):
+        assert catalog.link_blob(name, blob, blob, "alice", fresh=_fresh(catalog, data))
+
+
+def _refs(catalog, blob):
+    row = catalog._conn().execute("SELECT refs FROM blobs WHERE id = ?", (blob,)).fetchone()
+    return row[0] if row else 0
+
+
+def test_link_and_release_refcounts(catalog):
+    _store(catalog, "a.txt", "aa11", b"same")
+    _store(catalog, "b.txt", "aa11", b"same")
+    assert _refs(catalog, "aa11") == 2
+    assert os.path.samefile(os.path.join(catalog.root, "a.txt"), catalog.blob_path("aa11"))
+
+    os.remove(os.path.join(catalog.root, "a.txt"))
+    catalog.record_delete("a.txt")
+    assert _refs(catalog, "aa11") == 1 and os.path.exists(catalog.blob_path("aa11"))
+
+    _store(catalog, "b.txt", "bb22", b"other")  # overwrite: the old blob loses its last name
+    assert _refs(catalog, "aa11") == 0 and not os.path.exists(catalog.blob_path("aa11"))
+    assert _refs(catalog, "bb22") == 1
+    with open(os.path.join(catalog.root, "b.txt"), "rb") as f:
+        assert f.read() == b"other"
+
+
+def test_restoring_a_missing_blob_keeps_its_refcount(catalog):
+    _store(catalog, "a.txt", "aa11", b"same")
+    _store(catalog, "b.txt", "aa11", b"same")
+    os.remove(catalog.blob_path("aa11"))  # blob file lost, names still link the old inode
+    _store(catalog, "c.txt", "aa11", b"same")
+    assert _refs(catalog, "aa11") == 3
+    for name in ("a.txt", "c.txt"):
+        os.remove(os.path.join(catalog.root, name))
+        catalog.record_delete(name)
+    assert _refs(catalog, "aa11") == 1 and os.path.exists(catalog.blob_path("aa11"))
+
+
+def test_rollback_keeps_released_blob_and_drops_fresh_one(catalog, monkeypatch):
+    _store(catalog, "a.txt", "aa11", b"old")
+    os.makedirs(os.path.dirname(catalog.blob_path("bb22")), exist_ok=True)
+
+    def fail(conn, dir_before):
+        raise RuntimeError("commit never happens")
+
+    monkeypatch.setattr(catalog, "_mark_synced", fail)
+    with pytest.raises(RuntimeError):
+        catalog.link_blob("a.txt", "bb22", "bb22", "alice", fresh=_fresh(catalog, b"new"))
+    assert os.path.exists(catalog.blob_path("aa11")) and _refs(catalog, "aa11") == 1
+    assert not os.path.exists(catalog.blob_path("bb22")) and _refs(catalog, "bb22") == 0
+
+
+def test_linked_names_are_read_only(catalog):
+    _store(catalog, "a.txt", "aa11", b"same")
+    _store(catalog, "b.txt", "aa11", b"same")
+    for path in (catalog.blob_path("aa11"), os.path.join(catalog.root, "a.txt"), os.path.join(catalog.root, "b.txt")):
+        assert os.stat(path).st_mode & 0o777 == 0o444
+
+
+def test_tampered_blob_is_not_reused(catalog):
+    _store(catalog, "a.txt", "aa11", b"hello world\n")
+    _store(catalog, "b.txt", "aa11", b"hello world\n")
+    a = os.path.join(catalog.root, "a.txt")
+    os.chmod(a, 0o644)
+    with open(a, "r+b") as f:  # edited in place through the OS: every duplicate changes
+        f.write(b"HACKED")
+
+    def verify(path):
+        with open(path, "rb") as f:
+            return f.read() == b"hello world\n"
+
+    assert not catalog.link_blob("c.txt", "aa11", "aa11", "alice", verify=verify)
+    assert catalog.link_blob("c.txt", "aa11", "aa11", "alice", fresh=_fresh(catalog, b"hello world\n"), verify=verify)
+    for path in (catalog.blob_path("aa11"), os.path.join(catalog.root, "c.txt")):
+        with open(path, "rb") as f:
+            assert f.read() == b"hello world\n"
+    assert _refs(catalog, "aa11") == 3
@@ -0,0 +1,62 @@
+import os
+import time
+import threading
+
+import pytest
+
+import file_lock
+from file_lock import LockTimeout, locked
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="kernel wait is the POSIX path")
+
+
+@pytest.fixture
+def path(tmp_path):
+    p = tmp_path / "x.lock"
+    p.write_bytes(b"")
+    return str(p)
+
+
+def _free(path):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        return file_lock._try_lock(fd, exclusive=True)
+    finally:
+        os.close(fd)
+
+
+def test_timed_wait_blocks_in_the_kernel(path, monkeypatch):
+    def no_polling(_):
+        raise AssertionError("timed wait should not sleep-poll")
+
+    monkeypatch.setattr(file_lock.time, "sleep", no_polling)
+    holder = open(path, "r+b")
+    file_lock.acquire(holder.fileno())
+    threading.Timer(0.05, file_lock.release, args=(holder.fileno(),)).start()
+    try:
+        with open(path, "r+b") as f, locked(f, timeout=5):
+            assert not _free(path)
+    finally:
+        holder.close()
+
+
+def test_lock_granted_after_a_timeout_is_dropped(path):
+    holder = open(path, "r+b")
+    file_lock.acquire(holder.fileno())
+    with open(path, "r+b") as f:
+        with pytest.raises(LockTimeout):
+            file_lock.acquire(f.fileno(), timeout=0.05)
+    holder.close()  # the abandoned waiter gets it now and must let go straight away
+    deadline = time.monotonic() + 5
+    while not _free(path):
+        assert time.monotonic() < deadline, "abandoned waiter kept the lock"
+        time.sleep(0.01)
+
+
+def test_shared_waiters_get_in_together(path):
+    holder = open(path, "r+b")
+    file_lock.acquire(holder.fileno())
+    threading.Timer(0.05, holder.close).start()
+    with open(path, "rb") as a, open(path, "rb") as b:
+        file_lock.acquire(a.fileno(), exclusive=False, timeout=5)
+        file_lock.acquire(b.fileno(), exclusive=False, timeout=1)
@@ -0,0 +1,46 @@
+import struct
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from freeze_state import FreezeState
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "freeze_state.bin")
+
+
+def _in(seconds):
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def test_set_is_seen_by_other_instances(path):
+    writer, reader = FreezeState(path), FreezeState(path)
+    assert not reader.is_frozen() and reader.version() == 0
+    writer.set(_in(60))
+    assert reader.is_frozen() and reader.version() == 1
+    assert abs(reader.frozen_until_ts() - (time.time() + 60)) < 5
+    writer.set(None)
+    assert not reader.is_frozen() and reader.frozen_until() is None
+    assert reader.version() == 2
+
+
+def test_expired_freeze_reads_as_unfrozen(path):
+    FreezeState(path).set(_in(-1))
+    assert not FreezeState(path).is_frozen()
+
+
+def test_reader_keeps_last_value_while_a_write_is_in_progress(path):
+    writer, reader = FreezeState(path), FreezeState(path)
+    writer.set(_in(60))
+    until = reader.frozen_until_ts()
+    mm = writer._map()
+    seq = struct.unpack_from("<Q", mm, 0)[0]
+    struct.pack_into("<Q", mm, 0, seq + 1)  # writer stopped between the odd bump and the data
+    struct.pack_into("<d", mm, 8, 12345.0)
+    assert reader.frozen_until_ts() == until  # never the half-written value
+    FreezeState(path).set(None)  # the next writer recovers from the odd seq
+    assert reader.frozen_until_ts() == 0.0
+    assert struct.unpack_from("<Q", mm, 0)[0] % 2 == 0
@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+import fs_watch
+from fs_watch import DirWatcher
+
+
+def _next_batch(q, timeout=5.0):
+    return q.get(timeout=timeout)
+
+
+def _wait_backend(watcher, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while watcher.backend is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return watcher.backend
+
+
+@pytest.mark.skipif(fs_watch._load_inotify() is None, reason="inotify only")
+def test_inotify_sees_an_in_place_edit_before_close(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"hello")
+    watcher = DirWatcher(str(tmp_path))
+    q = watcher.subscribe()
+    try:
+        assert _wait_backend(watcher) == "inotify"
+        with open(path, "r+b") as f:
+            f.write(b"HACKED")
+            f.flush()
+            assert _next_batch(q) == [("modified", "a.txt")]
+    finally:
+        watcher.unsubscribe(q)
+
+
+@pytest.fixture
+def polling(monkeypatch):
+    monkeypatch.setattr(fs_watch, "_load_inotify", lambda: None)
+    monkeypatch.setattr(fs_watch, "FS_WATCH_POLL_SECONDS", 0.02)
+
+
+def _collect(q, want, timeout=5.0):
+    """Deltas from q until every one in want has shown up."""
+    got = []
+    deadline = time.monotonic() + timeout
+    while not set(want) <= set(got):
+        got += q.get(timeout=max(0.01, deadline - time.monotonic()))
+    return got
+
+
+def test_polling_fallback_sees_adds_changes_and_removes(tmp_path, polling):
+    (tmp_path / "old.txt").write_bytes(b"x")
+    watcher = DirWatcher(str(tmp_path))
+    q = watcher.subscribe()
+    try:
+        assert _wait_backend(watcher) == "poll"
+        (tmp_path / "new.txt").write_bytes(b"hello")
+        (tmp_path / ("partial" + fs_watch.TMP_SUFFIX)).write_bytes(b"in flight")
+        os.remove(tmp_path / "old.txt")
+        got = _collect(q, [("added", "new.txt"), ("removed", "old.txt")])
+        assert not any(name.endswith(fs_watch.TMP_SUFFIX) for _, name in got)
+        (tmp_path / "new.txt").write_bytes(b"hello, longer")
+        assert _collect(q, [("modified", "new.txt")])
+    finally:
+        watcher.unsubscribe(q)
+    assert watcher._stop is None  # the thread ends with the last subscriber
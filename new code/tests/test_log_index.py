@@ -0,0 +1,124 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import log_index
+import log_segments
+from dashboard import iter_events
+from log_index import search
+
+USERS = ["alice", "bob", "carol", "dave", None]
+EVENTS = ["LOGIN_SUCCESS", "LOGIN_FAIL", "LOCK_WARN", "LOGOUT"]
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _append(path, events):
+    with open(path, "a", encoding="utf-8") as f:
+        for e in events:
+            f.write(json.dumps(e) + "\n")
+
+
+def _events(rng, start, n):
+    out = []
+    for i in range(n):
+        e = {"ts": (T0 + timedelta(seconds=(start + i) * 7)).isoformat(), "event": rng.choice(EVENTS)}
+        user = rng.choice(USERS)
+        if user:
+            e["username"] = user
+        out.append(e)
+    return out
+
+
+@pytest.fixture
+def history(log_dir):
+    """Two sealed segments plus an active log, indexed in many small batches."""
+    rng = random.Random(7)
+    log = str(log_dir / "security.log")
+    start = 0
+    for segment in range(3):
+        for _ in range(40):
+            batch = _events(rng, start, rng.randint(1, 12))
+            start += len(batch)
+            _append(log, batch)
+            log_index.update(log)
+        if segment < 2:
+            with log_segments.lock_file() as lf, log_segments.locked(lf):
+                raw = log_segments.rotate(batch[0]["ts"])
+            log_segments.seal(raw)
+    return log_dir
+
+
+QUERIES = [
+    {"username": "alice"},
+    {"events": ["LOGIN_FAIL"]},
+    {"username": "bob", "events": ["LOGIN_FAIL", "LOCK_WARN"]},
+    {"username": "carol", "since": T0 + timedelta(minutes=20), "until": T0 + timedelta(minutes=90)},
+    {"events": ["LOGOUT"], "since": T0 + timedelta(minutes=45)},
+    {"since": T0 + timedelta(minutes=10), "until": T0 + timedelta(minutes=11)},
+    {"username": "nobody"},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_full_scan(history, query):
+    expected = list(iter_events(**query))
+    assert list(search(**query)) == expected
+    assert list(search(limit=3, **query)) == expected[:3]
+
+
+def test_postings_stay_logarithmic(history):
+    log = str(history / "security.log")
+    with open(log_index.postings_path(log), "rb") as f:
+        data = f.read()
+    runs = log_index._runs(data, len(data))
+    assert runs[-1][3] == os.path.getsize(log_index.index_path(log)) // log_index._REC.size
+    assert len(runs) <= 12
+    assert [r[1] for r in runs] == sorted((r[1] for r in runs), reverse=True)
+
+
+def test_torn_postings_are_rebuilt(history):
+    log = str(history / "security.log")
+    query = {"username": "alice", "events": ["LOGIN_SUCCESS"]}
+    expected = list(iter_events(**query))
+    with open(log_index.postings_path(log), "r+b") as f:
+        f.truncate(os.path.getsize(log_index.postings_path(log)) - 5)
+    assert list(search(**query)) == expected
+    with open(log_index.postings_path(log), "r+b") as f:
+        f.truncate(0)
+    assert list(search(**query)) == expected
+
+
+def test_search_tolerates_out_of_order_batches(log_dir):
+    """Batches from several writers land a little out of ts order; the slack keeps windowed searches exact."""
+    log = str(log_dir / "security.log")
+    rng = random.Random(3)
+    jitter = int(log_index._TS_SLACK) // 2 - 1  # any two events at most ~slack apart out of order
+    events = []
+    for i in range(400):
+        e = {"ts": (T0 + timedelta(seconds=i * 2 + rng.randint(-jitter, jitter))).isoformat(),
+             "event": rng.choice(EVENTS), "username": rng.choice(USERS[:-1])}
+        events.append(e)
+    for i in range(0, len(events), 25):
+        _append(log, events[i:i + 25])
+        log_index.update(log)
+    assert [e["ts"] for e in events] != sorted(e["ts"] for e in events)
+    for query in ({"since": T0 + timedelta(minutes=5), "until": T0 + timedelta(minutes=6)},
+                  {"username": "alice", "since": T0 + timedelta(minutes=3), "until": T0 + timedelta(minutes=9)},
+                  {"events": ["LOGIN_FAIL"], "until": T0 + timedelta(minutes=2)}):
+        expected = list(iter_events(**query))
+        assert expected and list(search(**query)) == expected
+
+
+def test_stale_active_index_is_rebuilt(log_dir):
+    log = str(log_dir / "security.log")
+    rng = random.Random(1)
+    _append(log, _events(rng, 0, 50))
+    log_index.update(log)
+    # a rotation cut short: the old .idx stayed behind for a new, shorter log
+    os.remove(log)
+    fresh = _events(rng, 1000, 3)
+    _append(log, fresh)
+    assert [e["ts"] for e in search()] == [e["ts"] for e in fresh]
@@ -0,0 +1,38 @@
+import gzip
+import json
+
+import log_segments
+
+
+def _write(path, *stamps):
+    with open(path, "w", encoding="utf-8") as f:
+        for ts in stamps:
+            f.write(json.dumps({"ts": ts, "event": "LOGIN_SUCCESS", "username": "alice"}) + "\n")
+
+
+def test_rotate_then_seal(log_dir):
+    _write(log_dir / "security.log", "2026-01-01T00:00:00+00:00", "2026-01-01T00:05:00+00:00")
+    raw = log_segments.rotate("2026-01-01T00:00:00+00:00")
+    log_segments.seal(raw)
+    (seg,) = log_segments.read_manifest()["segments"]
+    assert seg["file"].endswith(".gz") and seg["count"] == 2
+    assert seg["last_ts"] == "2026-01-01T00:05:00+00:00"
+    assert not (log_dir / "security.log").exists()
+
+
+def test_seal_orphans_picks_up_unrecorded_segments(log_dir):
+    _write(log_dir / "security.log", "2026-01-03T00:00:00+00:00")
+    log_segments.seal(log_segments.rotate("2026-01-03T00:00:00+00:00"))
+    # a crash between the rename and the manifest write leaves a plain segment behind
+    _write(log_dir / "security.log.1", "2026-01-01T00:00:00+00:00", "2026-01-01T01:00:00+00:00")
+    _write(log_dir / "security.log", "2026-01-04T00:00:00+00:00")
+
+    sealed = log_segments.seal_orphans()
+    assert sealed == [str(log_dir / "security.log.1")]
+    files = [seg["file"] for seg in log_segments.read_manifest()["segments"]]
+    assert files[0] == "security.log.1.gz" and len(files) == 2
+    with gzip.open(log_dir / "security.log.1.gz", "rt") as f:
+        assert len(f.readlines()) == 2
+    assert not (log_dir / "security.log.1").exists()
+    assert (log_dir / "security.log").exists()  # the active log is left alone
+    assert log_segments.seal_orphans() == []
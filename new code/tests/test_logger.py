@@ -0,0 +1,48 @@
+import json
+import time
+
+from logger import LogWriter, _now_iso
+
+
+def _line(event):
+    return json.dumps({"ts": _now_iso(), "event": event}) + "\n"
+
+
+def _events(path):
+    return [json.loads(line)["event"] for line in open(path, encoding="utf-8")]
+
+
+def test_batches_reach_disk(log_dir):
+    writer = LogWriter(str(log_dir / "security.log"), interval=0.01)
+    for i in range(5):
+        writer.write(_line(f"E{i}"))
+    writer.flush()
+    assert _events(log_dir / "security.log") == [f"E{i}" for i in range(5)]
+    writer.close()
+
+
+def test_failed_batch_is_kept_and_retried(log_dir, capsys):
+    writer = LogWriter(str(log_dir / "security.log"), interval=0.01)
+    (log_dir / "security.log").mkdir()  # opening it for append now fails
+    writer.write(_line("A"))
+    writer.write(_line("B"))
+    writer.flush()
+    assert "held for retry" in capsys.readouterr().err
+    (log_dir / "security.log").rmdir()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not (log_dir / "security.log").is_file():
+        time.sleep(0.01)
+    writer.write(_line("C"))
+    writer.flush()
+    assert _events(log_dir / "security.log") == ["A", "B", "C"]
+    assert "works again" in capsys.readouterr().err
+    writer.close()
+
+
+def test_writes_synchronously_after_close(log_dir):
+    writer = LogWriter(str(log_dir / "security.log"), interval=0.01)
+    writer.write(_line("A"))
+    writer.close()
+    writer.write(_line("B"))
+    assert writer._thread is None
+    assert _events(log_dir / "security.log") == ["A", "B"]
@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import dashboard
+from metrics import MetricsStore, RingCounter
+
+
+def test_ring_counter_wraps():
+    ring = RingCounter(60, 3)
+    ring.add(0)
+    ring.add(59)
+    ring.add(60)
+    assert ring.series(3, now=60) == [0, 2, 1]
+    ring.add(240)  # lands in the slot bucket 1 used; bucket 1 is out of reach now
+    assert ring.series(3, now=240) == [0, 0, 1]
+    ring.add(60)  # older than the ring reaches: ignored
+    assert ring.total(3, now=240) == 1
+
+
+def test_queries_wait_for_seeding(monkeypatch):
+    store = MetricsStore()
+    past = datetime.fromtimestamp(store.started_at - 30, timezone.utc).isoformat()
+    scanning = threading.Event()
+
+    def slow_events(**kwargs):
+        scanning.set()
+        time.sleep(0.2)
+        for _ in range(3):
+            yield {"ts": past, "event": "LOGIN_FAIL", "username": "mallory"}
+
+    monkeypatch.setattr(dashboard, "iter_events", slow_events)
+    first = threading.Thread(target=store.count_last_minutes, args=("LOGIN_FAIL", 5))
+    first.start()
+    scanning.wait(5)
+    # an unseeded store must not answer 0 while the first query is still scanning
+    assert store.count_last_minutes("LOGIN_FAIL", 5) == 3
+    first.join()
+    assert store.failure_bursts(5, 3) == [("mallory", 3)]
+
+
+def test_failed_seed_is_retried(monkeypatch):
+    store = MetricsStore()
+    past = datetime.fromtimestamp(store.started_at - 30, timezone.utc).isoformat()
+    calls = []
+
+    def flaky(**kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("log unreadable")
+        yield {"ts": past, "event": "LOGIN_SUCCESS", "username": "alice"}
+
+    monkeypatch.setattr(dashboard, "iter_events", flaky)
+    try:
+        store.per_minute("LOGIN_SUCCESS")
+    except OSError:
+        pass
+    assert store.count_last_minutes("LOGIN_SUCCESS", 5) == 1
+    assert len(calls) == 2
@@ -0,0 +1,49 @@
+import pytest
+
+import auth_manager
+import password_policy
+from password_policy import hash_cost, hash_password, needs_rehash, verify_password
+
+
+@pytest.fixture(autouse=True)
+def cheap_rounds(monkeypatch):
+    monkeypatch.setattr(password_policy, "PASSWORD_HASH_ROUNDS", 5)
+
+
+def test_hash_uses_configured_or_given_cost():
+    h = hash_password("s3cret")
+    assert hash_cost(h) == 5 and verify_password("s3cret", h)
+    assert not verify_password("wrong", h)
+    assert hash_cost(hash_password("s3cret", rounds=4)) == 4
+
+
+def test_malformed_hashes():
+    assert not verify_password("pw", "not a bcrypt hash")
+    assert hash_cost("garbage") is None
+    assert hash_cost("$2b$xx$abc") is None
+    assert needs_rehash("garbage")
+
+
+def test_needs_rehash_tracks_the_configured_cost():
+    assert not needs_rehash(hash_password("pw"))
+    assert needs_rehash(hash_password("pw", rounds=4))
+
+
+def test_login_upgrades_an_old_hash(monkeypatch):
+    users = {"alice": {"username": "alice", "password_hash": hash_password("pw", rounds=4)}}
+    monkeypatch.setattr(auth_manager, "get_user", lambda u: dict(users[u]) if u in users else None)
+    monkeypatch.setattr(auth_manager, "upsert_user", lambda u: users.__setitem__(u["username"], u))
+    monkeypatch.setattr(auth_manager, "log_event", lambda *a, **kw: None)
+    old = users["alice"]["password_hash"]
+    auth_manager._upgrade_hash("alice", "pw", old)
+    assert hash_cost(users["alice"]["password_hash"]) == 5
+    assert verify_password("pw", users["alice"]["password_hash"])
+
+
+def test_upgrade_skips_a_password_changed_meanwhile(monkeypatch):
+    reset = hash_password("new")
+    users = {"alice": {"username": "alice", "password_hash": reset}}
+    monkeypatch.setattr(auth_manager, "get_user", lambda u: dict(users[u]))
+    monkeypatch.setattr(auth_manager, "upsert_user", lambda u: pytest.fail("must not overwrite the reset"))
+    auth_manager._upgrade_hash("alice", "pw", hash_password("pw", rounds=4))
+    assert users["alice"]["password_hash"] == reset
@@ -0,0 +1,160 @@
+import os
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import record_store
+from crypto_manager import encrypt_bytes
+from record_store import RecordUserStore
+
+
+def _user(name, **extra):
+    return dict({"username": name, "password_hash": "x", "failed_attempts": 0}, **extra)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordUserStore(str(tmp_path / "users.rec"), str(tmp_path / "users.json.enc"))
+
+
+def test_round_trip(store, tmp_path):
+    store.upsert_user(_user("alice"))
+    store.upsert_user(_user("bob", is_admin=True))
+    assert store.get_user("alice")["username"] == "alice"
+    assert store.get_user("bob")["is_admin"] is True
+    assert store.get_user("carol") is None
+    assert sorted(store.list_usernames()) == ["alice", "bob"]
+    # usernames only ever appear as keyed HMACs
+    assert b"alice" not in (tmp_path / "users.rec").read_bytes()
+
+    fresh = RecordUserStore(store.path, store.legacy_path)
+    assert fresh.get_user("alice") == store.get_user("alice")
+
+
+def test_last_record_wins(store):
+    store.upsert_user(_user("alice", failed_attempts=1))
+    store.upsert_user(_user("alice", failed_attempts=2))
+    assert store.get_user("alice")["failed_attempts"] == 2
+    assert store.stats()["records"] == 1
+
+
+def test_sees_appends_from_another_instance(store):
+    other = RecordUserStore(store.path, store.legacy_path)
+    store.upsert_user(_user("alice"))
+    other.upsert_user(_user("bob"))
+    assert sorted(store.get_all_users()) == ["alice", "bob"]
+
+
+def test_migrates_legacy_blob(tmp_path, monkeypatch):
+    legacy = {"alice": _user("alice"), "bob": _user("bob")}
+    (tmp_path / "users.json.enc").write_bytes(encrypt_bytes(json.dumps(legacy).encode()))
+    monkeypatch.setattr(record_store, "load_users_encrypted", lambda: legacy)
+    store = RecordUserStore(str(tmp_path / "users.rec"), str(tmp_path / "users.json.enc"))
+    assert store.get_all_users() == legacy
+
+
+def test_auto_compacts_once_mostly_dead(store, tmp_path):
+    path = tmp_path / "users.rec"
+    store.upsert_user(_user("alice"))
+    store.upsert_user(_user("bob"))
+    for i in range(10):
+        store.upsert_user(_user("alice", failed_attempts=i))
+        assert store.dead_bytes <= store._size * record_store.USERS_RECORDS_COMPACT_RATIO
+    assert store.compactions > 0
+    assert len(path.read_bytes().splitlines()) <= 1 + 2 * 2
+    assert store.get_user("alice")["failed_attempts"] == 9
+    assert store.get_user("bob") is not None
+
+
+def test_reader_follows_compaction_by_another_instance(store):
+    reader = RecordUserStore(store.path, store.legacy_path)
+    store.upsert_user(_user("alice"))
+    store.upsert_user(_user("bob"))
+    reader.get_all_users()
+    reader.invalidate()
+    reader._refresh()  # index now points into the pre-compaction file
+    store.upsert_user(_user("alice", failed_attempts=5))
+    store.compact()
+    assert reader.get_user("alice")["failed_attempts"] == 5
+    assert reader.get_user("bob")["username"] == "bob"
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_rewritten_files_stay_private(store, tmp_path):
+    old = os.umask(0o022)
+    try:
+        store.upsert_user(_user("alice"))
+        (tmp_path / "users.rec.tmp").write_bytes(b"")  # leftover from a crash, 0644
+        store.compact()
+        for name in ("users.rec", "users.rec.names"):
+            assert (tmp_path / name).stat().st_mode & 0o777 == 0o600
+    finally:
+        os.umask(old)
+
+
+class _ReusedInodes:
+    """os as record_store sees it, with every file reporting the same inode and mtime."""
+
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+    @staticmethod
+    def _same(st):
+        return SimpleNamespace(st_ino=1, st_size=st.st_size, st_mtime_ns=0, st_mode=st.st_mode)
+
+    def stat(self, *args, **kwargs):
+        return self._same(os.stat(*args, **kwargs))
+
+    def fstat(self, fd):
+        return self._same(os.fstat(fd))
+
+
+def test_reader_notices_compaction_to_the_same_inode_and_size(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(record_store, "os", _ReusedInodes())
+    path = tmp_path / "users.rec"
+    store.upsert_user(_user("alice", failed_attempts=0))
+    reader = RecordUserStore(store.path, store.legacy_path)
+    assert reader.get_user("alice")["failed_attempts"] == 0  # offset now cached
+    size = path.stat().st_size
+    for i in range(1, 9):
+        store.upsert_user(_user("alice", failed_attempts=i))
+    assert store.compactions > 0
+    assert path.stat().st_size == size  # same layout, only the record changed
+    assert reader.get_user("alice")["failed_attempts"] == 8
+    assert reader.stats()["records"] == 1
+
+
+def _count_decrypts(monkeypatch, module):
+    calls = []
+    real = module.decrypt_bytes
+
+    def counting(token):
+        calls.append(1)
+        return real(token)
+
+    monkeypatch.setattr(module, "decrypt_bytes", counting)
+    return calls
+
+
+def test_list_usernames_uses_the_name_index(store, monkeypatch):
+    for name in ("alice", "bob", "carol"):
+        store.upsert_user(_user(name))
+    store.upsert_user(_user("bob", failed_attempts=1))
+    fresh = RecordUserStore(store.path, store.legacy_path)
+    calls = _count_decrypts(monkeypatch, record_store)
+    assert sorted(fresh.list_usernames()) == ["alice", "bob", "carol"]
+    assert len(calls) == 2  # index secret + name index, no records
+    assert b"alice" not in open(store.path + ".names", "rb").read()
+
+
+def test_name_index_is_rebuilt_when_missing(store, monkeypatch):
+    for name in ("alice", "bob"):
+        store.upsert_user(_user(name))
+    import os
+    os.remove(store.path + ".names")  # e.g. a file written before the index existed
+    fresh = RecordUserStore(store.path, store.legacy_path)
+    assert sorted(fresh.list_usernames()) == ["alice", "bob"]
+    calls = _count_decrypts(monkeypatch, record_store)
+    assert sorted(RecordUserStore(store.path, store.legacy_path).list_usernames()) == ["alice", "bob"]
+    assert len(calls) == 2
@@ -0,0 +1,65 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import active_sessions
+from active_sessions import JsonSessionRegistry
+from session import SessionManager
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    reg = JsonSessionRegistry(str(tmp_path / "active_sessions.json"), lock_timeout=1)
+    monkeypatch.setattr(active_sessions, "registry", reg)
+    return reg
+
+
+def _age(registry, username, seconds):
+    with open(registry.path, "r+b") as f:
+        sessions = registry._read(f)
+        sessions[username]["last_active"] = (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat()
+        registry._write(f, sessions)
+    return sessions[username]["last_active"]
+
+
+def _instance(monkeypatch):
+    s = SessionManager()
+    monkeypatch.setattr(s, "cleanup", lambda: None)  # atexit hook; the registry is gone by then
+    return s
+
+
+def test_login_is_persisted_for_other_instances(registry, monkeypatch):
+    first, second = _instance(monkeypatch), _instance(monkeypatch)
+    first.login("alice")
+    with open(registry.path) as f:
+        assert "alice" in json.load(f)
+    assert not second.can_login("alice")
+    with pytest.raises(PermissionError):
+        second.login("alice")
+    # a registry opened fresh on the same file (another process) sees it too
+    assert JsonSessionRegistry(registry.path).is_user_active("alice")
+
+    first.logout()
+    assert second.can_login("alice")
+    second.login("alice")
+    assert second.get_current_user() == "alice"
+
+
+def test_stale_session_does_not_block_login(registry, monkeypatch):
+    registry.add("alice")
+    _age(registry, "alice", active_sessions.SESSION_STALE_SECONDS + 1)  # its instance crashed
+    s = _instance(monkeypatch)
+    assert s.can_login("alice")
+    s.login("alice")
+    assert registry.is_user_active("alice")
+
+
+def test_heartbeat_refreshes_last_active(registry, monkeypatch):
+    s = _instance(monkeypatch)
+    s.login("alice")
+    before = _age(registry, "alice", 60)
+    s.heartbeat()  # coalesced: too soon after login to write
+    assert registry.get_active_sessions()["alice"]["last_active"] == before
+    s.heartbeat(force=True)
+    assert registry.get_active_sessions()["alice"]["last_active"] > before
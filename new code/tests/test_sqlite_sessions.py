@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+import sqlite_sessions
+from sqlite_sessions import SqliteSessionRegistry
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def test_claim_is_exclusive_across_instances(path):
+    a, b = SqliteSessionRegistry(path), SqliteSessionRegistry(path)
+    assert a.try_add("alice")
+    assert not b.try_add("alice")
+    assert b.is_user_active("alice") and list(b.get_active_sessions()) == ["alice"]
+    a.remove("alice")
+    assert b.try_add("alice")
+
+
+def test_stale_session_can_be_taken_over_and_pruned(path):
+    reg = SqliteSessionRegistry(path)
+    reg.add("alice")
+    reg.add("bob")
+    reg._conn().execute("UPDATE sessions SET last_active = ? WHERE username = 'alice'",
+                        (time.time() - sqlite_sessions.SESSION_STALE_SECONDS - 1,))
+    assert not reg.is_user_active("alice")
+    assert list(reg.get_active_sessions()) == ["bob"]
+    reg.prune_stale()
+    assert reg._conn().execute("SELECT username FROM sessions").fetchall() == [("bob",)]
+    reg.add("alice")
+    reg._conn().execute("UPDATE sessions SET last_active = 0 WHERE username = 'alice'")
+    assert SqliteSessionRegistry(path).try_add("alice")  # a crashed instance's claim doesn't block
+
+
+def test_touch_only_refreshes_live_sessions(path):
+    reg = SqliteSessionRegistry(path)
+    reg.add("alice")
+    reg._conn().execute("UPDATE sessions SET last_active = ?", (time.time() - 60,))
+    reg.touch("alice")
+    assert reg._conn().execute("SELECT last_active FROM sessions").fetchone()[0] > time.time() - 5
+    reg._conn().execute("UPDATE sessions SET last_active = 0")
+    reg.touch("alice")  # stale: stays stale instead of being revived
+    assert not reg.is_user_active("alice")
@@ -0,0 +1,81 @@
+import json
+import sqlite3
+
+import pytest
+
+import sqlite_store
+from crypto_manager import encrypt_bytes
+from sqlite_store import SqliteUserStore, import_from_blob
+
+
+def _user(name, **extra):
+    return dict({"username": name, "password_hash": "x", "failed_attempts": 0}, **extra)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SqliteUserStore(str(tmp_path / "users.db"), str(tmp_path / "users.json.enc"))
+
+
+def test_round_trip(store):
+    store.upsert_user(_user("alice"))
+    store.upsert_user(_user("bob", is_admin=True))
+    assert store.get_user("alice")["username"] == "alice"
+    assert store.get_user("bob")["is_admin"] is True
+    assert store.get_user("carol") is None
+    assert sorted(store.list_usernames()) == ["alice", "bob"]
+
+    fresh = SqliteUserStore(store.path, store.legacy_path)
+    assert fresh.get_all_users() == store.get_all_users()
+
+
+def test_no_plaintext_usernames(store):
+    store.upsert_user(_user("alice"))
+    conn = sqlite3.connect(store.path)
+    keys = [r[0] for r in conn.execute("SELECT user_key FROM users")]
+    assert keys and "alice" not in keys
+
+
+def test_update_bumps_version_and_cache(store):
+    store.upsert_user(_user("alice", failed_attempts=1))
+    assert store.get_user("alice")["failed_attempts"] == 1
+    other = SqliteUserStore(store.path, store.legacy_path)
+    other.upsert_user(_user("alice", failed_attempts=2))
+    assert store.get_user("alice")["failed_attempts"] == 2
+
+
+def test_imports_legacy_blob_on_first_open(tmp_path, monkeypatch):
+    legacy = {"alice": _user("alice"), "bob": _user("bob")}
+    (tmp_path / "users.json.enc").write_bytes(encrypt_bytes(json.dumps(legacy).encode()))
+    monkeypatch.setattr(sqlite_store, "load_users_encrypted", lambda: legacy)
+    store = SqliteUserStore(str(tmp_path / "users.db"), str(tmp_path / "users.json.enc"))
+    assert store.get_all_users() == legacy
+
+
+def test_import_from_blob_overwrites(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    SqliteUserStore(path, str(tmp_path / "missing.enc")).upsert_user(_user("alice", failed_attempts=3))
+    monkeypatch.setattr(sqlite_store, "load_users_encrypted", lambda: {"alice": _user("alice")})
+    assert import_from_blob(path) == 1
+    assert SqliteUserStore(path).get_user("alice")["failed_attempts"] == 0
+
+
+def test_list_usernames_uses_the_name_index(store, monkeypatch):
+    for name in ("alice", "bob", "carol"):
+        store.upsert_user(_user(name))
+    store.upsert_user(_user("bob", failed_attempts=1))
+    fresh = SqliteUserStore(store.path, store.legacy_path)
+    calls = []
+    real = sqlite_store.decrypt_bytes
+    monkeypatch.setattr(sqlite_store, "decrypt_bytes", lambda token: calls.append(1) or real(token))
+    assert sorted(fresh.list_usernames()) == ["alice", "bob", "carol"]
+    assert len(calls) == 2  # index secret + name map, no payloads
+
+
+def test_name_index_is_rebuilt_when_missing(store):
+    for name in ("alice", "bob"):
+        store.upsert_user(_user(name))
+    sqlite3.connect(store.path, isolation_level=None).execute("DELETE FROM meta WHERE name = 'usernames'")
+    fresh = SqliteUserStore(store.path, store.legacy_path)
+    assert sorted(fresh.list_usernames()) == ["alice", "bob"]
+    assert sorted(fresh._read_names(fresh._conn()).values()) == ["alice", "bob"]
@@ -0,0 +1,41 @@
+import threading
+
+from gui.tasks import TaskRunner
+
+
+class _Root:
+    """Enough of a Tk root for TaskRunner: after() jobs are recorded, never run."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.cancelled = []
+
+    def after(self, ms, fn):
+        job = f"after#{len(self.jobs)}"
+        self.jobs[job] = fn
+        return job
+
+    def after_cancel(self, job):
+        self.cancelled.append(job)
+
+
+def test_shutdown_cancels_queued_and_running_tasks():
+    root = _Root()
+    runner = TaskRunner(root, workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def busy(task):
+        started.set()
+        release.wait(5)
+        task.progress(1, 2)  # raises TaskCancelled once shut down
+
+    running = runner.run(busy, with_task=True)
+    queued = runner.run(lambda: None)
+    assert started.wait(5)
+    runner.shutdown(cancel=True)
+    release.set()
+    assert running.cancelled and queued.cancelled
+    assert queued.future.cancelled()
+    assert root.cancelled == [runner._pump_job]
+    runner.shutdown(cancel=True)  # closing twice (destroy after WM_DELETE_WINDOW) is harmless
+    assert len(root.cancelled) == 1
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import crypto_manager
+from user_store import CachedUserStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "users.json.enc")
+    monkeypatch.setattr(crypto_manager, "USERS_DB_ENC_PATH", path)
+    return CachedUserStore(path)
+
+
+def _user(name, **extra):
+    return dict({"username": name, "password_hash": "x", "failed_attempts": 0}, **extra)
+
+
+def test_reads_come_from_the_cache(store):
+    store.upsert_user(_user("alice"))
+    misses = store.stats()["misses"]
+    for _ in range(5):
+        assert store.get_user("alice")["username"] == "alice"
+    assert store.stats()["misses"] == misses
+    assert store.stats()["hits"] >= 5
+
+
+def test_callers_get_copies(store):
+    store.upsert_user(_user("alice"))
+    store.get_user("alice")["failed_attempts"] = 99
+    store.get_all_users()["alice"]["failed_attempts"] = 98
+    assert store.get_user("alice")["failed_attempts"] == 0
+
+
+def test_own_write_updates_the_cache_without_a_reload(store):
+    store.upsert_user(_user("alice"))
+    store.get_user("alice")
+    misses = store.stats()["misses"]
+    store.upsert_user(_user("alice", failed_attempts=2))
+    assert store.get_user("alice")["failed_attempts"] == 2
+    assert store.stats()["misses"] == misses
+
+
+def test_write_by_another_instance_invalidates(store):
+    store.upsert_user(_user("alice"))
+    assert store.get_user("bob") is None
+    generation = store.stats()["generation"]
+    other = CachedUserStore(store.path)
+    other.upsert_user(_user("bob", is_admin=True))
+    # make sure the signature moves even where mtimes are coarse
+    st = os.stat(store.path)
+    os.utime(store.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert store.get_user("bob")["is_admin"] is True
+    assert sorted(store.list_usernames()) == ["alice", "bob"]
+    assert store.stats()["generation"] > generation
+
+
+def test_invalidate_forces_a_reload(store):
+    store.upsert_user(_user("alice"))
+    store.get_user("alice")
+    misses = store.stats()["misses"]
+    store.invalidate()
+    store.get_user("alice")
+    assert store.stats()["misses"] == misses + 1
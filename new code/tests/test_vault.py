@@ -0,0 +1,72 @@
+import io
+import os
+import struct
+
+import pytest
+
+import vault
+from vault import VaultError, VaultReader, encrypt_stream, decrypt_stream
+
+CHUNK = 16
+
+
+def _encrypt(data, chunk_size=CHUNK):
+    out = io.BytesIO()
+    assert encrypt_stream(io.BytesIO(data), out, chunk_size) == len(data)
+    out.seek(0)
+    return out
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, CHUNK + 1, 3 * CHUNK, 3 * CHUNK + 5])
+def test_round_trip_at_chunk_boundaries(size):
+    data = os.urandom(size)
+    enc = _encrypt(data)
+    reader = VaultReader(enc)
+    assert reader.size == size
+    assert reader.chunk_count == max(1, -(-size // CHUNK))
+    enc.seek(0)
+    out = io.BytesIO()
+    assert decrypt_stream(enc, out) == size
+    assert out.getvalue() == data
+
+
+def test_read_range_spans_chunks():
+    data = bytes(range(256)) * 2
+    reader = VaultReader(_encrypt(data))
+    for offset, length in [(0, 1), (15, 2), (16, 16), (10, 100), (500, 50), (512, 10), (0, None)]:
+        expected = data[offset:] if length is None else data[offset:offset + length]
+        assert reader.read_range(offset, length) == expected
+
+
+def test_tampered_chunk_fails_authentication():
+    enc = bytearray(_encrypt(b"x" * 40).getvalue())
+    enc[vault.HEADER_SIZE + vault.NONCE_SIZE] ^= 1
+    reader = VaultReader(io.BytesIO(bytes(enc)))
+    with pytest.raises(VaultError):
+        reader.read_chunk(0)
+
+
+def test_dropped_final_chunk_is_detected():
+    enc = _encrypt(b"y" * (2 * CHUNK + 3)).getvalue()
+    cut = enc[:vault.HEADER_SIZE + 2 * (CHUNK + vault.OVERHEAD)]
+    reader = VaultReader(io.BytesIO(cut))
+    with pytest.raises(VaultError):
+        reader.read_chunk(reader.chunk_count - 1)  # chunk 1 wasn't encrypted as the last one
+
+
+@pytest.mark.parametrize("chunk_size", [0, vault.VAULT_MAX_CHUNK + 1, 0xFFFFFFFF])
+def test_header_chunk_size_out_of_range(chunk_size):
+    enc = bytearray(_encrypt(b"z" * 40).getvalue())
+    struct.pack_into("<I", enc, 12, chunk_size)
+    with pytest.raises(VaultError):
+        VaultReader(io.BytesIO(bytes(enc)))
+
+
+def test_encrypt_rejects_bad_chunk_size():
+    with pytest.raises(ValueError):
+        encrypt_stream(io.BytesIO(b"data"), io.BytesIO(), 0)
+
+
+def test_truncated_header():
+    with pytest.raises(VaultError):
+        VaultReader(io.BytesIO(vault.MAGIC))
@@ -1,20 +1,108 @@
-from typing import Optional, Dict, List
+import os
+import threading
+from typing import Optional, Dict, List, Tuple
 from crypto_manager import load_users_encrypted, save_users_encrypted
+from config import USERS_DB_ENC_PATH, USER_STORE_BACKEND
+
+
+class CachedUserStore:
+    """
+    Keeps the decrypted users DB in memory and only re-decrypts when the
+    encrypted file on disk changes (checked via inode/size/mtime).
+    """
+
+    def __init__(self, path: str = USERS_DB_ENC_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._users: Optional[Dict[str, dict]] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load(self) -> Dict[str, dict]:
+        with self._lock:
+            sig = self._stat_signature()
+            if self._users is not None and sig == self._signature:
+                self.hits += 1
+                return self._users
+            self.misses += 1
+            self._users = load_users_encrypted()
+            self._signature = sig
+            self.generation += 1
+            return self._users
+
+    def get_all_users(self) -> Dict[str, dict]:
+        # hand out copies so callers can mutate records without touching the cache
+        return {u: dict(rec) for u, rec in self._load().items()}
+
+    def get_user(self, username: str) -> Optional[dict]:
+        rec = self._load().get(username)
+        return dict(rec) if rec is not None else None
+
+    def upsert_user(self, user: dict) -> None:
+        with self._lock:
+            db = dict(self._load())
+            db[user["username"]] = dict(user)
+            save_users_encrypted(db)
+            self._users = db
+            self._signature = self._stat_signature()
+            self.generation += 1
+
+    def list_usernames(self) -> List[str]:
+        return list(self._load().keys())
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._users = None
+            self._signature = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "generation": self.generation}
+
+
+def _make_store():
+    if USER_STORE_BACKEND == "records":
+        from record_store import RecordUserStore
+        return RecordUserStore()
+    if USER_STORE_BACKEND == "sqlite":
+        from sqlite_store import SqliteUserStore
+        return SqliteUserStore()
+    if USER_STORE_BACKEND == "blob":
+        return CachedUserStore()
+    raise ValueError(f"Unknown USER_STORE_BACKEND: {USER_STORE_BACKEND!r}")
+
+
+_store = _make_store()
 
 
 def get_all_users() -> Dict[str, dict]:
-    return load_users_encrypted()
+    return _store.get_all_users()
 
 
 def get_user(username: str) -> Optional[dict]:
-    return get_all_users().get(username)
+    return _store.get_user(username)
 
 
 def upsert_user(user: dict) -> None:
-    db = get_all_users()
-    db[user["username"]] = user
-    save_users_encrypted(db)
+    _store.upsert_user(user)
 
 
 def list_usernames() -> List[str]:
-    return list(get_all_users().keys())
+    return _store.list_usernames()
+
+
+def invalidate_cache() -> None:
+    _store.invalidate()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for the active backend's decrypted-record cache."""
+    return _store.stats()
@@ -0,0 +1,188 @@
+import io
+import os
+import base64
+import struct
+import hashlib
+from typing import BinaryIO, Iterator, Optional, Set
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
+from crypto_manager import key_manager
+from config import VAULT_CHUNK_SIZE, VAULT_MAX_CHUNK
+
+# === Encrypted file layout ===
+# header (40 bytes): b"BSSVAULT" | version u8 | 3 reserved | chunk_size u32 | key id (8) | file id (16)
+# then chunks:       nonce (12) | AES-256-GCM ciphertext of up to chunk_size bytes | tag (16)
+# Every chunk except the last holds exactly chunk_size bytes, so chunk i starts
+# at HEADER + i * (chunk_size + 28) and can be decrypted on its own. The AAD
+# binds each chunk to this file's header, its index and whether it is the
+# final chunk, so chunks can't be reordered, swapped between files or dropped
+# off the end. The AES key is derived (HKDF) from a crypto_manager key; the
+# key id says which one, so files written before a key rotation stay readable.
+
+MAGIC = b"BSSVAULT"
+VERSION = 1
+_HEADER = struct.Struct("<8sB3xI8s16s")
+HEADER_SIZE = _HEADER.size
+NONCE_SIZE = 12
+TAG_SIZE = 16
+OVERHEAD = NONCE_SIZE + TAG_SIZE
+
+
+class VaultError(Exception):
+    pass
+
+
+def key_id(fernet_key: bytes) -> bytes:
+    """The id a vault header stores for the crypto_manager key it was written with."""
+    return hashlib.sha256(fernet_key).digest()[:8]
+
+
+def _derive(fernet_key: bytes) -> AESGCM:
+    raw = base64.urlsafe_b64decode(fernet_key)
+    key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"bss-vault-v1").derive(raw)
+    return AESGCM(key)
+
+
+def _cipher_for(wanted: bytes) -> AESGCM:
+    for k in key_manager.keys():
+        if key_id(k) == wanted:
+            return _derive(k)
+    key_manager.reload()  # maybe another process rotated keys
+    for k in key_manager.keys():
+        if key_id(k) == wanted:
+            return _derive(k)
+    raise VaultError("No key available for this vault file")
+
+
+def _aad(header: bytes, index: int, last: bool) -> bytes:
+    return header + struct.pack("<QB", index, 1 if last else 0)
+
+
+class VaultReader:
+    """Random access to the plaintext of one vault file, one chunk at a time."""
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        header = f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise VaultError("Truncated vault header")
+        magic, version, chunk_size, file_key, _ = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise VaultError("Not a vault file")
+        if not 1 <= chunk_size <= VAULT_MAX_CHUNK:
+            raise VaultError("Corrupt vault header (chunk size)")  # would divide by zero or read huge chunks
+        self.header = header
+        self.chunk_size = chunk_size
+        self._aes = _cipher_for(file_key)
+        f.seek(0, os.SEEK_END)
+        body = f.tell() - HEADER_SIZE
+        stride = chunk_size + OVERHEAD
+        self.chunk_count = max(1, -(-body // stride))
+        last_len = body - (self.chunk_count - 1) * stride - OVERHEAD
+        if last_len < 0:
+            raise VaultError("Truncated vault file")
+        self.size = (self.chunk_count - 1) * chunk_size + last_len
+
+    def read_chunk(self, index: int) -> bytes:
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(index)
+        stride = self.chunk_size + OVERHEAD
+        self.f.seek(HEADER_SIZE + index * stride)
+        blob = self.f.read(stride)
+        last = index == self.chunk_count - 1
+        try:
+            return self._aes.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], _aad(self.header, index, last))
+        except InvalidTag:
+            raise VaultError(f"Chunk {index} failed authentication")
+
+    def iter_chunks(self, start: int = 0) -> Iterator[bytes]:
+        for i in range(start, self.chunk_count):
+            yield self.read_chunk(i)
+
+    def read_range(self, offset: int, length: Optional[int] = None) -> bytes:
+        """Plaintext bytes [offset, offset+length), decrypting only the chunks involved."""
+        if length is None:
+            length = self.size - offset
+        end = min(self.size, offset + length)
+        if offset >= end:
+            return b""
+        out = []
+        for i in range(offset // self.chunk_size, (end - 1) // self.chunk_size + 1):
+            chunk = self.read_chunk(i)
+            base = i * self.chunk_size
+            out.append(chunk[max(0, offset - base):end - base])
+        return b"".join(out)
+
+
+def is_vault_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def key_ids_in_use(root: str) -> Set[bytes]:
+    """Key ids of every vault file under root (dedup blobs included), from the headers alone."""
+    found = set()
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            try:
+                with open(os.path.join(dirpath, name), "rb") as f:
+                    header = f.read(HEADER_SIZE)
+            except OSError:
+                continue
+            if len(header) == HEADER_SIZE and header.startswith(MAGIC):
+                found.add(_HEADER.unpack(header)[3])
+    return found
+
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, chunk_size: int = VAULT_CHUNK_SIZE) -> int:
+    """
+    Encrypt src into dst chunk by chunk (constant memory: two chunks).
+    Returns the plaintext size.
+    """
+    if not 1 <= chunk_size <= VAULT_MAX_CHUNK:
+        raise ValueError(f"chunk_size must be between 1 and {VAULT_MAX_CHUNK}")
+    fernet_key = key_manager.primary_key()
+    aes = _derive(fernet_key)
+    header = _HEADER.pack(MAGIC, VERSION, chunk_size, key_id(fernet_key), os.urandom(16))
+    dst.write(header)
+    total = 0
+    index = 0
+    chunk = src.read(chunk_size)
+    while True:
+        nxt = src.read(chunk_size) if len(chunk) == chunk_size else b""
+        last = not nxt
+        nonce = os.urandom(NONCE_SIZE)
+        dst.write(nonce + aes.encrypt(nonce, chunk, _aad(header, index, last)))
+        total += len(chunk)
+        if last:
+            return total
+        chunk, index = nxt, index + 1
+
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO) -> int:
+    reader = VaultReader(src)
+    for chunk in reader.iter_chunks():
+        dst.write(chunk)
+    return reader.size
+
+
+def encrypt_file(src_path: str, dst_path: str, chunk_size: int = VAULT_CHUNK_SIZE) -> int:
+    """Encrypt a file into dst_path atomically (tmp file + replace)."""
+    tmp = dst_path + ".tmp"
+    with open(src_path, "rb") as src, open(tmp, "wb") as dst:
+        size = encrypt_stream(src, dst, chunk_size)
+    os.replace(tmp, dst_path)
+    return size
+
+
+def write_bytes(dst_path: str, data: bytes, chunk_size: int = VAULT_CHUNK_SIZE) -> int:
+    tmp = dst_path + ".tmp"
+    with open(tmp, "wb") as dst:
+        size = encrypt_stream(io.BytesIO(data), dst, chunk_size)
+    os.replace(tmp, dst_path)
+    return size